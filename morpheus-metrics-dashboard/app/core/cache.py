@@ -0,0 +1,328 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, date, timezone
+
+import brotli
+
+logger = logging.getLogger(__name__)
+
+
+def json_serial(obj):
+    """JSON serializer for objects not serializable by default json code"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Type not serializable")
+
+
+def ensure_serializable(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    elif isinstance(obj, dict):
+        return {k: ensure_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [ensure_serializable(i) for i in obj]
+    elif isinstance(obj, (int, float, str, bool, type(None))):
+        return obj
+    else:
+        return str(obj)  # Convert any other type to string
+
+
+GZIP_COMPRESS_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+class RenderedPayload:
+    """
+    A response body serialized once to JSON bytes, with gzip and brotli variants, a content hash used as the
+    ETag and the time the metric was last refreshed used as Last-Modified
+    """
+
+    __slots__ = ('body', 'gzip_body', 'br_body', 'etag', 'last_modified')
+
+    def __init__(self, body: bytes, last_modified: datetime, previous=None):
+        self.body = body
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.last_modified = last_modified
+
+        if previous is not None and previous.etag == self.etag:
+            # Unchanged content, reuse the compressed variants
+            self.gzip_body = previous.gzip_body
+            self.br_body = previous.br_body
+        else:
+            self.gzip_body = gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+            self.br_body = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding == 'br':
+            return self.br_body
+        if encoding == 'gzip':
+            return self.gzip_body
+        return self.body
+
+
+def utc_timestamp(value: datetime = None) -> datetime:
+    """An aware UTC datetime truncated to whole seconds (the resolution of HTTP dates)"""
+    value = value or datetime.now(timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def render_payload(value, last_modified: datetime, previous: RenderedPayload = None):
+    """
+    Render a response body the same way FastAPI's JSONResponse would.
+    Returns None if the value can't be rendered, so the caller can fall back to the regular response path.
+    """
+    try:
+        body = json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+                          default=json_serial).encode('utf-8')
+    except (TypeError, ValueError) as e:
+        logger.error(f"Unable to pre-render response body: {e}")
+        return None
+    return RenderedPayload(body, last_modified, previous)
+
+
+def read_cache_file(cache_file: str) -> dict:
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as file:
+                data = file.read()
+                if data.strip():  # Check if the file is not empty
+                    return json.loads(data)
+                else:
+                    return {}  # Return an empty dictionary if the file is empty
+        except json.JSONDecodeError as e:
+            logger.info(f"Error reading cache file: {e}")
+            # Return an empty dictionary if JSON is invalid
+            return {}
+    return {}
+
+
+def atomic_write_bytes(path: str, payload: bytes):
+    """Write payload to path via a temp file in the same directory and an atomic rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ShardedCacheStore:
+    """
+    Persists every metric key in its own JSON file inside cache_dir.
+
+    Each shard is written with a temp file plus rename, so a crash or a bad value can only ever affect the key
+    being written, and updating one metric costs O(size of that metric) instead of rewriting the whole cache.
+    A legacy single-file cache.json is imported once when the shard directory is still empty.
+    """
+
+    SHARD_SUFFIX = '.json'
+
+    def __init__(self, cache_dir: str, legacy_cache_file: str = None):
+        self.cache_dir = cache_dir
+        self.legacy_cache_file = legacy_cache_file
+
+    def _shard_path(self, key: str) -> str:
+        if not key or os.sep in key or key.startswith('.'):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return os.path.join(self.cache_dir, f"{key}{self.SHARD_SUFFIX}")
+
+    def read(self, key: str):
+        """Read a single shard, returning None if it is missing or corrupt"""
+        path = self._shard_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error reading cache shard {key}: {e}")
+            return None
+
+    def read_all(self) -> dict:
+        if not os.path.isdir(self.cache_dir) or not self.keys():
+            self._import_legacy_cache()
+
+        data = {}
+        for key in self.keys():
+            path = self._shard_path(key)
+            try:
+                with open(path, 'r') as file:
+                    data[key] = json.load(file)
+            except (OSError, json.JSONDecodeError) as e:
+                # A corrupt shard only loses its own metric
+                logger.error(f"Error reading cache shard {key}: {e}")
+        return data
+
+    def modified_at(self, key: str) -> datetime:
+        """When the shard was last written, used as the refresh time of metrics loaded on a warm restart"""
+        try:
+            return utc_timestamp(datetime.fromtimestamp(os.path.getmtime(self._shard_path(key)), timezone.utc))
+        except OSError:
+            return utc_timestamp()
+
+    def keys(self) -> list:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(name[:-len(self.SHARD_SUFFIX)] for name in os.listdir(self.cache_dir)
+                      if name.endswith(self.SHARD_SUFFIX) and not name.startswith('.'))
+
+    def write(self, key: str, value) -> bool:
+        """Serialize and atomically persist a single metric. Returns False if the value could not be written."""
+        try:
+            payload = json.dumps(value, default=json_serial).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            logger.error(f"Non-serializable value for key: {key}: {e}")
+            return False
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            atomic_write_bytes(self._shard_path(key), payload)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing cache shard {key}: {e}")
+            return False
+
+    def delete(self, key: str):
+        path = self._shard_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _import_legacy_cache(self):
+        if not self.legacy_cache_file or not os.path.exists(self.legacy_cache_file):
+            return
+        legacy_data = read_cache_file(self.legacy_cache_file)
+        if legacy_data:
+            logger.info(f"Migrating {len(legacy_data)} keys from {self.legacy_cache_file} to {self.cache_dir}")
+        for key, value in legacy_data.items():
+            self.write(key, value)
+
+
+class MetricsCache:
+    """
+    In-process cache of every metric served by the API.
+
+    The persisted shards are loaded once (on first access or an explicit load()) and requests are served from
+    memory afterwards. The current snapshot is never mutated in place: updates build a new dict and swap the
+    reference, so readers always see either the old or the new snapshot. The store is only written for
+    persistence and warm restarts, one shard per changed key.
+
+    Whenever a key changes its response body is rendered once to JSON plus gzip and brotli variants, so serving
+    a cached metric does no serialization work. Each rendered body also carries the ETag and Last-Modified
+    values used to answer conditional requests. `envelopes` maps keys whose endpoint wraps the value in an
+    object (e.g. {"data": ...}) to the name of the wrapping field.
+    """
+
+    def __init__(self, store: ShardedCacheStore, envelopes: dict = None):
+        self.store = store
+        self.envelopes = envelopes or {}
+        self._data = {}
+        self._rendered = {}
+        self._updated_at = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        """(Re)load the snapshot from the persisted shards"""
+        data = self.store.read_all()
+        updated_at = {key: self.store.modified_at(key) for key in data}
+        rendered = {key: self._render(key, value, updated_at[key]) for key, value in data.items()}
+        with self._lock:
+            self._data = data
+            self._rendered = rendered
+            self._updated_at = updated_at
+            self._loaded = True
+        return data
+
+    @property
+    def data(self) -> dict:
+        """The current snapshot. Treat it as read-only."""
+        if not self._loaded:
+            self.load()
+        return self._data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self.data
+
+    def snapshot(self) -> dict:
+        """A shallow copy of the current snapshot that the caller is free to modify"""
+        return dict(self.data)
+
+    def response_value(self, key):
+        """The value as the endpoint returns it, with its envelope applied"""
+        return self._wrap(key, self.data[key])
+
+    def rendered(self, key):
+        """The pre-rendered response body for key, or None if it is missing or couldn't be rendered"""
+        if not self._loaded:
+            self.load()
+        return self._rendered.get(key)
+
+    def updated_at(self, key):
+        """When key was last refreshed (an aware UTC datetime), or None if it isn't cached"""
+        if not self._loaded:
+            self.load()
+        return self._updated_at.get(key)
+
+    def set(self, key, value, updated_at: datetime = None):
+        """Update a single metric and persist only its shard"""
+        self.data  # Make sure the persisted snapshot is loaded before it is extended
+        updated_at = utc_timestamp(updated_at)
+        rendered = self._render(key, value, updated_at, self._rendered.get(key))
+        with self._lock:
+            new_data = dict(self._data)
+            new_data[key] = value
+            new_rendered = dict(self._rendered)
+            new_rendered[key] = rendered
+            new_updated_at = dict(self._updated_at)
+            new_updated_at[key] = updated_at
+            self._data = new_data
+            self._rendered = new_rendered
+            self._updated_at = new_updated_at
+        self.store.write(key, value)
+
+    def swap(self, new_data: dict, updated_at: datetime = None):
+        """
+        Atomically replace the whole snapshot and persist the keys whose values changed.
+        updated_at is the refresh time recorded as Last-Modified for the changed keys.
+        """
+        new_data = dict(new_data)
+        updated_at = utc_timestamp(updated_at)
+        old_data = self._data
+        old_rendered = self._rendered
+
+        changed_keys = [key for key, value in new_data.items() if key not in old_data or old_data[key] is not value]
+        new_rendered = {key: old_rendered.get(key) for key in new_data}
+        new_updated_at = {key: self._updated_at.get(key, updated_at) for key in new_data}
+        for key in changed_keys:
+            new_rendered[key] = self._render(key, new_data[key], updated_at, old_rendered.get(key))
+            new_updated_at[key] = updated_at
+
+        with self._lock:
+            self._data = new_data
+            self._rendered = new_rendered
+            self._updated_at = new_updated_at
+            self._loaded = True
+
+        for key in changed_keys:
+            self.store.write(key, new_data[key])
+
+    def _wrap(self, key, value):
+        envelope = self.envelopes.get(key)
+        return {envelope: value} if envelope else value
+
+    def _render(self, key, value, updated_at: datetime, previous: RenderedPayload = None):
+        return render_payload(self._wrap(key, value), updated_at, previous)
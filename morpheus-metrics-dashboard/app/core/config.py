@@ -1,5 +1,8 @@
+import functools
 import json
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
+
+from app.core.telemetry import instrument_web3
 from dotenv import load_dotenv
 import os
 import logging
@@ -37,11 +40,33 @@ DUNE_QUERY_ID = os.getenv("DUNE_QUERY_ID")
 SLACK_URL = os.getenv("SLACK_URL")
 GITHUB_API_KEY = os.getenv("GITHUB_API_KEY")
 
+# Upstream API base URLs, overridable to point the app at local stand-ins (see tests/benchmarks)
+COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com/api/v3")
+DEXSCREENER_API_URL = os.getenv("DEXSCREENER_API_URL", "https://api.dexscreener.com")
+DUNE_API_URL = os.getenv("DUNE_API_URL", "https://api.dune.com")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/api")
+ARBISCAN_API_URL = os.getenv("ARBISCAN_API_URL", "https://api.arbiscan.io/api")
+BASESCAN_API_URL = os.getenv("BASESCAN_API_URL", "https://api.basescan.org/api")
+
 NOTIFICATION_CHANNEL = "slack-example-channel"
 
-web3 = Web3(Web3.HTTPProvider(ETH_RPC_URL))
-web3_arb = Web3(Web3.HTTPProvider(ARB_RPC_URL))
-web3_base = Web3(Web3.HTTPProvider(BASE_RPC_URL))
+# Request quotas of the upstreams as "<requests>/<seconds>", keyed by the targets of track_upstream. Each can be
+# overridden with RATE_LIMIT_<TARGET> (e.g. RATE_LIMIT_SHEETS=300/60), an empty value means no limit
+DEFAULT_RATE_LIMITS = {
+    'sheets': '60/60',  # Sheets API quota per user
+    'slack': '1/1',  # Incoming webhooks
+    'coingecko': '30/60',  # Public API
+    'dexscreener': '300/60',
+    'dune': '40/60',
+    'github': '5000/3600',
+    'etherscan': '5/1',
+    'arbiscan': '5/1',
+    'basescan': '5/1',
+    'rpc_ethereum': '50/1',  # The public RPC's pace, raise it for a provider plan with a higher quota
+}
+RATE_LIMITS = {target: os.getenv(f"RATE_LIMIT_{target.upper()}", default)
+               for target, default in DEFAULT_RATE_LIMITS.items()}
 
 EMISSIONS_SHEET_NAME = "Emissions"
 USER_MULTIPLIER_SHEET_NAME = "UserMultiplier"
@@ -51,10 +76,24 @@ USER_STAKED_SHEET_NAME = "UserStaked"
 USER_WITHDRAWN_SHEET_NAME = "UserWithdrawn"
 OVERPLUS_BRIDGED_SHEET_NAME = "OverplusBridged"
 
-COINGECKO_HISTORICAL_PRICES = (f"https://api.coingecko.com/api/v3/coins/morpheusai/contract/"
+# Event log sheets that only ever get rows appended, read incrementally
+APPEND_ONLY_SHEET_NAMES = [USER_STAKED_SHEET_NAME, USER_WITHDRAWN_SHEET_NAME, USER_MULTIPLIER_SHEET_NAME,
+                           OVERPLUS_BRIDGED_SHEET_NAME]
+
+COINGECKO_HISTORICAL_PRICES = (f"{COINGECKO_API_URL}/coins/morpheusai/contract/"
                                f"{MOR_ARBITRUM_ADDRESS}/market_chart?"
                                f"vs_currency=usd&days={PRICES_AND_VOLUME_DATA_DAYS}")
-DEXSCREENER_URL = f"https://api.dexscreener.com/latest/dex/tokens/{MOR_ARBITRUM_ADDRESS}"
+
+# Spot price sources of each asset (app/core/prices.py), tried in order: CoinGecko coin ids, DexScreener tokens
+PRICE_SOURCES = {
+    'MOR': [('coingecko', 'morpheusai'), ('dexscreener', MOR_ARBITRUM_ADDRESS)],
+    'stETH': [('coingecko', 'staked-ether'), ('dexscreener', STETH_TOKEN_ADDRESS)],
+}
+# Seconds a price is reused before it's fetched again, and how long the last price is still served (marked stale)
+# while every source fails
+PRICE_TTL = float(os.getenv("PRICE_TTL_SECONDS", "60"))
+PRICE_MAX_STALE = float(os.getenv("PRICE_MAX_STALE_SECONDS", "3600"))
+PRICE_REQUEST_TIMEOUT = float(os.getenv("PRICE_REQUEST_TIMEOUT_SECONDS", "10"))
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..', '..'))
@@ -63,66 +102,77 @@ IMPLIED_PRICES_JSON = os.path.join(project_root,
                                    'json_files',
                                    'mor_price_data.json')
 
-supply_abi_path = os.path.join(project_root, 'json_files', 'abi', 'supply_abi.json')
-distribution_abi_path = os.path.join(project_root, 'json_files', 'abi', 'distribution_abi.json')
-erc20_abi_path = os.path.join(project_root, 'json_files', 'abi', 'erc_20_abi.json')
-
-with open(supply_abi_path, 'r') as file:
-    supply_abi = json.load(file)
-with open(distribution_abi_path, 'r') as file:
-    distribution_abi = json.load(file)
-with open(erc20_abi_path, 'r') as file:
-    erc20_abi = json.load(file)
-
-SUPPLY_ABI = supply_abi
-DISTRIBUTION_ABI = distribution_abi
-ERC20_ABI = erc20_abi
-
-supply_contract = web3.eth.contract(address=web3.to_checksum_address(SUPPLY_PROXY_ADDRESS),
-                                    abi=SUPPLY_ABI)
-distribution_contract = web3.eth.contract(address=web3.to_checksum_address(DISTRIBUTION_PROXY_ADDRESS),
-                                          abi=DISTRIBUTION_ABI)
-
-# Uniswap ARB Config
-MOR_MULTISIG_ARB = web3_arb.to_checksum_address("0x151c2b49CdEC10B150B2763dF3d1C00D70C90956")
-
-arb_json_path_position = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'arb', 'arb_position_nft_abi.json')
-arb_json_path_factory = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'arb', 'arb_uniswap_factory_abi.json')
-arb_json_path_pool = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'arb', 'arb_pool_uniswap_abi.json')
-
-with open(arb_json_path_position, 'r') as file:
-    ARB_POSITIONS_NFT_ABI = json.load(file)
-with open(arb_json_path_factory, 'r') as file:
-    ARB_FACTORY_NFT_ABI = json.load(file)
-with open(arb_json_path_pool, 'r') as file:
-    ARB_POOL_ABI = json.load(file)
-
 UNISWAP_V3_POSITIONS_NFT_ADDRESS_ARB = '0xC36442b4a4522E871399CD717aBDD847Ab11FE88'  #NonfungiblePositionManager
 UNISWAP_V3_FACTORY_ADDRESS_ARB = '0x1F98431c8aD98523631AE4a59f267346ea31F984'  #UniswapV3Factory
 UNISWAP_POOL_ADDRESS_ARB = "0xE5Cf22EE4988d54141B77050967E1052Bd9c7F7A"
-
-arb_positions_nft_contract = web3_arb.eth.contract(address=web3_arb.to_checksum_address(UNISWAP_V3_POSITIONS_NFT_ADDRESS_ARB), abi=ARB_POSITIONS_NFT_ABI)
-arb_factory_contract = web3_arb.eth.contract(address=web3_arb.to_checksum_address(UNISWAP_V3_FACTORY_ADDRESS_ARB), abi=ARB_FACTORY_NFT_ABI)
-arb_pool_contract = web3_arb.eth.contract(address=web3_arb.to_checksum_address(UNISWAP_POOL_ADDRESS_ARB), abi=ARB_POOL_ABI)
-
-
-# Uniswap BASE Config
-MOR_MULTISIG_BASE = web3_base.to_checksum_address("0xf3ef00168dd40eae68a7e670d56c7b8724e0c183")
-base_json_path_position = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'base', 'base_position_nft_abi.json')
-base_json_path_factory = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'base', 'base_uniswap_factory_abi.json')
-base_json_path_pool = os.path.join(project_root, 'json_files', 'abi', 'uniswap', 'base', 'base_pool_uniswap_abi.json')
-
-with open(base_json_path_position, 'r') as file:
-    BASE_POSITIONS_NFT_ABI = json.load(file)
-with open(base_json_path_factory, 'r') as file:
-    BASE_FACTORY_NFT_ABI = json.load(file)
-with open(base_json_path_pool, 'r') as file:
-    BASE_POOL_ABI = json.load(file)
+MOR_MULTISIG_ARB = Web3.to_checksum_address("0x151c2b49CdEC10B150B2763dF3d1C00D70C90956")
 
 UNISWAP_V3_POSITIONS_NFT_ADDRESS_BASE = '0x03a520b32C04BF3bEEf7BEb72E919cf822Ed34f1'  #NonfungiblePositionManager
 UNISWAP_V3_FACTORY_ADDRESS_BASE = '0x33128a8fC17869897dcE68Ed026d694621f6FDfD'  #UniswapV3Factory
 UNISWAP_POOL_ADDRESS_BASE = "0x37ecD41f5a01B23a3d9bb3b4DdfEF4eD455d6fd3"
-
-base_positions_nft_contract = web3_base.eth.contract(address=web3_base.to_checksum_address(UNISWAP_V3_POSITIONS_NFT_ADDRESS_BASE), abi=BASE_POSITIONS_NFT_ABI)
-base_factory_contract = web3_base.eth.contract(address=web3_base.to_checksum_address(UNISWAP_V3_FACTORY_ADDRESS_BASE), abi=BASE_FACTORY_NFT_ABI)
-base_pool_contract = web3_base.eth.contract(address=web3_base.to_checksum_address(UNISWAP_POOL_ADDRESS_BASE), abi=BASE_POOL_ABI)
+MOR_MULTISIG_BASE = Web3.to_checksum_address("0xf3ef00168dd40eae68a7e670d56c7b8724e0c183")
+
+# Providers, ABIs and contracts are built on first use rather than at import, so importing the app costs nothing
+# and needs no network or credentials
+RPC_URLS = {
+    'ethereum': ETH_RPC_URL,
+    'arbitrum': ARB_RPC_URL,
+    'base': BASE_RPC_URL,
+}
+
+ABI_FILES = {
+    'supply': ('supply_abi.json',),
+    'distribution': ('distribution_abi.json',),
+    'erc20': ('erc_20_abi.json',),
+    'arb_positions_nft': ('uniswap', 'arb', 'arb_position_nft_abi.json'),
+    'arb_factory': ('uniswap', 'arb', 'arb_uniswap_factory_abi.json'),
+    'arb_pool': ('uniswap', 'arb', 'arb_pool_uniswap_abi.json'),
+    'base_positions_nft': ('uniswap', 'base', 'base_position_nft_abi.json'),
+    'base_factory': ('uniswap', 'base', 'base_uniswap_factory_abi.json'),
+    'base_pool': ('uniswap', 'base', 'base_pool_uniswap_abi.json'),
+}
+
+# (chain, address, ABI) of every contract the app reads
+CONTRACTS = {
+    'supply': ('ethereum', SUPPLY_PROXY_ADDRESS, 'supply'),
+    'distribution': ('ethereum', DISTRIBUTION_PROXY_ADDRESS, 'distribution'),
+    'arb_positions_nft': ('arbitrum', UNISWAP_V3_POSITIONS_NFT_ADDRESS_ARB, 'arb_positions_nft'),
+    'arb_factory': ('arbitrum', UNISWAP_V3_FACTORY_ADDRESS_ARB, 'arb_factory'),
+    'arb_pool': ('arbitrum', UNISWAP_POOL_ADDRESS_ARB, 'arb_pool'),
+    'base_positions_nft': ('base', UNISWAP_V3_POSITIONS_NFT_ADDRESS_BASE, 'base_positions_nft'),
+    'base_factory': ('base', UNISWAP_V3_FACTORY_ADDRESS_BASE, 'base_factory'),
+    'base_pool': ('base', UNISWAP_POOL_ADDRESS_BASE, 'base_pool'),
+}
+
+
+@functools.cache
+def get_abi(name: str) -> list:
+    """The contract ABI of one of ABI_FILES, read from json_files/abi once"""
+    with open(os.path.join(project_root, 'json_files', 'abi', *ABI_FILES[name]), 'r') as file:
+        return json.load(file)
+
+
+@functools.cache
+def get_web3(chain: str = 'ethereum') -> Web3:
+    return instrument_web3(Web3(Web3.HTTPProvider(RPC_URLS[chain])), chain)
+
+
+@functools.cache
+def get_async_web3(chain: str = 'ethereum') -> AsyncWeb3:
+    return instrument_web3(AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(RPC_URLS[chain])), chain)
+
+
+@functools.cache
+def get_contract(name: str):
+    """One of CONTRACTS, bound to the shared Web3 instance of its chain"""
+    chain, address, abi_name = CONTRACTS[name]
+    w3 = get_web3(chain)
+    return w3.eth.contract(address=w3.to_checksum_address(address), abi=get_abi(abi_name))
+
+
+@functools.cache
+def get_async_contract(name: str):
+    """One of CONTRACTS, bound to the shared AsyncWeb3 instance of its chain"""
+    chain, address, abi_name = CONTRACTS[name]
+    w3 = get_async_web3(chain)
+    return w3.eth.contract(address=w3.to_checksum_address(address), abi=get_abi(abi_name))
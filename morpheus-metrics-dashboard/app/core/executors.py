@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+IO_POOL_WORKERS = int(os.getenv("IO_POOL_WORKERS", "32"))
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+
+class ManagedExecutor:
+    """
+    A lazily created executor that keeps saturation statistics.
+
+    Thread pools record how long each call waited for a free worker and how many calls are running. For process
+    pools only the number of submitted-but-unfinished calls can be observed from the parent process.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.active = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'thread':
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix=f"{self.name}-pool")
+                else:
+                    # spawn keeps children free of the parent's threads and locks
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.submitted += 1
+
+        try:
+            if self.kind == 'thread':
+                result = await loop.run_in_executor(self.executor, self._timed_call, time.perf_counter(), fn, args)
+            else:
+                result = await loop.run_in_executor(self.executor, fn, *args)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.completed += 1
+        return result
+
+    def _timed_call(self, submitted_at, fn, args):
+        wait_seconds = time.perf_counter() - submitted_at
+        with self._lock:
+            self.active += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = self.submitted - self.completed
+            stats = {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": pending,
+                "saturation": round(min(pending, self.max_workers) / self.max_workers, 3),
+            }
+            if self.kind == 'thread':
+                started = self.completed + self.active
+                stats.update({
+                    "active": self.active,
+                    "queued": max(pending - self.active, 0),
+                    "average_wait_seconds": round(self.total_wait_seconds / started, 4) if started else 0.0,
+                    "max_wait_seconds": round(self.max_wait_seconds, 4),
+                })
+            return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Blocking network I/O (requests, sync web3, gspread, Dune)
+io_executor = ManagedExecutor('io', 'thread', IO_POOL_WORKERS)
+# CPU-heavy pandas analytics. Functions run here must be importable and their arguments picklable.
+cpu_executor = ManagedExecutor('cpu', 'process', CPU_POOL_WORKERS)
+
+
+async def run_blocking_io(fn, *args):
+    return await io_executor.run(fn, *args)
+
+
+async def run_cpu_bound(fn, *args):
+    return await cpu_executor.run(fn, *args)
+
+
+def executor_stats() -> dict:
+    return {executor.name: executor.stats() for executor in (io_executor, cpu_executor)}
+
+
+def shutdown_executors():
+    io_executor.shutdown()
+    cpu_executor.shutdown()
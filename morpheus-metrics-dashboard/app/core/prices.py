@@ -0,0 +1,183 @@
+"""
+Spot USD prices of the assets the metrics value, and the MOR market chart, shared by every helper.
+
+Each asset has a list of sources tried in order (see PRICE_SOURCES) and its last price is kept for PRICE_TTL
+seconds, so a refresh cycle makes at most one upstream call per asset. Concurrent readers of an expired price wait
+for the one upstream call already in flight instead of making their own. When every source fails, the last price is
+served for up to PRICE_MAX_STALE seconds, marked stale. Quotes carry their source and age for /prices.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from app.core.config import (COINGECKO_API_URL, COINGECKO_HISTORICAL_PRICES, DEXSCREENER_API_URL, PRICE_MAX_STALE,
+                             PRICE_REQUEST_TIMEOUT, PRICE_SOURCES, PRICE_TTL)
+from app.core.executors import run_blocking_io
+from app.core.rate_limits import throttle
+from app.core.telemetry import observe_price, track_upstream
+
+logger = logging.getLogger(__name__)
+
+MARKET_CHART = 'MOR market chart'
+
+
+def fetch_coingecko_price(coin_id: str):
+    throttle('coingecko')
+    with track_upstream('coingecko'):
+        response = requests.get(f"{COINGECKO_API_URL}/simple/price", params={"ids": coin_id, "vs_currencies": "usd"},
+                                timeout=PRICE_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get(coin_id, {}).get("usd")
+
+
+def fetch_dexscreener_price(token_address: str):
+    throttle('dexscreener')
+    with track_upstream('dexscreener'):
+        response = requests.get(f"{DEXSCREENER_API_URL}/latest/dex/tokens/{token_address}",
+                                timeout=PRICE_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    pairs = response.json().get('pairs') or []
+    if pairs and 'priceUsd' in pairs[0]:
+        return float(pairs[0]['priceUsd'])
+    return None
+
+
+def fetch_market_chart():
+    """Daily MOR prices and volumes from CoinGecko, {"prices": [[ms, usd], ...], "total_volumes": [...]}"""
+    throttle('coingecko')
+    with track_upstream('coingecko'):
+        response = requests.get(COINGECKO_HISTORICAL_PRICES, timeout=PRICE_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    if 'prices' not in data or 'total_volumes' not in data:
+        return None
+    return data
+
+
+SOURCE_FETCHERS = {
+    'coingecko': fetch_coingecko_price,
+    'dexscreener': fetch_dexscreener_price,
+}
+
+
+class Quote:
+    def __init__(self, value, source: str, fetched_at: float):
+        self.value = value
+        self.source = source
+        self.fetched_at = fetched_at  # Unix time
+
+
+class PriceOracle:
+    def __init__(self, sources: dict, ttl: float, max_stale: float, fetchers: dict = None, clock=time.time):
+        self.sources = sources
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.fetchers = fetchers if fetchers is not None else SOURCE_FETCHERS
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._quotes = {}  # key -> Quote
+        self._key_locks = {}
+
+    def age(self, quote: Quote) -> float:
+        return self._clock() - quote.fetched_at
+
+    def _get(self, key: str, fetch):
+        """The cached quote of key if it's fresh, else a new one from fetch() (one caller at a time per key)"""
+        quote = self._quotes.get(key)
+        if quote is not None and self.age(quote) <= self.ttl:
+            return quote
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Fetched by the caller this one waited for
+            quote = self._quotes.get(key)
+            if quote is not None and self.age(quote) <= self.ttl:
+                return quote
+
+            fetched = fetch()
+            if fetched is not None:
+                self._quotes[key] = fetched
+                observe_price(key, fetched.fetched_at)
+                return fetched
+
+        if quote is not None and self.age(quote) <= self.max_stale:
+            logger.warning(f"Serving the {key} price from {quote.source} fetched {self.age(quote):.0f}s ago")
+            return quote
+        return None
+
+    def _fetch_price(self, asset: str):
+        for source, source_id in self.sources[asset]:
+            try:
+                price = self.fetchers[source](source_id)
+            except Exception as e:
+                logger.warning(f"{asset} price from {source} failed: {str(e)}")
+                continue
+            if price is not None:
+                return Quote(price, source, self._clock())
+            logger.warning(f"{asset} price not found on {source}")
+        logger.error(f"No source returned a {asset} price")
+        return None
+
+    def quote(self, asset: str):
+        """The Quote of asset's USD price, None if it's unavailable"""
+        return self._get(asset, lambda: self._fetch_price(asset))
+
+    def price(self, asset: str):
+        quote = self.quote(asset)
+        return quote.value if quote is not None else None
+
+    def market_chart(self):
+        def fetch():
+            try:
+                chart = fetch_market_chart()
+            except Exception as e:
+                logger.warning(f"MOR market chart from coingecko failed: {str(e)}")
+                return None
+            return Quote(chart, 'coingecko', self._clock()) if chart is not None else None
+
+        quote = self._get(MARKET_CHART, fetch)
+        return quote.value if quote is not None else None
+
+    def status(self) -> dict:
+        """Price, source and age of every asset's last quote, stale once older than the TTL"""
+        report = {}
+        for asset in self.sources:
+            quote = self._quotes.get(asset)
+            if quote is None:
+                report[asset] = None
+                continue
+            report[asset] = {
+                "price": quote.value,
+                "source": quote.source,
+                "fetched_at": datetime.fromtimestamp(quote.fetched_at, timezone.utc).isoformat(),
+                "age_seconds": round(self.age(quote), 1),
+                "stale": self.age(quote) > self.ttl,
+            }
+        return report
+
+    def invalidate(self, key: str = None):
+        with self._lock:
+            if key is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(key, None)
+
+
+price_oracle = PriceOracle(PRICE_SOURCES, PRICE_TTL, PRICE_MAX_STALE)
+
+
+def get_price(asset: str):
+    """USD price of asset ('MOR', 'stETH'), None if no source has it"""
+    return price_oracle.price(asset)
+
+
+async def get_price_async(asset: str):
+    return await run_blocking_io(get_price, asset)
+
+
+def get_market_chart():
+    return price_oracle.market_chart()
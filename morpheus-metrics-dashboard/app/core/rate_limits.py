@@ -0,0 +1,81 @@
+"""
+Client-side rate limits for the upstream services, one token bucket per target (the names used by track_upstream).
+
+A bucket holds a whole quota window of requests and refills continuously, so calls go through immediately until
+the quota is nearly used up and only then wait for the tokens they need. Waiting happens outside the lock, with
+time.sleep in worker threads or asyncio.sleep in coroutines, so a throttled call never blocks an event loop or the
+other callers.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from app.core.config import RATE_LIMITS
+from app.core.telemetry import observe_throttle
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, requests: float, seconds: float, clock=time.monotonic):
+        self.capacity = float(requests)
+        self.rate = requests / seconds  # tokens per second
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take tokens, borrowing from the future if the bucket is empty, and return the seconds to wait before use"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+def parse_rate_limit(value: str):
+    """A "<requests>/<seconds>" quota as a TokenBucket, or None when it's empty (no limit)"""
+    if not value:
+        return None
+    requests, seconds = value.split('/')
+    return TokenBucket(float(requests), float(seconds))
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(target: str):
+    """The shared bucket of an upstream, or None if it has no quota configured"""
+    with _buckets_lock:
+        if target not in _buckets:
+            _buckets[target] = parse_rate_limit(RATE_LIMITS.get(target))
+        return _buckets[target]
+
+
+def reserve(target: str, requests: int) -> float:
+    bucket = get_rate_limiter(target)
+    if bucket is None:
+        return 0.0
+    wait = bucket.reserve(requests)
+    if wait > 0:
+        logger.info(f"Rate limit of {target} reached, waiting {wait:.2f}s")
+        observe_throttle(target, wait)
+    return wait
+
+
+def throttle(target: str, requests: int = 1):
+    """Wait, if needed, until `requests` more calls to target fit in its quota. For blocking code"""
+    wait = reserve(target, requests)
+    if wait > 0:
+        time.sleep(wait)
+
+
+async def throttle_async(target: str, requests: int = 1):
+    """Like throttle, for coroutines"""
+    wait = reserve(target, requests)
+    if wait > 0:
+        await asyncio.sleep(wait)
@@ -0,0 +1,431 @@
+import asyncio
+import inspect
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from apscheduler.triggers.interval import IntervalTrigger
+
+from app.core.executors import run_blocking_io
+from app.core.telemetry import observe_cache_lookup, observe_refresh_stage
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshStage:
+    """
+    One node of the cache refresh graph.
+
+    `fetch` produces the value cached under `key` and is called with the results of the stages listed in
+    `depends_on`, in that order. Plain functions are run on the I/O thread pool so they don't block the event
+    loop. Coroutine functions are awaited on the loop, unless `blocking` is set for coroutines that do blocking
+    I/O internally, in which case they get their own event loop on the I/O thread pool. `postprocess` is applied to the
+    fetched value before it is cached. `sheets` names the worksheets the fetch reads, so a refresh can download
+    them up front in one batch.
+
+    `interval` is how often the key is refreshed by its own scheduler job, with up to `jitter` added to each run
+    so jobs with the same interval don't hit the same upstream at once. A run taking longer than `timeout` is
+    abandoned and recorded as failed (work already offloaded to a thread can't be interrupted and finishes in
+    the background, but its result is discarded). A cached value older than `max_age` (by default the
+    interval plus its jitter, i.e. its scheduled refresh is overdue) is considered stale.
+    """
+
+    def __init__(self, key: str, fetch, depends_on=(), blocking: bool = False, postprocess=None, sheets=(),
+                 interval: timedelta = timedelta(hours=12), jitter: timedelta = None,
+                 timeout: timedelta = timedelta(minutes=30), max_age: timedelta = None):
+        self.key = key
+        self.fetch = fetch
+        self.depends_on = tuple(depends_on)
+        self.blocking = blocking
+        self.postprocess = postprocess
+        self.sheets = tuple(sheets)
+        self.interval = interval
+        self.jitter = jitter if jitter is not None else interval / 10
+        self.timeout = timeout
+        self.max_age = max_age if max_age is not None else self.interval + self.jitter
+
+    async def run(self, *dependency_results):
+        if self.timeout is None:
+            return await self._run(*dependency_results)
+        try:
+            return await asyncio.wait_for(self._run(*dependency_results), self.timeout.total_seconds())
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{self.key} timed out after {self.timeout}")
+
+    async def _run(self, *dependency_results):
+        if inspect.iscoroutinefunction(self.fetch):
+            if self.blocking:
+                result = await run_blocking_io(run_coroutine_in_new_loop, self.fetch, dependency_results)
+            else:
+                result = await self.fetch(*dependency_results)
+        else:
+            result = await run_blocking_io(self.fetch, *dependency_results)
+
+        if self.postprocess is not None:
+            result = self.postprocess(result)
+        return result
+
+
+def run_coroutine_in_new_loop(coroutine_function, args):
+    return asyncio.run(coroutine_function(*args))
+
+
+class StageReport:
+    def __init__(self, key: str, status: str, seconds: float = 0.0, error: str = None):
+        self.key = key
+        self.status = status  # 'ok', 'failed' or 'skipped'
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self):
+        return f"StageReport({self.key!r}, {self.status!r}, {self.seconds:.2f}s)"
+
+
+class StageState:
+    """
+    Refresh bookkeeping for a single cache key.
+
+    After consecutive failures, refreshes triggered by requests are held off for `backoff`, doubled with every
+    further failure up to `max_backoff`, so a failing upstream isn't hit again by every request in the meantime.
+    """
+
+    def __init__(self, key: str, backoff: timedelta = timedelta(seconds=30),
+                 max_backoff: timedelta = timedelta(minutes=30)):
+        self.key = key
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.running = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+        self.consecutive_failures = 0
+
+    def started(self):
+        self.running = True
+        self.last_started = datetime.now()
+
+    def finished(self, report: StageReport):
+        self.running = False
+        self.last_finished = datetime.now()
+        self.last_duration = report.seconds
+        if report.status == 'ok':
+            self.last_success = self.last_finished
+            self.last_error = None
+            self.consecutive_failures = 0
+        else:
+            self.last_error = report.error
+            self.consecutive_failures += 1
+
+    def retry_at(self):
+        """When a failing key may be refreshed again on request, None if its last refresh didn't fail"""
+        if not self.consecutive_failures or self.last_finished is None:
+            return None
+        # The exponent is capped so the delay can't overflow, it's clamped to max_backoff anyway
+        delay = self.backoff * 2 ** min(self.consecutive_failures - 1, 20)
+        return self.last_finished + min(delay, self.max_backoff)
+
+    def backing_off(self) -> bool:
+        retry_at = self.retry_at()
+        return retry_at is not None and datetime.now() < retry_at
+
+    def to_dict(self) -> dict:
+        return {
+            "running": self.running,
+            "last_started": self.last_started.isoformat() if self.last_started else None,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_at": self.retry_at().isoformat() if self.backing_off() else None,
+        }
+
+
+class RefreshFailed(Exception):
+    pass
+
+
+def validate_refresh_graph(stages):
+    """Raise ValueError for duplicate keys, unknown dependencies or dependency cycles"""
+    stages_by_key = {}
+    for stage in stages:
+        if stage.key in stages_by_key:
+            raise ValueError(f"Duplicate refresh stage: {stage.key}")
+        stages_by_key[stage.key] = stage
+
+    for stage in stages:
+        for dependency in stage.depends_on:
+            if dependency not in stages_by_key:
+                raise ValueError(f"Refresh stage {stage.key} depends on unknown stage {dependency}")
+
+    visiting, visited = set(), set()
+
+    def visit(key, path):
+        if key in visited:
+            return
+        if key in visiting:
+            raise ValueError(f"Dependency cycle in refresh graph: {' -> '.join(path + [key])}")
+        visiting.add(key)
+        for dependency in stages_by_key[key].depends_on:
+            visit(dependency, path + [key])
+        visiting.discard(key)
+        visited.add(key)
+
+    for key in stages_by_key:
+        visit(key, [])
+
+    return stages_by_key
+
+
+async def run_refresh_graph(stages, inflight: dict = None, on_stage_finished=None):
+    """
+    Run every stage concurrently, each one starting as soon as the stages it depends on have finished.
+    A failing stage doesn't stop the others; stages depending on it are skipped.
+    If `inflight` is given, every stage task is registered in it under its key while it runs, so other callers
+    can wait for the value instead of fetching it again. `on_stage_finished(report, result)` is called as soon as
+    each stage run by the graph finishes, skipped or failed (result None) or not, but not for stages joined in
+    `inflight`.
+
+    Returns (results, reports) where results maps the key of every successful stage to its value and reports
+    maps every key to its StageReport.
+    """
+    stages_by_key = validate_refresh_graph(stages)
+    tasks = {}
+    reports = {}
+
+    def finished(report: StageReport, result=None):
+        reports[report.key] = report
+        observe_refresh_stage(report)
+        if on_stage_finished is not None:
+            on_stage_finished(report, result)
+
+    async def run_stage(stage):
+        dependency_results = []
+        for dependency in stage.depends_on:
+            try:
+                dependency_results.append(await tasks[dependency])
+            except Exception:
+                finished(StageReport(stage.key, 'skipped', error=f"dependency {dependency} failed"))
+                raise RefreshFailed(f"{stage.key} skipped")
+
+        start_time = time.perf_counter()
+        try:
+            result = await stage.run(*dependency_results)
+        except Exception as e:
+            seconds = time.perf_counter() - start_time
+            logger.error(f"Refresh stage {stage.key} failed after {seconds:.2f}s: {str(e)}")
+            finished(StageReport(stage.key, 'failed', seconds, error=str(e)))
+            raise
+
+        seconds = time.perf_counter() - start_time
+        logger.info(f"Refresh stage {stage.key} finished in {seconds:.2f}s")
+        finished(StageReport(stage.key, 'ok', seconds), result)
+        return result
+
+    async def join_stage(stage, existing_task):
+        start_time = time.perf_counter()
+        try:
+            result = await asyncio.shield(existing_task)
+        except Exception as e:
+            reports[stage.key] = StageReport(stage.key, 'failed', time.perf_counter() - start_time, error=str(e))
+            raise
+        reports[stage.key] = StageReport(stage.key, 'ok', time.perf_counter() - start_time)
+        return result
+
+    for key, stage in stages_by_key.items():
+        if inflight is not None and key in inflight:
+            # Already being refreshed on its own, wait for that instead of fetching it twice
+            tasks[key] = asyncio.create_task(join_stage(stage, inflight[key]), name=f"refresh:{key}")
+            continue
+        tasks[key] = asyncio.create_task(run_stage(stage), name=f"refresh:{key}")
+        if inflight is not None:
+            register_inflight(inflight, key, tasks[key])
+
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = {key: task.result() for key, task in tasks.items() if task.exception() is None}
+    return results, reports
+
+
+def register_inflight(inflight: dict, key: str, task: asyncio.Task):
+    """Track task as the in-flight refresh of key until it finishes"""
+    inflight[key] = task
+
+    def done(finished_task):
+        if inflight.get(key) is finished_task:
+            del inflight[key]
+        if not finished_task.cancelled():
+            finished_task.exception()  # Mark the exception as retrieved, failures are logged by the stage
+
+    task.add_done_callback(done)
+
+
+def format_refresh_report(reports: dict, wall_seconds: float) -> str:
+    """A human readable per-stage timing summary, slowest stage first"""
+    lines = [f"Cache refresh finished in {wall_seconds:.2f}s "
+             f"(sum of stages {sum(report.seconds for report in reports.values()):.2f}s)"]
+    for report in sorted(reports.values(), key=lambda r: r.seconds, reverse=True):
+        line = f"{report.key}: {report.status} {report.seconds:.2f}s"
+        if report.error:
+            line += f" ({report.error})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class MetricRefresher:
+    """
+    Keeps the metrics cache up to date.
+
+    refresh_all() runs the whole refresh graph at once (used on startup), while schedule() registers every key
+    as its own scheduler job running on the key's own interval. A scheduled job takes the values of its
+    dependencies from the cache instead of recomputing them.
+
+    Refreshes are single-flight: while a key is being refreshed, every other caller asking for it (a scheduled
+    job, a request hitting a cache miss, a dependent stage) waits on the same in-flight task instead of
+    starting another upstream fetch. Requests are served stale-while-revalidate through get(): an expired
+    value is returned immediately while one background refresh runs.
+
+    `refresh_scope`, if given, is a context manager factory entered around every refresh with the sheets read by
+    the stages being refreshed, e.g. to download them together and share them between the stages.
+    """
+
+    def __init__(self, metrics_cache, stages, refresh_scope=None, backoff: timedelta = timedelta(seconds=30),
+                 max_backoff: timedelta = timedelta(minutes=30)):
+        self.metrics_cache = metrics_cache
+        self.stages = validate_refresh_graph(stages)
+        self.refresh_scope = refresh_scope or nullcontext
+        self.states = {key: StageState(key, backoff, max_backoff) for key in self.stages}
+        self._inflight = {}
+
+    async def refresh_all(self):
+        """
+        Refresh every key and return (results, reports, refresh_time). Each result is cached as soon as its stage
+        finishes, so readers don't refetch it while slower stages run and a later refresh of the key isn't
+        overwritten when the graph ends. Stages that fail keep their previously cached values.
+        """
+        for key in self.stages:
+            self.states[key].started()
+
+        def stage_finished(report: StageReport, result):
+            if report.status == 'ok':
+                self.metrics_cache.set(report.key, result, updated_at=datetime.now())
+            self.states[report.key].finished(report)
+
+        sheets = sorted({sheet for stage in self.stages.values() for sheet in stage.sheets})
+        with self.refresh_scope(sheets):
+            # Stages joined from a refresh already in flight are cached and recorded by that refresh
+            results, reports = await run_refresh_graph(self.stages.values(), inflight=self._inflight,
+                                                       on_stage_finished=stage_finished)
+
+        return results, reports, datetime.now()
+
+    def is_stale(self, key: str) -> bool:
+        updated_at = self.metrics_cache.updated_at(key)
+        if updated_at is None:
+            return True
+        return datetime.now(updated_at.tzinfo) - updated_at > self.stages[key].max_age
+
+    async def get(self, key: str):
+        """
+        Return the value for key, serving a stale value while it is refreshed in the background.
+        Only a missing key makes the caller wait, and concurrent callers share one refresh. While a failing key is
+        backing off, a stale value is served without a refresh and a missing one raises RefreshFailed.
+        """
+        backing_off = key not in self._inflight and self.states[key].backing_off()
+        if key in self.metrics_cache:
+            if self.is_stale(key):
+                observe_cache_lookup(key, 'stale')
+                if not backing_off:
+                    self._start_refresh(key)
+            else:
+                observe_cache_lookup(key, 'hit')
+            return self.metrics_cache.get(key)
+
+        observe_cache_lookup(key, 'miss')
+        if backing_off:
+            state = self.states[key]
+            raise RefreshFailed(f"{key} failed {state.consecutive_failures} times in a row ({state.last_error}), "
+                                f"retrying after {state.retry_at().isoformat()}")
+        # Both single-key and full refreshes cache the value before handing it out
+        return await asyncio.shield(self._start_refresh(key))
+
+    async def refresh_key(self, key: str) -> StageReport:
+        """Refresh a single key (or join the refresh already running) and return its StageReport"""
+        start_time = time.perf_counter()
+        try:
+            await asyncio.shield(self._start_refresh(key))
+        except Exception as e:
+            return StageReport(key, 'failed', time.perf_counter() - start_time, error=str(e))
+        return StageReport(key, 'ok', time.perf_counter() - start_time)
+
+    def _start_refresh(self, key: str) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key), name=f"refresh:{key}")
+            register_inflight(self._inflight, key, task)
+        return task
+
+    async def _refresh(self, key: str):
+        stage = self.stages[key]
+        state = self.states[key]
+        state.started()
+        start_time = time.perf_counter()
+        try:
+            dependency_results = []
+            for dependency in stage.depends_on:
+                if dependency in self.metrics_cache:
+                    dependency_results.append(self.metrics_cache.get(dependency))
+                else:
+                    dependency_results.append(await self.get(dependency))
+
+            with self.refresh_scope(stage.sheets):
+                result = await stage.run(*dependency_results)
+        except Exception as e:
+            report = StageReport(key, 'failed', time.perf_counter() - start_time, error=str(e))
+            logger.error(f"Refresh of {key} failed after {report.seconds:.2f}s: {str(e)}")
+            observe_refresh_stage(report)
+            state.finished(report)
+            raise
+
+        self.metrics_cache.set(key, result, updated_at=datetime.now())
+        report = StageReport(key, 'ok', time.perf_counter() - start_time)
+        logger.info(f"Refresh of {key} finished in {report.seconds:.2f}s")
+        observe_refresh_stage(report)
+        state.finished(report)
+        return result
+
+    def schedule(self, scheduler):
+        """Register one interval job per key. The first runs happen one interval from now."""
+        for key, stage in self.stages.items():
+            scheduler.add_job(self.refresh_key,
+                              IntervalTrigger(seconds=stage.interval.total_seconds(),
+                                              jitter=int(stage.jitter.total_seconds()) or None),
+                              args=[key], id=f"refresh:{key}", name=f"refresh {key}",
+                              max_instances=1, coalesce=True, replace_existing=True)
+
+    def status(self) -> dict:
+        return {key: state.to_dict() for key, state in self.states.items()}
+
+    def readiness(self) -> dict:
+        """Whether each key is 'warm', 'stale' or 'missing', along with its refresh state"""
+        metrics = {}
+        for key in self.stages:
+            if key not in self.metrics_cache:
+                cache_state = 'missing'
+            elif self.is_stale(key):
+                cache_state = 'stale'
+            else:
+                cache_state = 'warm'
+            updated_at = self.metrics_cache.updated_at(key)
+            metrics[key] = {
+                "state": cache_state,
+                "updated_at": updated_at.isoformat() if updated_at else None,
+                **self.states[key].to_dict()
+            }
+
+        return {
+            "ready": all(metric["state"] != 'missing' for metric in metrics.values()),
+            "metrics": metrics
+        }
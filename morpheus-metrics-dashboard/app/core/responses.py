@@ -0,0 +1,83 @@
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from app.core.cache import MetricsCache, RenderedPayload
+
+SUPPORTED_ENCODINGS = ('br', 'gzip')
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Pick the best supported Content-Encoding from an Accept-Encoding header, or 'identity'"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    best_encoding, best_quality = 'identity', 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(candidate.strip().removeprefix('W/') == opaque_tag for candidate in if_none_match.split(','))
+
+
+def is_not_modified(request: Request, rendered: RenderedPayload) -> bool:
+    """Evaluate If-None-Match (which takes precedence) and If-Modified-Since for a cached metric"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, rendered.etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            return rendered.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def cached_response(request: Request, metrics_cache: MetricsCache, key: str):
+    """
+    Serve a cached metric from its pre-rendered bytes with the best encoding the client accepts,
+    or a bodiless 304 Not Modified if the client's copy is still current.
+    Falls back to returning the value (and letting FastAPI serialize it) if it couldn't be pre-rendered.
+    """
+    rendered = metrics_cache.rendered(key)
+    if rendered is None:
+        return metrics_cache.response_value(key)
+
+    headers = {
+        'Vary': 'Accept-Encoding',
+        'ETag': rendered.etag,
+        'Last-Modified': format_datetime(rendered.last_modified, usegmt=True),
+        'Cache-Control': 'no-cache',  # Let clients keep a copy but revalidate it on every request
+    }
+
+    if is_not_modified(request, rendered):
+        return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get('accept-encoding'))
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+
+    return Response(content=rendered.encoded(encoding), media_type='application/json', headers=headers)
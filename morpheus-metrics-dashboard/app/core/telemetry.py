@@ -0,0 +1,175 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from web3.middleware import Web3Middleware
+
+from app.core.executors import executor_stats
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+UPSTREAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+REFRESH_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+http_request_duration = Histogram('morpheus_http_request_duration_seconds',
+                                  'Latency of API requests by route template, method and status code',
+                                  ['route', 'method', 'status'], buckets=REQUEST_BUCKETS)
+
+refresh_stage_duration = Histogram('morpheus_refresh_stage_duration_seconds',
+                                   'Duration of cache refresh stages by key and outcome (ok, failed, skipped)',
+                                   ['stage', 'status'], buckets=REFRESH_BUCKETS)
+refresh_stage_last_success = Gauge('morpheus_refresh_stage_last_success_timestamp_seconds',
+                                   'Unix time of the last successful refresh of each cache key', ['stage'])
+
+upstream_request_duration = Histogram('morpheus_upstream_request_duration_seconds',
+                                      'Latency of calls to upstream services by target and outcome (ok, error)',
+                                      ['target', 'outcome'], buckets=UPSTREAM_BUCKETS)
+
+upstream_throttle_seconds = Counter('morpheus_upstream_throttle_seconds',
+                                   'Time spent waiting for the client-side rate limit of each upstream', ['target'])
+
+price_last_fetched = Gauge('morpheus_price_last_fetched_timestamp_seconds',
+                           'Unix time the spot price of each asset was last fetched from an upstream', ['asset'])
+
+cache_lookups = Counter('morpheus_cache_lookups',
+                        'Metric cache lookups by key and result (hit, stale, miss)', ['key', 'result'])
+
+
+def observe_refresh_stage(report):
+    """Record a finished refresh stage from its StageReport"""
+    refresh_stage_duration.labels(report.key, report.status).observe(report.seconds)
+    if report.status == 'ok':
+        refresh_stage_last_success.labels(report.key).set_to_current_time()
+
+
+def observe_cache_lookup(key: str, result: str):
+    cache_lookups.labels(key, result).inc()
+
+
+def observe_upstream(target: str, outcome: str, seconds: float):
+    upstream_request_duration.labels(target, outcome).observe(seconds)
+
+
+def observe_throttle(target: str, seconds: float):
+    upstream_throttle_seconds.labels(target).inc(seconds)
+
+
+def observe_price(asset: str, fetched_at: float):
+    price_last_fetched.labels(asset).set(fetched_at)
+
+
+@contextmanager
+def track_upstream(target: str):
+    """Time the calls to an upstream service made inside the block, recorded as an error if it raises"""
+    start_time = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        observe_upstream(target, outcome, time.perf_counter() - start_time)
+
+
+def rpc_outcome(response) -> str:
+    return 'error' if isinstance(response, dict) and response.get('error') else 'ok'
+
+
+def rpc_metrics_middleware(chain: str):
+    """A web3 middleware class recording every JSON-RPC request as an upstream call to rpc_<chain>"""
+    target = f"rpc_{chain}"
+
+    class RpcMetricsMiddleware(Web3Middleware):
+        def wrap_make_request(self, make_request):
+            def middleware(method, params):
+                start_time = time.perf_counter()
+                outcome = 'error'
+                try:
+                    response = make_request(method, params)
+                    outcome = rpc_outcome(response)
+                    return response
+                finally:
+                    observe_upstream(target, outcome, time.perf_counter() - start_time)
+
+            return middleware
+
+        async def async_wrap_make_request(self, make_request):
+            async def middleware(method, params):
+                start_time = time.perf_counter()
+                outcome = 'error'
+                try:
+                    response = await make_request(method, params)
+                    outcome = rpc_outcome(response)
+                    return response
+                finally:
+                    observe_upstream(target, outcome, time.perf_counter() - start_time)
+
+            return middleware
+
+    return RpcMetricsMiddleware
+
+
+def instrument_web3(w3, chain: str):
+    """Add JSON-RPC call metrics to a Web3 or AsyncWeb3 instance and return it"""
+    w3.middleware_onion.add(rpc_metrics_middleware(chain), name='rpc_metrics')
+    return w3
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labelled with the matched route template
+    (e.g. /get_market_cap) rather than the raw path so the number of series stays bounded
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            http_request_duration.labels(route_path, scope['method'], str(status_code)).observe(
+                time.perf_counter() - start_time)
+
+
+class ExecutorCollector:
+    """Exposes the executor pool statistics as gauges, read at scrape time"""
+
+    GAUGES = {
+        'pending': 'Calls submitted to the pool that have not finished',
+        'active': 'Calls currently running on a worker',
+        'queued': 'Calls waiting for a free worker',
+        'saturation': 'Share of the pool workers that are busy',
+        'max_wait_seconds': 'Longest time a call waited for a free worker',
+    }
+
+    def collect(self):
+        stats = executor_stats()
+        for stat, documentation in self.GAUGES.items():
+            gauge = GaugeMetricFamily(f'morpheus_executor_{stat}', documentation, labels=['pool'])
+            for pool, pool_stats in stats.items():
+                if stat in pool_stats:
+                    gauge.add_metric([pool], pool_stats[stat])
+            yield gauge
+
+
+REGISTRY.register(ExecutorCollector())
+
+
+def render_metrics():
+    """The current metrics in the Prometheus text exposition format, with its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,101 @@
+"""
+Exact arithmetic on wei amounts (token amounts scaled by 1e18, staking multipliers by 1e25).
+
+Wei columns are Arrow decimal128(38, 0), signed 128-bit integers that NumPy has no type for. Sums split every value
+into four 32-bit limbs held in int64 columns, add each limb column on its own (no overflow below 2^31 rows) and
+recombine the limb totals as Python ints, so totals and means are exact and only the final conversion to whole
+units rounds, once.
+"""
+from decimal import Decimal, localcontext
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+WEI_TYPE = pa.decimal128(38, 0)
+# Exact integer wei amounts, too large for int64 (1e25 is a 1x multiplier)
+WEI_DTYPE = pd.ArrowDtype(WEI_TYPE)
+
+ETHER = 10 ** 18
+MULTIPLIER_ONE = 10 ** 25
+
+LIMB_BITS = 32
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+def to_wei_array(values) -> pa.Array:
+    """values (a wei Series, integers or integer strings) as one decimal128(38, 0) Arrow array"""
+    array = pa.array(values, from_pandas=True)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if array.type != WEI_TYPE:
+        array = array.cast(WEI_TYPE)
+    return array
+
+
+def wei_limbs(values) -> np.ndarray:
+    """(n, 4) int64 limbs of each value, least significant first, the last one signed. Missing values are 0"""
+    array = to_wei_array(values).fill_null(pa.scalar(0, WEI_TYPE))
+    # Every decimal128 is two little-endian 64-bit words, low then high (two's complement)
+    words = np.frombuffer(array.buffers()[1], dtype='<u8')[2 * array.offset: 2 * (array.offset + len(array))]
+    low, high = words[0::2], words[1::2].view('<i8')
+
+    limbs = np.empty((len(array), 4), dtype='int64')
+    limbs[:, 0] = low & LIMB_MASK
+    limbs[:, 1] = low >> LIMB_BITS
+    limbs[:, 2] = high & LIMB_MASK
+    limbs[:, 3] = high >> LIMB_BITS
+    return limbs
+
+
+def combine_limbs(totals) -> int:
+    return sum(int(total) << (LIMB_BITS * i) for i, total in enumerate(totals))
+
+
+def wei_sum(values, mask: np.ndarray = None) -> int:
+    """Exact total of a wei column (of the rows where mask is True), as a Python int"""
+    limbs = wei_limbs(values)
+    if mask is not None:
+        limbs = limbs[mask]
+    return combine_limbs(limbs.sum(axis=0))
+
+
+def wei_group_sums(values, keys, sort: bool = False) -> pd.Series:
+    """
+    Exact total of a wei column per key, as Python ints indexed by key (in order of first appearance, or sorted).
+    Missing keys form a group of their own
+    """
+    codes, uniques = pd.factorize(keys, sort=sort, use_na_sentinel=False)
+    totals = np.zeros((len(uniques), 4), dtype='int64')
+    np.add.at(totals, codes, wei_limbs(values))
+    return pd.Series([combine_limbs(row) for row in totals], index=uniques, dtype=object)
+
+
+def wei_mean(values, mask: np.ndarray = None, unit: int = ETHER) -> Decimal:
+    """Mean of a wei column (of the rows where mask is True) in whole units, Decimal('0') when there are no rows"""
+    count = len(values) if mask is None else int(np.count_nonzero(mask))
+    if count == 0:
+        return Decimal('0')
+    with localcontext() as context:
+        # Enough digits for any decimal128 total over any row count, the division rounds once
+        context.prec = 60
+        return Decimal(wei_sum(values, mask)) / Decimal(count * unit)
+
+
+def to_units(wei: int, decimals: int = 18) -> float:
+    """A wei amount in whole units, correctly rounded (int / int true division rounds once)"""
+    return int(wei) / 10 ** decimals
+
+
+def wei_digitize(values, edges: list) -> np.ndarray:
+    """
+    Index of the [edges[i - 1], edges[i]) bin of each value, like np.digitize(values, edges, right=False), compared
+    exactly in wei. edges are increasing wei integers
+    """
+    array = to_wei_array(values)
+    bins = np.zeros(len(array), dtype='int64')
+    for edge in edges:
+        above = pc.greater_equal(array, pa.scalar(Decimal(edge), WEI_TYPE)).fill_null(False)
+        bins += above.to_numpy(zero_copy_only=False)
+    return bins
@@ -1,30 +1,27 @@
 import json
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict
 from datetime import datetime
+from itertools import accumulate
 import pandas as pd
+from app.core.executors import run_blocking_io
 from app.core.config import (logger, USER_STAKED_SHEET_NAME,
                              USER_WITHDRAWN_SHEET_NAME,
-                             OVERPLUS_BRIDGED_SHEET_NAME, distribution_contract,
+                             OVERPLUS_BRIDGED_SHEET_NAME, get_contract,
                              MAINNET_BLOCK_1ST_JAN_2024, EMISSIONS_SHEET_NAME)
 from helpers.staking_helpers.get_emission_schedule_for_today import read_emission_schedule
 from helpers.staking_helpers.staking_main import calculate_pool_rewards_summary
 from sheets_config.google_utils import read_sheet_to_dataframe
+from app.core.wei import to_units, wei_group_sums
 
 
 def process_transactions(df):
-    balances = defaultdict(float)
-    for _, row in df.iterrows():
-        balances[row['User']] += row['Amount']
-    return balances
+    """Exact wei total of the Amount of each User, in order of first appearance"""
+    return wei_group_sums(df['Amount'], df['User']).to_dict()
 
 
-def safe_divide(df, column, divisor):
-    try:
-        df[column] = pd.to_numeric(df[column], errors='coerce')
-        df[column] = df[column] / divisor
-    except Exception as e:
-        logger.error(f"Error converting and dividing {column}: {str(e)}")
-    return df
+def daily_amounts(df, amount_column='Amount'):
+    """Exact wei total of each day, by date in ascending order"""
+    return wei_group_sums(df[amount_column], df['Timestamp'].dt.date, sort=True)
 
 
 def get_total_supply_and_staker_info():
@@ -32,9 +29,6 @@ def get_total_supply_and_staker_info():
         user_staked_df = read_sheet_to_dataframe(USER_STAKED_SHEET_NAME)
         user_withdrawn_df = read_sheet_to_dataframe(USER_WITHDRAWN_SHEET_NAME)
 
-        user_staked_df = safe_divide(user_staked_df, 'Amount', 1e18)
-        user_withdrawn_df = safe_divide(user_withdrawn_df, 'Amount', 1e18)
-
     except Exception as e:
         logger.error(f"Error reading sheets: {str(e)}")
         return OrderedDict(), {}, OrderedDict(), OrderedDict(), OrderedDict(), OrderedDict(), pd.DataFrame()
@@ -50,10 +44,6 @@ def get_total_supply_and_staker_info():
         return OrderedDict(), {}, OrderedDict(), OrderedDict(), OrderedDict(), OrderedDict(), pd.DataFrame()
 
     try:
-        # Convert Timestamp to datetime
-        user_staked_df['Timestamp'] = pd.to_datetime(user_staked_df['Timestamp'], errors='coerce')
-        user_withdrawn_df['Timestamp'] = pd.to_datetime(user_withdrawn_df['Timestamp'], errors='coerce')
-
         # Remove rows with NaT timestamps
         user_staked_df = user_staked_df.dropna(subset=['Timestamp'])
         user_withdrawn_df = user_withdrawn_df.dropna(subset=['Timestamp'])
@@ -62,26 +52,29 @@ def get_total_supply_and_staker_info():
         staked_balances = process_transactions(user_staked_df)
         withdrawn_balances = process_transactions(user_withdrawn_df)
 
-        # Calculate final balances
-        final_balances = defaultdict(float)
-        for address, amount in staked_balances.items():
-            final_balances[address] = amount - withdrawn_balances.get(address, 0)
+        # Calculate final balances, exact in wei and then in MOR
+        final_balances = {address: to_units(amount - withdrawn_balances.get(address, 0))
+                          for address, amount in staked_balances.items()}
 
-        # Aggregate data by day
+        # Aggregate data by day, in ascending date order
         user_staked_df['Date'] = user_staked_df['Timestamp'].dt.date
-        user_withdrawn_df['Date'] = user_withdrawn_df['Timestamp'].dt.date
-
-        daily_staked = user_staked_df.groupby('Date')['Amount'].sum().reset_index()
-        daily_withdrawn = user_withdrawn_df.groupby('Date')['Amount'].sum().reset_index()
-
-        # Merge daily staked and withdrawn data
-        daily_net = pd.merge(daily_staked, daily_withdrawn, on='Date', how='outer', suffixes=('_staked', '_withdrawn'))
-        daily_net = daily_net.fillna(0)
-        daily_net['Net_Staked'] = daily_net['Amount_staked'] - daily_net['Amount_withdrawn']
-        daily_net['Cumulative_Net_Staked'] = daily_net['Net_Staked'].cumsum()
-
-        # Sort by date in ascending order
-        daily_net = daily_net.sort_values('Date')
+        daily_staked = daily_amounts(user_staked_df)
+        daily_withdrawn = daily_amounts(user_withdrawn_df)
+        dates = daily_staked.index.union(daily_withdrawn.index)
+
+        # Daily totals and running totals in wei, converted to MOR once
+        staked = daily_staked.reindex(dates, fill_value=0).tolist()
+        withdrawn = daily_withdrawn.reindex(dates, fill_value=0).tolist()
+        net_staked = [amount - withdrawn_amount for amount, withdrawn_amount in zip(staked, withdrawn)]
+        cumulative_staked_by_date = [to_units(amount) for amount in accumulate(staked)]
+
+        daily_net = pd.DataFrame({
+            'Date': list(dates),
+            'Amount_staked': [to_units(amount) for amount in staked],
+            'Amount_withdrawn': [to_units(amount) for amount in withdrawn],
+            'Net_Staked': [to_units(amount) for amount in net_staked],
+            'Cumulative_Net_Staked': [to_units(amount) for amount in accumulate(net_staked)],
+        })
 
         # Create JSON outputs
         json_output = OrderedDict()
@@ -91,12 +84,11 @@ def get_total_supply_and_staker_info():
         total_staked_by_date = OrderedDict()
 
         cumulative_stakers = set()
-        cumulative_staked = 0
 
         # Create a copy of user_staked_df with unique Users only
         unique_users_staked_df = user_staked_df.drop_duplicates(subset=['User'])
 
-        for _, row in daily_net.iterrows():
+        for (_, row), cumulative_staked in zip(daily_net.iterrows(), cumulative_staked_by_date):
             date_str = row['Date'].strftime('%d/%m/%Y')
             json_output[date_str] = {
                 'Staked': round(row['Amount_staked'], 4),
@@ -108,13 +100,12 @@ def get_total_supply_and_staker_info():
             # Calculate cumulative stakers and total staked for each date using unique users
             daily_stakers = set(unique_users_staked_df[unique_users_staked_df['Date'] == row['Date']]['User'])
             cumulative_stakers.update(daily_stakers)
-            cumulative_staked += row['Amount_staked']
 
             # For total stakers, we use the cumulative unique stakers
             total_stakers_by_date[date_str] = len(cumulative_stakers)
 
             # For active stakers, we only count unique addresses with positive balances
-            unique_active_stakers = len(set(addr for addr in cumulative_stakers if final_balances[addr] > 0))
+            unique_active_stakers = len(set(addr for addr in cumulative_stakers if final_balances.get(addr, 0) > 0))
             active_stakers_by_date[date_str] = unique_active_stakers
 
             currently_staked_by_date[date_str] = round(row['Cumulative_Net_Staked'], 4)
@@ -145,29 +136,16 @@ def get_bridged_overplus_amounts_by_date():
         return OrderedDict(), pd.DataFrame()
 
     try:
-        # Convert Timestamp to datetime
-        bridged_df['Timestamp'] = pd.to_datetime(bridged_df['Timestamp'], errors='coerce')
-
         # Remove rows with NaT timestamps
         bridged_df = bridged_df.dropna(subset=['Timestamp'])
 
-        # Convert amount to string first to preserve precision
-        bridged_df['amount'] = bridged_df['amount'].astype(str)
-
-        # Convert to float after dividing by 1e18 to maintain precision
-        bridged_df['amount'] = bridged_df['amount'].apply(lambda x: float(x) / 1e18)
-
-        # Aggregate data by day
-        bridged_df['Date'] = bridged_df['Timestamp'].dt.date
-
-        # Group by date to calculate the daily bridged amount
-        daily_bridged = bridged_df.groupby('Date')['amount'].sum().reset_index()
-
-        # Calculate the cumulative bridged amount
-        daily_bridged['Cumulative_Bridged'] = daily_bridged['amount'].cumsum()
-
-        # Sort the data by date in ascending order
-        daily_bridged = daily_bridged.sort_values('Date')
+        # Exact daily and cumulative bridged amounts in wei, by date in ascending order, converted to MOR once
+        daily_wei = daily_amounts(bridged_df, 'amount')
+        daily_bridged = pd.DataFrame({
+            'Date': list(daily_wei.index),
+            'amount': [to_units(amount) for amount in daily_wei],
+            'Cumulative_Bridged': [to_units(amount) for amount in accumulate(daily_wei)],
+        })
 
         # Create JSON output
         json_output = OrderedDict()
@@ -190,8 +168,7 @@ def get_all_claim_metrics():
 
     today = datetime.today()
     emissions_data = {}
-    claimed_capital_rewards = 0
-    claimed_code_rewards = 0
+    claimed_wei = {0: 0, 1: 0}
 
     try:
         emissions_data = read_emission_schedule(today, EMISSIONS_SHEET_NAME)
@@ -201,21 +178,19 @@ def get_all_claim_metrics():
     total_code_emissions = emissions_data['total_emissions']['Code Emission']
     total_capital_emissions = emissions_data['total_emissions']['Capital Emission']
 
-    claimed_filter = distribution_contract.events.UserClaimed.create_filter(from_block=MAINNET_BLOCK_1ST_JAN_2024,
+    claimed_filter = get_contract('distribution').events.UserClaimed.create_filter(from_block=MAINNET_BLOCK_1ST_JAN_2024,
                                                                             to_block='latest')
 
     events = claimed_filter.get_all_entries()
 
+    # Claimed rewards summed exactly in wei
     for event in events:
-        amount = (event['args']['amount'] / 1e18)
         pool_id = int(event['args']['poolId'])
+        if pool_id in claimed_wei:
+            claimed_wei[pool_id] += int(event['args']['amount'])
 
-        if pool_id == 0:
-            claimed_capital_rewards += amount
-        elif pool_id == 1:
-            claimed_code_rewards += amount
-        else:
-            continue
+    claimed_capital_rewards = to_units(claimed_wei[0])
+    claimed_code_rewards = to_units(claimed_wei[1])
 
     unclaimed_capital_emissions = total_capital_emissions - claimed_capital_rewards
     unclaimed_code_emissions = total_code_emissions - claimed_code_rewards
@@ -273,3 +248,7 @@ def get_capital_metrics():
 
     else:
         print("An error occurred while processing the data.")
+
+
+async def get_capital_metrics_async():
+    return await run_blocking_io(get_capital_metrics)
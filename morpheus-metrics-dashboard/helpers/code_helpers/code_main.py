@@ -2,20 +2,19 @@ import json
 from collections import OrderedDict
 import asyncio
 from sheets_config.google_utils import read_sheet_to_dataframe
+from app.core.wei import to_units, wei_sum
 from app.core.config import USER_STAKED_SHEET_NAME, logger
 import pandas as pd
-from app.core.config import ETH_RPC_URL, DISTRIBUTION_ABI, DISTRIBUTION_PROXY_ADDRESS
+from app.core.config import get_async_contract
+from app.core.executors import run_blocking_io
+from app.core.rate_limits import throttle_async
 from web3 import AsyncWeb3
 
-w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(ETH_RPC_URL))
-
-distribution_contract = w3.eth.contract(address=w3.to_checksum_address(DISTRIBUTION_PROXY_ADDRESS),
-                                        abi=DISTRIBUTION_ABI)
-
 
 async def get_current_user_weights(wallet_address):
-    wallet_address = w3.to_checksum_address(wallet_address)
-    data = await distribution_contract.functions.usersData(wallet_address, 1).call()
+    wallet_address = AsyncWeb3.to_checksum_address(wallet_address)
+    await throttle_async('rpc_ethereum')
+    data = await get_async_contract('distribution').functions.usersData(wallet_address, 1).call()
     weights = int(data[1])
 
     return weights
@@ -56,8 +55,8 @@ async def get_active_code_contributors(contributors_list):
 
 async def get_total_weights_and_contributors():
     try:
-        # Read the data from the Google Sheets
-        user_staked_df = read_sheet_to_dataframe(USER_STAKED_SHEET_NAME)
+        # Read the data from the Google Sheets, off the event loop
+        user_staked_df = await run_blocking_io(read_sheet_to_dataframe, USER_STAKED_SHEET_NAME)
 
     except Exception as e:
         logger.error(f"Error reading sheets: {str(e)}")
@@ -71,17 +70,14 @@ async def get_total_weights_and_contributors():
         return OrderedDict(), pd.DataFrame()
 
     try:
-        # Handle any NaN or invalid data types gracefully
-        user_staked_df["PoolId"] = pd.to_numeric(user_staked_df["PoolId"], errors="coerce")
-        user_staked_df["Amount"] = pd.to_numeric(user_staked_df["Amount"], errors="coerce")
-
         # Filter out invalid rows where 'PoolId' or 'Amount' is NaN
         valid_data = user_staked_df.dropna(subset=["PoolId", "Amount"])
 
         # Get the number of unique contributors and the total amount for PoolId = 1
         contributor_addresses_list = valid_data[valid_data['PoolId'] == 1]['User'].unique()
         unique_contributors = valid_data[valid_data['PoolId'] == 1]['User'].nunique()
-        total_weights = valid_data[valid_data['PoolId'] == 1]['Amount'].sum()
+        # Total weights are summed exactly and reported in wei as a float
+        total_weights = to_units(wei_sum(valid_data['Amount'], (valid_data['PoolId'] == 1).to_numpy()), decimals=0)
 
         # Prepare JSON output
         json_output = {
@@ -1,12 +1,15 @@
 import requests
 from datetime import datetime, timedelta
 import json
-from app.core.config import GITHUB_API_KEY
+from app.core.config import GITHUB_API_KEY, GITHUB_API_URL
+from app.core.executors import run_blocking_io
+from app.core.rate_limits import throttle
+from app.core.telemetry import track_upstream
 from collections import OrderedDict
 
 
 def fetch_commits(owner, repo, token, since, until):
-    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits"
     headers = {
         "Authorization": f"token {token}",
         "Accept": "application/vnd.github.v3+json"
@@ -21,7 +24,9 @@ def fetch_commits(owner, repo, token, since, until):
 
     try:
         while True:
-            response = requests.get(url, headers=headers, params=params)
+            throttle('github')
+            with track_upstream('github'):
+                response = requests.get(url, headers=headers, params=params)
             response.raise_for_status()
 
             commits = response.json()
@@ -115,5 +120,9 @@ def get_commits_data():
     return cumulative_data
 
 
+async def get_commits_data_async():
+    return await run_blocking_io(get_commits_data)
+
+
 # if __name__ == "__main__":
 #     get_commits_data()
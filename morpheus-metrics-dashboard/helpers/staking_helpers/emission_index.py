@@ -0,0 +1,183 @@
+"""
+Date-indexed emission schedule.
+
+The Emissions sheet has one row per day with the cumulative emissions of each category up to that day. The index
+keeps those columns as date-sorted NumPy arrays next to the daily emissions (the difference to the previous day),
+and maps every day of the schedule to its row through a dense array, so any date is looked up in O(1) and a date
+range in one vectorized gather.
+"""
+import math
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from sheets_config.sheet_schemas import EMISSION_CATEGORIES
+
+TOTAL_EMISSION = 'Total Emission'
+
+# Longest date range a single query may ask for, about 20 years
+MAX_QUERY_DAYS = 7305
+
+
+def to_day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).normalize().date(), 'D')
+
+
+def finite_or_none(value: float):
+    return None if math.isnan(value) else value
+
+
+class EmissionIndex:
+    def __init__(self, days: np.ndarray, cumulative: np.ndarray, total_emission: np.ndarray,
+                 total_emission_text: list = None):
+        """days are unique and sorted, cumulative has one column per EMISSION_CATEGORIES entry"""
+        self.days = days.astype('datetime64[D]')
+        self.cumulative = cumulative.astype('float64').reshape(len(self.days), len(EMISSION_CATEGORIES))
+        self.daily = np.diff(self.cumulative, axis=0, prepend=np.zeros((1, len(EMISSION_CATEGORIES))))
+        self.total_emission = total_emission.astype('float64')
+        # The Total Emission cells as written in the sheet, served verbatim by get_historical_emissions
+        self.total_emission_text = total_emission_text if total_emission_text is not None else [
+            str(value) for value in self.total_emission]
+
+        if len(self.days):
+            self.first_day = self.days[0]
+            # Row of the last schedule day on or before each day from the first to the last one
+            span = np.arange(self.days[0], self.days[-1] + 1, dtype='datetime64[D]')
+            self._row_at = np.searchsorted(self.days, span, side='right') - 1
+        else:
+            self.first_day = None
+            self._row_at = np.empty(0, dtype='int64')
+
+    def __len__(self):
+        return len(self.days)
+
+    def rows_at(self, days: np.ndarray) -> np.ndarray:
+        """Row of the last schedule day on or before each of days, -1 for days before the schedule starts"""
+        if not len(self.days):
+            return np.full(len(days), -1)
+        offsets = (days.astype('datetime64[D]') - self.first_day).astype('int64')
+        rows = self._row_at[np.clip(offsets, 0, len(self._row_at) - 1)]
+        return np.where(offsets < 0, -1, rows)
+
+    def row_at(self, day) -> int:
+        return int(self.rows_at(np.array([to_day(day)]))[0])
+
+    def query(self, start, end=None) -> list:
+        """
+        Emissions of every day from start to end (inclusive): 'new_emissions' is what was emitted on that day (zero
+        outside the schedule) and 'total_emissions' the cumulative emissions as of that day
+        """
+        start_day = to_day(start)
+        end_day = to_day(end if end is not None else start)
+        if end_day < start_day:
+            raise ValueError("The end date is before the start date")
+        if (end_day - start_day).astype('int64') >= MAX_QUERY_DAYS:
+            raise ValueError(f"Date ranges are limited to {MAX_QUERY_DAYS} days")
+
+        days = np.arange(start_day, end_day + 1, dtype='datetime64[D]')
+        if len(self.days):
+            rows = self.rows_at(days)
+            valid = rows >= 0
+            safe_rows = np.where(valid, rows, 0)
+            on_schedule_day = valid & (self.days[safe_rows] == days)
+            new = np.where(on_schedule_day[:, None], self.daily[safe_rows], 0.0)
+            total = np.where(valid[:, None], self.cumulative[safe_rows], 0.0)
+            total_emission = np.where(valid, self.total_emission[safe_rows], 0.0)
+        else:
+            new = total = np.zeros((len(days), len(EMISSION_CATEGORIES)))
+            total_emission = np.zeros(len(days))
+
+        results = []
+        for i, day in enumerate(days.astype(date)):
+            new_emissions = {category: finite_or_none(float(new[i, j]))
+                             for j, category in enumerate(EMISSION_CATEGORIES)}
+            new_emissions[TOTAL_EMISSION] = finite_or_none(float(new[i].sum()))
+            total_emissions = {category: finite_or_none(float(total[i, j]))
+                               for j, category in enumerate(EMISSION_CATEGORIES)}
+            total_emissions[TOTAL_EMISSION] = finite_or_none(float(total_emission[i]))
+            results.append({'date': day.isoformat(), 'new_emissions': new_emissions,
+                            'total_emissions': total_emissions})
+        return results
+
+    def schedule_for(self, today) -> dict:
+        """
+        The read_emission_schedule result for today: the emissions of the last schedule day up to today, and the
+        cumulative emissions of today's row (zero if today isn't in the schedule)
+        """
+        day = to_day(today)
+        row = self.row_at(day)
+        if row < 0:
+            return {'new_emissions': {}, 'total_emissions': {}}
+
+        new_emissions = {category: float(self.daily[row, j]) for j, category in enumerate(EMISSION_CATEGORIES)}
+        new_emissions[TOTAL_EMISSION] = sum(new_emissions.values())
+
+        if self.days[row] == day:
+            total_emissions = {category: float(self.cumulative[row, j])
+                               for j, category in enumerate(EMISSION_CATEGORIES)}
+            total_emissions[TOTAL_EMISSION] = float(self.total_emission[row])
+        else:
+            total_emissions = {category: 0 for category in EMISSION_CATEGORIES}
+            total_emissions[TOTAL_EMISSION] = 0
+
+        return {'new_emissions': new_emissions, 'total_emissions': total_emissions}
+
+    def historical_totals(self, today) -> dict:
+        """The Total Emission of every schedule day up to today, latest first, keyed by dd/mm/YYYY"""
+        last_row = self.row_at(today)
+        return {self.days[row].astype(date).strftime('%d/%m/%Y'): self.total_emission_text[row]
+                for row in range(last_row, -1, -1)}
+
+    def to_table(self) -> dict:
+        """A JSON-serializable copy of the index, for the metrics cache"""
+        return {
+            'dates': [day.isoformat() for day in self.days.astype(date)],
+            'categories': list(EMISSION_CATEGORIES),
+            'cumulative': [[finite_or_none(value) for value in row] for row in self.cumulative.tolist()],
+            'total_emission': [finite_or_none(value) for value in self.total_emission.tolist()],
+        }
+
+    @classmethod
+    def from_table(cls, table: dict):
+        if table.get('categories') != EMISSION_CATEGORIES:
+            raise ValueError("Emission table categories don't match EMISSION_CATEGORIES")
+        days = np.array(table['dates'], dtype='datetime64[D]')
+        cumulative = np.array([[np.nan if value is None else value for value in row] for row in table['cumulative']],
+                              dtype='float64').reshape(len(days), len(EMISSION_CATEGORIES))
+        total_emission = np.array([np.nan if value is None else value for value in table['total_emission']],
+                                  dtype='float64')
+        return cls(days, cumulative, total_emission)
+
+
+def build_emission_index(emissions_df: pd.DataFrame) -> EmissionIndex:
+    """Index an Emissions sheet frame. Rows without a valid date are skipped, a repeated date keeps its last row"""
+    emissions_df = emissions_df.rename(columns=lambda column: str(column).strip())
+    dates = pd.to_datetime(emissions_df['Date'], format='%Y-%m-%d', errors='coerce').dt.normalize()
+
+    table = pd.DataFrame({category: pd.to_numeric(emissions_df[category], errors='coerce')
+                          for category in EMISSION_CATEGORIES})
+    table[TOTAL_EMISSION] = pd.to_numeric(emissions_df[TOTAL_EMISSION], errors='coerce')
+    table['text'] = emissions_df[TOTAL_EMISSION].to_numpy()
+    table['Date'] = dates.to_numpy()
+
+    table = table[table['Date'].notna()].sort_values('Date', kind='stable')
+    table = table.drop_duplicates('Date', keep='last')
+
+    return EmissionIndex(table['Date'].to_numpy().astype('datetime64[D]'),
+                         table[EMISSION_CATEGORIES].to_numpy(dtype='float64'),
+                         table[TOTAL_EMISSION].to_numpy(dtype='float64'),
+                         total_emission_text=table['text'].tolist())
+
+
+_table_index = (None, None)
+
+
+def emission_index_from_table(table: dict) -> EmissionIndex:
+    """The index of a cached emission table, rebuilt only when the cache holds a new table"""
+    global _table_index
+    cached_table, index = _table_index
+    if cached_table is not table:
+        index = EmissionIndex.from_table(table)
+        _table_index = (table, index)
+    return index
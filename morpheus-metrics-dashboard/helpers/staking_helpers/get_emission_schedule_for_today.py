@@ -2,14 +2,28 @@ import pandas as pd
 from typing import Dict, Union
 from datetime import datetime
 import logging
-import time
-from sheets_config.google_utils import read_sheet_to_dataframe
+from sheets_config.google_utils import read_sheet_derived
 from app.core.config import EMISSIONS_SHEET_NAME
+from helpers.staking_helpers.emission_index import EmissionIndex, build_emission_index
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def get_emission_index(sheet_name: str = EMISSIONS_SHEET_NAME) -> EmissionIndex:
+    """The emission index of a sheet, built once per sheet snapshot and shared by every reader in a refresh"""
+    try:
+        return read_sheet_derived(sheet_name, build_emission_index)
+    except Exception as e:
+        logger.error(f"Error reading Google Sheet '{sheet_name}': {str(e)}")
+        raise
+
+
+def get_emission_schedule_table() -> dict:
+    """The emission index in its JSON-serializable form, cached for the /emissions endpoint"""
+    return get_emission_index().to_table()
+
+
 def read_emission_schedule(today_date: datetime, emissions_data: Union[str, pd.DataFrame]) -> Dict:
     """
     Read the emission schedule from Google Sheets or a provided DataFrame and return processed data for the current day.
@@ -22,65 +36,21 @@ def read_emission_schedule(today_date: datetime, emissions_data: Union[str, pd.D
     Dict: Dictionary containing processed emission data
     """
     try:
-        time.sleep(5)
-        # If emissions_data is a string, assume it's a sheet name and fetch the data
+        # If emissions_data is a string, assume it's a sheet name and use its shared index
         if isinstance(emissions_data, str):
-            try:
-                emissions_df = read_sheet_to_dataframe(emissions_data)
-            except Exception as e:
-                logger.error(f"Error reading Google Sheet '{emissions_data}': {str(e)}")
-                raise
+            emission_index = get_emission_index(emissions_data)
         elif isinstance(emissions_data, pd.DataFrame):
-            emissions_df = emissions_data
+            emission_index = build_emission_index(emissions_data)
         else:
             raise ValueError("emissions_data must be either a sheet name (str) or a pandas DataFrame")
 
-        emissions_df = emissions_df.dropna(axis=1, how='all')  # Remove empty columns
-
-        # Strip whitespace from column names
-        emissions_df.columns = emissions_df.columns.str.strip()
-
-        # Convert the 'Date' column to datetime format (YYYY-MM-DD)
-        emissions_df['Date'] = pd.to_datetime(emissions_df['Date'], format='%Y-%m-%d', errors='coerce').dt.normalize()
-
-        # Normalize today's date (remove any time component)
-        today_date_normalized = pd.to_datetime(today_date).normalize()
-
-        # Filter data up to today's date
-        df_until_today = emissions_df[emissions_df['Date'] <= today_date_normalized]
-
-        if df_until_today.empty:
+        schedule = emission_index.schedule_for(today_date)
+        if not schedule['new_emissions']:
             logger.warning("No data found up to the specified date.")
-            return {'new_emissions': {}, 'total_emissions': {}}
-
-        # Calculate new emissions for today
-        last_day = df_until_today.iloc[-1]
-        previous_day = df_until_today.iloc[-2] if len(df_until_today) > 1 else pd.Series(0, index=last_day.index)
-
-        emission_categories = ['Capital Emission', 'Code Emission', 'Compute Emission', 'Community Emission',
-                               'Protection Emission']
-
-        new_emissions = {category: float(last_day[category]) - float(previous_day[category]) for category in
-                         emission_categories}
-
-        # Calculate total emissions for today
-        df_today = emissions_df[emissions_df['Date'] == today_date_normalized]
-
-        if df_today.empty:
-            total_emissions = {category: 0 for category in emission_categories}
-            total_emissions['Total Emission'] = 0
-        else:
-            total_emissions = {category: float(df_today.iloc[0][category]) for category in emission_categories}
-            total_emissions['Total Emission'] = float(df_today.iloc[0]['Total Emission'])
-
-        new_emissions['Total Emission'] = sum(new_emissions.values())
+            return schedule
 
         logger.info(f"Successfully processed emission data up to {today_date}")
-
-        return {
-            'new_emissions': new_emissions,
-            'total_emissions': total_emissions
-        }
+        return schedule
 
     except Exception as e:
         logger.error(f"Error processing emission schedule: {str(e)}")
@@ -88,45 +58,10 @@ def read_emission_schedule(today_date: datetime, emissions_data: Union[str, pd.D
 
 
 def get_historical_emissions():
-    today_date = datetime.today()
-    emissions_data = EMISSIONS_SHEET_NAME
     try:
-        time.sleep(5)
-        # If emissions_data is a string, assume it's a sheet name and fetch the data
-        if isinstance(emissions_data, str):
-            try:
-                emissions_df = read_sheet_to_dataframe(emissions_data)
-            except Exception as e:
-                logger.error(f"Error reading Google Sheet '{emissions_data}': {str(e)}")
-                raise
-        elif isinstance(emissions_data, pd.DataFrame):
-            emissions_df = emissions_data
-        else:
-            raise ValueError("emissions_data must be either a sheet name (str) or a pandas DataFrame")
-
-        emissions_df = emissions_df.dropna(axis=1, how='all')  # Remove empty columns
-
-        # Strip whitespace from column names
-        emissions_df.columns = emissions_df.columns.str.strip()
-
-        # Convert the 'Date' column to datetime format (YYYY-MM-DD)
-        emissions_df['Date'] = pd.to_datetime(emissions_df['Date'], format='%Y-%m-%d', errors='coerce').dt.normalize()
-
-        # Normalize today's date (remove any time component)
-        today_date_normalized = pd.to_datetime(today_date).normalize()
-
-        # Filter data up to today's date
-        df_until_today = emissions_df[emissions_df['Date'] <= today_date_normalized]
-
-        # Sort dataframe by date in descending order (latest to earliest)
-        df_until_today = df_until_today.sort_values('Date', ascending=False)
-
-        # Create the dictionary with dates as keys and Total Emission values
-        historical_emissions_dict = {row['Date'].strftime('%d/%m/%Y'): row['Total Emission']
-                                     for _, row in df_until_today.iterrows()}
-
-        return historical_emissions_dict
+        # Dates as dd/mm/YYYY keys, latest first, with the Total Emission values as in the sheet
+        return get_emission_index().historical_totals(datetime.today())
 
     except Exception as e:
         logger.error(f"Error processing emission schedule: {str(e)}")
-        raise
\ No newline at end of file
+        raise
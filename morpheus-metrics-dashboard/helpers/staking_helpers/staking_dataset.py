@@ -0,0 +1,81 @@
+"""
+The valid stakes of the UserMultiplier sheet, filtered and typed once per sheet snapshot.
+
+A stake is valid while it's locked: it has a lock start and end, and the end is in the future but no more than 25
+years away. Every staking metric reads the same StakingDataset, whose validity check ran against one "as of" time
+pinned when it was built, so the metrics of a refresh agree on which stakes count. Inside a sheet snapshot scope the
+dataset is built once and shared by every reader, like the sheet itself.
+"""
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import USER_MULTIPLIER_SHEET_NAME
+from sheets_config.google_utils import make_read_only, read_sheet_derived
+
+logger = logging.getLogger(__name__)
+
+MAX_LOCK_SECONDS = 25 * 365 * 24 * 60 * 60  # 25 years in seconds
+
+# Pool of the stakes whose poolId is missing in the sheet
+UNKNOWN_POOL = -1
+
+
+def valid_stake_mask(df: pd.DataFrame, now: int = None) -> np.ndarray:
+    """Whether each stake of a UserMultiplier frame is valid at now (epoch seconds). Missing lock times are invalid"""
+    current_time = int(datetime.now().timestamp()) if now is None else now
+    claim_lock_start = df['claimLockStart'].to_numpy(dtype='int64', na_value=0)
+    claim_lock_end = df['claimLockEnd'].to_numpy(dtype='int64', na_value=0)
+
+    return ((claim_lock_start != 0) & (claim_lock_end != 0) &
+            (current_time < claim_lock_end) & (claim_lock_end <= current_time + MAX_LOCK_SECONDS))
+
+
+class StakingDataset:
+    def __init__(self, stakes: pd.DataFrame, as_of: int):
+        """
+        stakes has one row per valid stake, in sheet order: Timestamp, user, wallet (an integer id per user),
+        poolId (int64, UNKNOWN_POOL if missing), multiplier (wei), claimLockStart, claimLockEnd and stake_time
+        (seconds). as_of is the epoch second the stakes were checked against
+        """
+        self.stakes = stakes
+        self.as_of = as_of
+
+    def __len__(self):
+        return len(self.stakes)
+
+    def in_pools(self, *pool_ids) -> pd.DataFrame:
+        return self.stakes[self.stakes['poolId'].isin(pool_ids)]
+
+
+def build_staking_dataset(df: pd.DataFrame, now: int = None) -> StakingDataset:
+    """The valid stakes of a UserMultiplier frame at now (epoch seconds, the current time by default)"""
+    as_of = int(datetime.now().timestamp()) if now is None else now
+    valid = valid_stake_mask(df, as_of)
+
+    users = df['user'].to_numpy()[valid]
+    claim_lock_start = df['claimLockStart'].to_numpy(dtype='int64', na_value=0)[valid]
+    claim_lock_end = df['claimLockEnd'].to_numpy(dtype='int64', na_value=0)[valid]
+
+    stakes = pd.DataFrame({
+        'Timestamp': df['Timestamp'].to_numpy()[valid],
+        'user': users,
+        'wallet': pd.factorize(users)[0],
+        'poolId': df['poolId'].to_numpy(dtype='int64', na_value=UNKNOWN_POOL)[valid],
+        'multiplier': pd.Series(df['multiplier'].array[valid]),
+        'claimLockStart': claim_lock_start,
+        'claimLockEnd': claim_lock_end,
+        'stake_time': claim_lock_end - claim_lock_start,
+    })
+    # Shared by the readers of a snapshot
+    make_read_only(stakes)
+
+    logger.info(f"{len(stakes)} of {len(df)} stakes valid as of {datetime.fromtimestamp(as_of)}")
+    return StakingDataset(stakes, as_of)
+
+
+def get_staking_dataset() -> StakingDataset:
+    """The staking dataset of the current UserMultiplier snapshot, built once per snapshot"""
+    return read_sheet_derived(USER_MULTIPLIER_SHEET_NAME, build_staking_dataset)
@@ -1,13 +1,17 @@
 import logging
+import math
 from collections import defaultdict
 from datetime import datetime, date, timedelta
-from decimal import Decimal
 import numpy as np
 import pandas as pd
-import requests
-from app.core.config import (distribution_contract, EMISSIONS_SHEET_NAME,
-                             USER_MULTIPLIER_SHEET_NAME, REWARD_SUM_SHEET_NAME)
+from app.core.config import (get_contract, EMISSIONS_SHEET_NAME,
+                             REWARD_SUM_SHEET_NAME)
+from app.core.executors import run_blocking_io, run_cpu_bound
+from app.core.prices import get_price
+from app.core.wei import to_units, wei_mean
 from helpers.staking_helpers.get_emission_schedule_for_today import read_emission_schedule
+from helpers.staking_helpers.staking_dataset import MAX_LOCK_SECONDS, StakingDataset, get_staking_dataset
+from helpers.staking_helpers.wallet_stake_distribution import STAKE_COLUMNS, build_wallet_stake_distribution
 from sheets_config.google_utils import read_sheet_to_dataframe
 
 
@@ -31,109 +35,72 @@ def get_todays_capital_emission():
     return mor_daily_emission
 
 
-def get_crypto_price(crypto_id):
-    base_url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {
-        "ids": crypto_id,
-        "vs_currencies": "usd"
+def summarize_stakers(dataset: StakingDataset) -> dict:
+    """
+    Unique stakers per pool and per day and the average stake time per pool, over the valid stakes of the staking
+    dataset. Days are in order of their first valid stake, as in the sheet.
+    """
+    pool_stakes = dataset.in_pools(0, 1)
+    pool_ids = pool_stakes['poolId'].to_numpy()
+    users = pool_stakes['wallet'].to_numpy()
+    days = pool_stakes['Timestamp'].to_numpy().astype('datetime64[D]')
+    stake_seconds = pool_stakes['stake_time'].to_numpy()
+
+    stakes = pd.DataFrame({'day': days, 'pool': pool_ids, 'user': users})
+    pool_0, pool_1 = pool_ids == 0, pool_ids == 1
+
+    stake_count = {0: int(pool_0.sum()), 1: int(pool_1.sum())}
+    total_stake_time = {0: timedelta(seconds=int(stake_seconds[pool_0].sum())),
+                        1: timedelta(seconds=int(stake_seconds[pool_1].sum()))}
+
+    # Average stake time
+    avg_stake_time = {
+        pool_id: (total_time / count if count > 0 else timedelta())
+        for pool_id, total_time in total_stake_time.items()
+        for count in [stake_count[pool_id]]
     }
 
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raises an HTTPError for bad responses
-        data = response.json()
-
-        if crypto_id in data and "usd" in data[crypto_id]:
-            return data[crypto_id]["usd"]
-        else:
-            return None
-    except requests.RequestException as e:
-        logger.info(f"An error occurred: {e}")
-        return None
-
-
-def is_valid_stake(row):
-    current_time: int = int(datetime.now().timestamp())
-    claim_lock_start = int(row['claimLockStart'])
-    claim_lock_end = int(row['claimLockEnd'])
-    twenty_years_from_now = current_time + (25 * 365 * 24 * 60 * 60)  # 25 years in seconds
+    # Combined average stake time
+    total_combined_stake_time = sum(total_stake_time.values(), timedelta())
+    total_combined_stakes = sum(stake_count.values())
+    combined_avg_stake_time = total_combined_stake_time / total_combined_stakes \
+        if total_combined_stakes > 0 else timedelta()
+
+    daily_combined = stakes.groupby('day', sort=False)['user'].nunique()
+    daily_by_pool = stakes.groupby(['day', 'pool'], sort=False)['user'].nunique().to_dict()
+    daily_unique_stakers = {
+        day.date(): {
+            'pool_0': daily_by_pool.get((day, 0), 0),
+            'pool_1': daily_by_pool.get((day, 1), 0),
+            'combined': int(combined)
+        }
+        for day, combined in daily_combined.items()
+    }
 
-    return claim_lock_start != 0 and claim_lock_end != 0 and current_time < claim_lock_end <= twenty_years_from_now
+    return {
+        'total_unique_stakers': {
+            'pool_0': len(np.unique(users[pool_0])),
+            'pool_1': len(np.unique(users[pool_1])),
+            'combined': len(np.unique(users))
+        },
+        'daily_unique_stakers': daily_unique_stakers,
+        'average_stake_time': avg_stake_time,
+        'combined_average_stake_time': combined_avg_stake_time,
+        'total_stakes': stake_count,
+    }
 
 
 def analyze_mor_stakers():
-    df = get_dataframe_from_sheet_name(USER_MULTIPLIER_SHEET_NAME)
-
-    stakers_by_pool = {0: set(), 1: set()}
-    stakers_by_pool_and_date = defaultdict(lambda: defaultdict(set))
-    total_stake_time = {0: timedelta(), 1: timedelta()}
-    stake_count = {0: 0, 1: 0}
+    dataset = get_staking_dataset()
 
-    mor_price = get_crypto_price("morpheusai")
-    eth_price = get_crypto_price("staked-ether")
-    prices = {"MOR": mor_price, "stETH": eth_price}
+    prices = {"MOR": get_price('MOR'), "stETH": get_price('stETH')}
 
     try:
-        for _, row in df.iterrows():
-            if not is_valid_stake(row):
-                continue
-
-            timestamp = pd.to_datetime(row['Timestamp']).date()
-            pool_id = int(row['poolId'])
-            user = row['user']
-
-            # Add to overall pool stakers
-            stakers_by_pool[pool_id].add(user)
-
-            # Add to date-specific pool stakers
-            stakers_by_pool_and_date[timestamp][pool_id].add(user)
-
-            # Calculate stake time
-            claim_lock_start = int(row['claimLockStart'])
-            claim_lock_end = int(row['claimLockEnd'])
-            stake_time = timedelta(seconds=claim_lock_end - claim_lock_start)
-
-            # Add to total stake time
-            total_stake_time[pool_id] += stake_time
-            stake_count[pool_id] += 1
-
+        results = summarize_stakers(dataset)
         logger.info("Successfully analyzed MOR stakers from DataFrame")
 
-        # Calculate average stake time
-        avg_stake_time = {
-            pool_id: (total_time / count if count > 0 else timedelta())
-            for pool_id, total_time in total_stake_time.items()
-            for count in [stake_count[pool_id]]
-        }
-
-        # Calculate combined average stake time
-        total_combined_stake_time = sum(total_stake_time.values(), timedelta())
-        total_combined_stakes = sum(stake_count.values())
-        combined_avg_stake_time = total_combined_stake_time / total_combined_stakes \
-            if total_combined_stakes > 0 else timedelta()
-
-        # Prepare results
-        results = {
-            'total_unique_stakers': {
-                'pool_0': len(stakers_by_pool[0]),
-                'pool_1': len(stakers_by_pool[1]),
-                'combined': len(stakers_by_pool[0] | stakers_by_pool[1])
-            },
-            'daily_unique_stakers': defaultdict(lambda: {'pool_0': 0, 'pool_1': 0, 'combined': 0}),
-            'average_stake_time': avg_stake_time,
-            'combined_average_stake_time': combined_avg_stake_time,
-            'total_stakes': stake_count,
-            'prices': prices,
-            'emissionToday': get_todays_capital_emission()
-        }
-
-        # Process daily data
-        for date, pools in stakers_by_pool_and_date.items():
-            results['daily_unique_stakers'][date] = {
-                'pool_0': len(pools[0]),
-                'pool_1': len(pools[1]),
-                'combined': len(pools[0] | pools[1])
-            }
+        results['prices'] = prices
+        results['emissionToday'] = get_todays_capital_emission()
 
     except Exception as e:
         logger.error(f"Unexpected error when analyzing MOR stakers from DataFrame: {str(e)}")
@@ -142,40 +109,23 @@ def analyze_mor_stakers():
     return results
 
 
-def calculate_average_multipliers():
-    df = get_dataframe_from_sheet_name(USER_MULTIPLIER_SHEET_NAME)
-
-    try:
-        # Filter valid stakes
-        valid_df = df[df.apply(is_valid_stake, axis=1)]
-
-        # Convert multiplier from wei to whole units
-        valid_df['multiplier'] = valid_df['multiplier'].apply(lambda x: Decimal(x) / Decimal('1e18'))
-
-        # Calculate overall average
-        total_multiplier = valid_df['multiplier'].sum()
-        total_count = len(valid_df)
-        average_multiplier = total_multiplier / total_count if total_count > 0 else Decimal('0')
+def average_multipliers(dataset: StakingDataset) -> dict:
+    """Exact means of the valid stakes' wei multipliers in whole units, overall and per pool"""
+    multiplier = dataset.stakes['multiplier']
+    pool_id = dataset.stakes['poolId'].to_numpy()
 
-        # Calculate average for capital pool (poolId = 0)
-        capital_df = valid_df[valid_df['poolId'] == '0']
-        capital_multiplier = capital_df['multiplier'].sum()
-        capital_count = len(capital_df)
-        average_capital_multiplier = capital_multiplier / capital_count if capital_count > 0 else Decimal('0')
+    return {
+        'overall_average': wei_mean(multiplier),
+        'capital_average': wei_mean(multiplier, pool_id == 0),
+        'code_average': wei_mean(multiplier, pool_id == 1)
+    }
 
-        # Calculate average for code pool (poolId = 1)
-        code_df = valid_df[valid_df['poolId'] == '1']
-        code_multiplier = code_df['multiplier'].sum()
-        code_count = len(code_df)
-        average_code_multiplier = code_multiplier / code_count if code_count > 0 else Decimal('0')
 
+def calculate_average_multipliers():
+    try:
+        multipliers = average_multipliers(get_staking_dataset())
         logger.info("Successfully calculated average multipliers from DataFrame")
-
-        return {
-            'overall_average': average_multiplier,
-            'capital_average': average_capital_multiplier,
-            'code_average': average_code_multiplier
-        }
+        return multipliers
 
     except Exception as e:
         logger.error(f"Unexpected error when calculating average multipliers: {str(e)}")
@@ -213,140 +163,166 @@ def calculate_pool_rewards_summary():
 
 
 def get_wallet_stake_info():
-    df = get_dataframe_from_sheet_name(USER_MULTIPLIER_SHEET_NAME)
-
-    wallet_info = {
-        'combined': {},
-        'capital': {},
-        'code': {}
-    }
-
-    for _, row in df.iterrows():
-        if not is_valid_stake(row):
-            continue
-
-        wallet = row['user']
-        pool_id = int(row['poolId'])
-
-        # Calculate stake time
-        claim_lock_start = int(row['claimLockStart'])
-        claim_lock_end = int(row['claimLockEnd'])
-        stake_time = timedelta(seconds=claim_lock_end - claim_lock_start)
-
-        # Get power multiplier, handling scientific notation
-        power_multiplier = int(float(row['multiplier']))
-
-        # Update wallet info for combined and specific pool
-        for key in ['combined', 'capital' if pool_id == 0 else 'code']:
-            if wallet not in wallet_info[key] or stake_time > wallet_info[key][wallet]['stake_time']:
-                wallet_info[key][wallet] = {
-                    'stake_time': stake_time,
-                    'power_multiplier': power_multiplier
-                }
-
-    def process_pool_data(pool_data):
-        stake_times = np.array([v["stake_time"].total_seconds() for v in pool_data.values()])
-        power_multipliers = np.array([v["power_multiplier"] / 1e25 for v in pool_data.values()])
-
-        year_in_seconds = 365.25 * 24 * 60 * 60
-        stake_times_in_years = stake_times / year_in_seconds
-
-        def bin_data_custom_ranges(data, bins, right=True):
-            bin_indices = np.digitize(data, bins, right=right)
-            frequencies = np.bincount(bin_indices, minlength=len(bins))[1:]
-            ranges = [[float(bins[i]), float(bins[i + 1]) if i < len(bins) - 2 else None] for i in range(len(bins) - 1)]
-            return ranges, frequencies.tolist()
-
-        stake_time_bins_years = [0, 1, 2, 3, 4, 5, 6, 1000]  # Using 1000 years as an effective "infinity"
-        stake_time_ranges, stake_time_frequencies = bin_data_custom_ranges(stake_times_in_years, stake_time_bins_years)
-
-        # Define the specific power multiplier ranges we want
-        power_multiplier_bins = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, float('inf')]
-        power_multiplier_ranges, power_multiplier_frequencies = bin_data_custom_ranges(
-            power_multipliers,
-            power_multiplier_bins,
-            right=False  # Changed to False to make ranges inclusive on the left
-        )
-
-        return {
-            "stake_time": {
-                "ranges": stake_time_ranges,
-                "frequencies": stake_time_frequencies
-            },
-            "power_multiplier": {
-                "ranges": power_multiplier_ranges,
-                "frequencies": power_multiplier_frequencies
-            }
-        }
+    return build_wallet_stake_distribution(get_staking_dataset().stakes)
 
-    output = {
-        "combined": process_pool_data(wallet_info['combined']),
-        "capital": process_pool_data(wallet_info['capital']),
-        "code": process_pool_data(wallet_info['code'])
-    }
 
-    return output
+async def get_wallet_stake_info_async():
+    # Sheet download on the I/O pool, the per-wallet analytics on the CPU pool
+    dataset = await run_blocking_io(get_staking_dataset)
+    return await run_cpu_bound(build_wallet_stake_distribution, dataset.stakes[STAKE_COLUMNS])
 
 
 ##################################################### APY REWARD CALCULATIONS ##########################################
 def get_virtual_steth_pool(pool_id):
-    pools_data = distribution_contract.functions.poolsData(pool_id).call()
-    return pools_data[2] / 1e18
+    pools_data = get_contract('distribution').functions.poolsData(pool_id).call()
+    return to_units(pools_data[2])
 
 
-def calculate_power_factor(staking_period_days):
-    # Convert days to years
-    years = staking_period_days // 365
+# Static power factors of stakes locked for 0 to 6 whole years, longer locks use the last one
+POWER_FACTORS = [1, 2.12, 4.17, 6.08, 7.82, 9.35, 10.67]
+STAKING_PERIODS = [0, 365, 730, 1095, 1460, 1825, 2190]  # 0, 1 year, 2 years, 3 years, 4 years, 5 years, 6 years
+# Longest staking period (days) with an APY, the longest lock a stake can have
+MAX_STAKING_PERIOD_DAYS = MAX_LOCK_SECONDS // (24 * 60 * 60)
+# Most staking periods a single /apy query may ask for
+MAX_APY_PERIODS = 10000
+# Largest /apy deposit (stETH), beyond the whole ETH supply
+MAX_APY_DEPOSIT = 10 ** 9
 
-    # Define static multipliers for years 0-6
-    multipliers = [1, 2.12, 4.17, 6.08, 7.82, 9.35, 10.67]
 
-    # If years is greater than 6, use the last multiplier
-    if years >= 6:
-        return multipliers[-1]
-    else:
-        return multipliers[years]
+def calculate_power_factor(staking_period_days) -> np.ndarray:
+    """Power factor of each staking period (days), by whole years locked"""
+    try:
+        days = np.asarray(staking_period_days, dtype='int64')
+    except OverflowError:
+        raise ValueError("Staking periods must fit in 64 bits")
+    if (days < 0).any():
+        raise ValueError("Staking periods can't be negative")
+    # Locks of 6 years or more use the last multiplier
+    return np.asarray(POWER_FACTORS)[np.minimum(days // 365, len(POWER_FACTORS) - 1)]
+
+
+def get_reward_inputs() -> dict:
+    """The emission, prices and capital pool state the stETH reward estimates are computed from, fetched together"""
+    reward_inputs = {
+        'mor_daily_emission': get_todays_capital_emission(),
+        'mor_price': get_price('MOR'),
+        'steth_price': get_price('stETH'),
+        'total_virtual_steth': get_virtual_steth_pool(0),
+    }
+    missing = [name for name, value in reward_inputs.items() if value is None]
+    if missing:
+        raise ValueError(f"Reward inputs unavailable: {', '.join(missing)}")
+    if reward_inputs['total_virtual_steth'] <= 0:
+        raise ValueError("The capital pool has no virtual stETH")
+    return reward_inputs
+
+
+def calculate_mor_rewards(reward_inputs: dict, staking_period_days, deposit: float = None):
+    """
+    APY and daily MOR rewards of stETH staked for each of staking_period_days, as arrays. Without a deposit they
+    are those of 1 stETH, too small to change the pool; with one, those of the whole deposit, which joins the pool
+    """
+    power_factor = calculate_power_factor(staking_period_days)
 
+    mor_daily_emission = reward_inputs['mor_daily_emission']
+    mor_price = reward_inputs['mor_price']
+    eth_price = reward_inputs['steth_price']
+    total_virtual_steth = reward_inputs['total_virtual_steth']
+
+    if deposit is None:
+        # Calculate APR
+        apr = (mor_daily_emission * 365 * mor_price * power_factor) / (total_virtual_steth * eth_price)
+        # Calculate daily MOR rewards per 1 deposited stETH
+        daily_mor_rewards = (mor_daily_emission * power_factor) / total_virtual_steth
+    else:
+        # The deposit's share of the pool, its virtual stETH included
+        virtual_deposit = deposit * power_factor
+        daily_mor_rewards = mor_daily_emission * virtual_deposit / (total_virtual_steth + virtual_deposit)
+        apr = (daily_mor_rewards * 365 * mor_price) / (deposit * eth_price)
 
-def calculate_mor_rewards(mor_daily_emission, staking_period_days, mor_price, eth_price):
-    total_virtual_steth = get_virtual_steth_pool(0)
-    # Calculate power factor
-    power_factor = calculate_power_factor(staking_period_days)
-    # Calculate APR
-    apr = (mor_daily_emission * 365 * mor_price * power_factor) / (total_virtual_steth * eth_price)
     # Calculate APY assuming compounding once per year
     apy = (1 + apr) ** 1 - 1
-    # Calculate daily MOR rewards per 1 deposited stETH
-    daily_mor_rewards = (mor_daily_emission * power_factor) / total_virtual_steth
     return apy, daily_mor_rewards
 
 
-def give_more_reward_response():
-    mor_daily_emission = get_todays_capital_emission()
-
-    staking_periods = [0, 365, 730, 1095, 1460, 1825, 2190]  # 0, 1 year, 2 years, 3 years, 4 years, 5 years, 6 years
+def give_more_reward_response(reward_inputs: dict = None):
+    if reward_inputs is None:
+        reward_inputs = get_reward_inputs()
 
-    mor_price = get_crypto_price("morpheusai")
-    eth_price = get_crypto_price("staked-ether")  # stETH address
+    apy, daily_mor_rewards = calculate_mor_rewards(reward_inputs, STAKING_PERIODS)
 
     rewards_data = {
         "apy_per_steth": [],
         "daily_mor_rewards_per_steth": []
     }
 
-    for period in staking_periods:
-        apy, daily_mor_rewards = calculate_mor_rewards(mor_daily_emission, period, mor_price, eth_price)
+    for i, period in enumerate(STAKING_PERIODS):
         rewards_data["apy_per_steth"].append({
             "staking_period": period,
-            "apy": f"{apy:.2%}"
+            "apy": f"{apy[i]:.2%}"
         })
         rewards_data["daily_mor_rewards_per_steth"].append({
             "staking_period": period,
-            "daily_mor_rewards": f"{daily_mor_rewards:.6f}"
+            "daily_mor_rewards": f"{daily_mor_rewards[i]:.6f}"
         })
     return rewards_data
 
 
+def staking_periods_from_query(periods: str = None, max_days: int = None, step: int = 1) -> list:
+    """
+    The staking periods of an /apy query: a comma-separated list of days, every step days from 0 to max_days, or
+    STAKING_PERIODS. Periods go from 0 to MAX_STAKING_PERIOD_DAYS. Raises ValueError for invalid or too many periods
+    """
+    if periods is not None:
+        parts = [period for period in periods.split(',') if period.strip()]
+        if len(parts) > MAX_APY_PERIODS:
+            raise ValueError(f"At most {MAX_APY_PERIODS} staking periods")
+        try:
+            staking_periods = [int(period) for period in parts]
+        except ValueError:
+            raise ValueError("periods must be a comma-separated list of days")
+    elif max_days is not None:
+        if step < 1:
+            raise ValueError("step must be at least 1 day")
+        if not 0 <= max_days <= MAX_STAKING_PERIOD_DAYS:
+            raise ValueError(f"max_days must be between 0 and {MAX_STAKING_PERIOD_DAYS}")
+        staking_periods = list(range(0, max_days + 1, step))
+    else:
+        staking_periods = STAKING_PERIODS
+
+    if not staking_periods:
+        raise ValueError("No staking periods")
+    if len(staking_periods) > MAX_APY_PERIODS:
+        raise ValueError(f"At most {MAX_APY_PERIODS} staking periods")
+    if not 0 <= min(staking_periods) <= max(staking_periods) <= MAX_STAKING_PERIOD_DAYS:
+        raise ValueError(f"Staking periods must be between 0 and {MAX_STAKING_PERIOD_DAYS} days")
+    return staking_periods
+
+
+def deposit_from_query(deposit: float = None):
+    """The stETH deposit of an /apy query, None for 1 stETH. Raises ValueError unless it's in (0, MAX_APY_DEPOSIT]"""
+    if deposit is not None and not (math.isfinite(deposit) and 0 < deposit <= MAX_APY_DEPOSIT):
+        raise ValueError(f"deposit must be a positive amount of stETH, at most {MAX_APY_DEPOSIT}")
+    return deposit
+
+
+def apy_curve(reward_inputs: dict, staking_periods: list, deposit: float = None) -> dict:
+    """APY (as a fraction) and daily MOR rewards for every staking period, one list per column, with the inputs"""
+    apy, daily_mor_rewards = calculate_mor_rewards(reward_inputs, staking_periods, deposit)
+    return {
+        "inputs": reward_inputs,
+        "deposit": deposit,
+        "staking_period": list(staking_periods),
+        "power_factor": calculate_power_factor(staking_periods).tolist(),
+        "apy": apy.tolist(),
+        "daily_mor_rewards": daily_mor_rewards.tolist(),
+    }
+
+
+async def give_more_reward_response_async(reward_inputs: dict = None):
+    return await run_blocking_io(give_more_reward_response, reward_inputs)
+
+
 async def get_analyze_mor_master_dict():
     staker_analysis = analyze_mor_stakers()
     multiplier_analysis = calculate_average_multipliers()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from app.core.wei import MULTIPLIER_ONE, wei_digitize
+
+# Kept free of Sheets and web3 imports so it can run in the CPU process pool
+
+# The staking dataset columns build_wallet_stake_distribution reads, all a CPU pool worker needs to be sent
+STAKE_COLUMNS = ['wallet', 'poolId', 'multiplier', 'stake_time']
+
+YEAR_IN_SECONDS = 365.25 * 24 * 60 * 60
+STAKE_TIME_BINS_YEARS = [0, 1, 2, 3, 4, 5, 6, 1000]  # Using 1000 years as an effective "infinity"
+# The specific power multiplier ranges we want
+POWER_MULTIPLIER_BINS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, float('inf')]
+# The finite bin edges in wei, so multipliers are binned exactly
+POWER_MULTIPLIER_EDGES = [edge * MULTIPLIER_ONE for edge in POWER_MULTIPLIER_BINS[:-1]]
+
+
+def bin_data_custom_ranges(data, bins, right=True):
+    return bin_frequencies(np.digitize(data, bins, right=right), bins)
+
+
+def bin_frequencies(bin_indices, bins):
+    """Ranges and counts of the bins, from the np.digitize index of every value"""
+    frequencies = np.bincount(bin_indices, minlength=len(bins))[1:]
+    ranges = [[float(bins[i]), float(bins[i + 1]) if i < len(bins) - 2 else None] for i in range(len(bins) - 1)]
+    return ranges, frequencies.tolist()
+
+
+def longest_stake_per_wallet(stakes: pd.DataFrame) -> pd.DataFrame:
+    """The longest stake of each wallet, the first one in sheet order on ties"""
+    if stakes.empty:
+        return stakes
+    return stakes.loc[stakes.groupby('wallet', sort=False)['stake_time'].idxmax()]
+
+
+def process_pool_data(stakes: pd.DataFrame) -> dict:
+    stake_times_in_years = stakes['stake_time'].to_numpy(dtype='float64') / YEAR_IN_SECONDS
+    stake_time_ranges, stake_time_frequencies = bin_data_custom_ranges(stake_times_in_years, STAKE_TIME_BINS_YEARS)
+
+    # Ranges inclusive on the left
+    power_multiplier_ranges, power_multiplier_frequencies = bin_frequencies(
+        stakes['power_multiplier_bin'].to_numpy(dtype='int64'), POWER_MULTIPLIER_BINS)
+
+    return {
+        "stake_time": {
+            "ranges": stake_time_ranges,
+            "frequencies": stake_time_frequencies
+        },
+        "power_multiplier": {
+            "ranges": power_multiplier_ranges,
+            "frequencies": power_multiplier_frequencies
+        }
+    }
+
+
+def build_wallet_stake_distribution(stakes: pd.DataFrame) -> dict:
+    """
+    Longest stake per wallet, binned by stake time and power multiplier, for all pools and per pool, from the valid
+    stakes of the staking dataset
+    """
+    pool_id = stakes['poolId'].to_numpy(dtype='int64')
+    known = (pool_id >= 0) & stakes['multiplier'].notna().to_numpy()
+
+    stakes = pd.DataFrame({
+        'wallet': stakes['wallet'].to_numpy()[known],
+        'stake_time': stakes['stake_time'].to_numpy(dtype='int64')[known],
+        'power_multiplier_bin': wei_digitize(stakes['multiplier'][known], POWER_MULTIPLIER_EDGES),
+    })
+    capital = pool_id[known] == 0
+
+    output = {
+        "combined": process_pool_data(longest_stake_per_wallet(stakes)),
+        "capital": process_pool_data(longest_stake_per_wallet(stakes[capital])),
+        "code": process_pool_data(longest_stake_per_wallet(stakes[~capital]))
+    }
+
+    return output
@@ -4,17 +4,18 @@ from datetime import datetime
 from web3 import Web3
 from pathlib import Path
 import sys
-from app.core.config import (erc20_abi, ARB_RPC_URL, MOR_ARBITRUM_ADDRESS, BURN_FROM_ADDRESS, BURN_TO_ADDRESS,
+from app.core.config import (get_abi, ARB_RPC_URL, MOR_ARBITRUM_ADDRESS, BURN_FROM_ADDRESS, BURN_TO_ADDRESS,
                              SAFE_ADDRESS, BURN_START_BLOCK)
+from app.core.telemetry import instrument_web3
 
 
 def set_web3_on_arbitrum():
-    w3 = Web3(Web3.HTTPProvider(ARB_RPC_URL))  # ARBITRUM CONNECTION
+    w3 = instrument_web3(Web3(Web3.HTTPProvider(ARB_RPC_URL)), 'arbitrum')  # ARBITRUM CONNECTION
 
     if not w3.is_connected():
         raise ConnectionError("Failed to connect to Arbitrum via Alchemy")
 
-    token_contract = w3.eth.contract(address=w3.to_checksum_address(MOR_ARBITRUM_ADDRESS), abi=erc20_abi)
+    token_contract = w3.eth.contract(address=w3.to_checksum_address(MOR_ARBITRUM_ADDRESS), abi=get_abi('erc20'))
 
     return w3, token_contract
 
@@ -1,7 +1,6 @@
 import json
 from collections import OrderedDict
 from datetime import datetime
-import pandas as pd
 from sheets_config.google_utils import read_sheet_to_dataframe
 from app.core.config import EMISSIONS_SHEET_NAME
 import logging
@@ -24,9 +23,6 @@ def get_total_supply_from_emissions_df():
         return OrderedDict()
 
     try:
-        # Convert the Date column to datetime for comparison
-        emissions_df['Date'] = pd.to_datetime(emissions_df['Date'])
-
         # Get the current date
         current_date = datetime.utcnow().date()
 
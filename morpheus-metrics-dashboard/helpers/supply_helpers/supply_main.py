@@ -4,16 +4,16 @@ from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Tuple, List, Dict
-import httpx
-import pandas as pd
-import requests
 from dune_client.client import DuneClient
 from dune_client.models import DuneError
 
 from app.core.config import logger
-from app.core.config import (supply_contract, distribution_contract,
-                             MAINNET_BLOCK_1ST_JAN_2024, DEXSCREENER_URL, COINGECKO_HISTORICAL_PRICES,
-                             DUNE_API_KEY, DUNE_QUERY_ID, IMPLIED_PRICES_JSON, CIRC_SUPPLY_SHEET_NAME)
+from app.core.executors import run_blocking_io
+from app.core.prices import get_market_chart, get_price_async
+from app.core.rate_limits import throttle_async
+from app.core.telemetry import track_upstream
+from app.core.config import (get_contract, MAINNET_BLOCK_1ST_JAN_2024,
+                             DUNE_API_KEY, DUNE_API_URL, DUNE_QUERY_ID, IMPLIED_PRICES_JSON, CIRC_SUPPLY_SHEET_NAME)
 from helpers.supply_helpers.get_burnt_and_locked_arbitrum import get_locked_amounts, get_burned_amounts
 from helpers.supply_helpers.get_historical_total_supply import get_total_supply_from_emissions_df
 from sheets_config.google_utils import read_sheet_to_dataframe
@@ -80,9 +80,6 @@ def get_historical_circulating_supply(earliest_date: str) -> dict:
         # Read the CircSupply sheet data
         df = read_sheet_to_dataframe(CIRC_SUPPLY_SHEET_NAME)
 
-        # Convert date strings to datetime objects
-        df['date'] = pd.to_datetime(df['date'], format='%d/%m/%Y')
-
         # Filter data from the earliest_date onwards
         earliest_date = datetime.strptime(earliest_date, '%d/%m/%Y')
         df = df[df['date'] >= earliest_date]
@@ -118,9 +115,9 @@ async def get_historical_prices_and_trading_volume():
     json_volumes = {datetime.strptime(item[0], '%d/%m/%Y'): item[1] for item in json_data['total_volumes']}
 
     # Fetch data from API
-    async with httpx.AsyncClient() as client:
-        response = await client.get(COINGECKO_HISTORICAL_PRICES)
-        api_data = response.json()
+    api_data = await run_blocking_io(get_market_chart)
+    if api_data is None:
+        raise ValueError("MOR market chart unavailable")
 
     def process_data(api_points: List[Tuple[int, float]], json_points: Dict[datetime, float]) -> List[List]:
         aggregated_data = defaultdict(list)
@@ -166,7 +163,7 @@ async def get_current_total_supply() -> float:
     loop = asyncio.get_running_loop()
     with ThreadPoolExecutor() as pool:
         total_supply = await loop.run_in_executor(pool,
-                                                  supply_contract.functions.getTotalRewards().call)
+                                                  get_contract('supply').functions.getTotalRewards().call)
 
         return round((total_supply / 10 ** 18), 4)
 
@@ -174,7 +171,7 @@ async def get_current_total_supply() -> float:
 async def get_current_circulating_supply() -> float:
     circulating_supply = 0
 
-    event_filter = distribution_contract.events.UserClaimed.create_filter(
+    event_filter = get_contract('distribution').events.UserClaimed.create_filter(
         from_block=MAINNET_BLOCK_1ST_JAN_2024,
         to_block='latest',
     )
@@ -189,14 +186,8 @@ async def get_current_circulating_supply() -> float:
 
 
 async def get_current_mor_price() -> float:
-    response = requests.get(DEXSCREENER_URL)
-
-    if response.status_code == 200:
-        data = response.json()
-        mor_price = float(data['pairs'][0]['priceUsd'])
-    else:
-        mor_price = 0.0
-    return mor_price
+    mor_price = await get_price_async('MOR')
+    return mor_price if mor_price is not None else 0.0
 
 
 async def get_historical_locked_and_burnt_mor():
@@ -220,9 +211,11 @@ async def get_historical_locked_and_burnt_mor():
     return locked_and_burnt_mor
 
 
-async def get_market_cap():
+async def get_market_cap(locked_and_burnt_mor=None):
     try:
-        locked_and_burnt_mor = await get_historical_locked_and_burnt_mor()
+        # Reuse the locked and burnt amounts when the caller already has them, the event scans are expensive
+        if locked_and_burnt_mor is None:
+            locked_and_burnt_mor = await get_historical_locked_and_burnt_mor()
 
         # Ensure we're working with dictionaries
         if not isinstance(locked_and_burnt_mor, dict):
@@ -264,10 +257,12 @@ async def get_mor_holders():
     try:
         dune = DuneClient(
             api_key=DUNE_API_KEY,
-            base_url="https://api.dune.com",
+            base_url=DUNE_API_URL,
             request_timeout=300
         )
-        token_holders = dune.get_latest_result(DUNE_QUERY_ID)
+        await throttle_async('dune')
+        with track_upstream('dune'):
+            token_holders = dune.get_latest_result(DUNE_QUERY_ID)
         holders_data = token_holders.result.rows
 
         ranges = [
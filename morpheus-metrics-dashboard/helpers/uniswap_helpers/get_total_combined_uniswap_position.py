@@ -1,22 +1,7 @@
-import requests
 from helpers.uniswap_helpers.get_uniswap_position_arb import get_arb_protocol_liquidity
 from helpers.uniswap_helpers.get_uniswap_position_base import get_base_protocol_liquidity
-from app.core.config import MOR_ARBITRUM_ADDRESS, STETH_TOKEN_ADDRESS
-
-DEX_API_URL = "https://api.dexscreener.io/latest/dex/tokens/{}"
-
-
-def fetch_token_price(token_address):
-    """Fetches the token price in USD from the Dex Screener API."""
-    api_url = DEX_API_URL.format(token_address)
-    response = requests.get(api_url)
-
-    if response.status_code == 200:
-        data = response.json()
-        if 'pairs' in data and len(data['pairs']) > 0 and 'priceUsd' in data['pairs'][0]:
-            return float(data['pairs'][0]['priceUsd'])
-
-    return None
+from app.core.executors import run_blocking_io
+from app.core.prices import get_price
 
 
 def get_combined_uniswap_position():
@@ -36,8 +21,8 @@ def get_combined_uniswap_position():
     total_mor_balance = float(arb_mor_balance + base_mor_balance)
     total_eth_balance = float(arb_eth_balance + base_eth_balance)
 
-    mor_price = fetch_token_price(MOR_ARBITRUM_ADDRESS)
-    steth_price = fetch_token_price(STETH_TOKEN_ADDRESS)
+    mor_price = get_price('MOR')
+    steth_price = get_price('stETH')
 
     data = {}
 
@@ -69,4 +54,8 @@ def get_combined_uniswap_position():
         "base_pool_usd_value": (base_mor_balance * mor_price) + (base_eth_balance * steth_price)
     }
 
-    return data
\ No newline at end of file
+    return data
+
+
+async def get_combined_uniswap_position_async():
+    return await run_blocking_io(get_combined_uniswap_position)
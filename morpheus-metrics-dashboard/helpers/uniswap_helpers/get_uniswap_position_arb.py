@@ -1,16 +1,14 @@
 import math
 from collections import defaultdict
-import requests
-from app.core.config import (STETH_TOKEN_ADDRESS, MOR_ARBITRUM_ADDRESS,
-                             arb_positions_nft_contract, arb_pool_contract, MOR_MULTISIG_ARB)
+from app.core.config import get_contract, MOR_MULTISIG_ARB
 
 
 def fetch_all_nfts(address):
     """Fetches all NFTs owned by the address."""
-    balance = arb_positions_nft_contract.functions.balanceOf(address).call()
+    balance = get_contract('arb_positions_nft').functions.balanceOf(address).call()
     nfts = []
     for i in range(balance):
-        token_id = arb_positions_nft_contract.functions.tokenOfOwnerByIndex(address, i).call()
+        token_id = get_contract('arb_positions_nft').functions.tokenOfOwnerByIndex(address, i).call()
         nfts.append(token_id)
     return nfts
 
@@ -36,7 +34,7 @@ def calculate_amounts(liquidity, sqrt_price_x96, tick_current, tick_lower, tick_
 
 def get_asset_balances(token_id):
     """Fetches the asset balances for a specific NFT position."""
-    position = arb_positions_nft_contract.functions.positions(token_id).call()
+    position = get_contract('arb_positions_nft').functions.positions(token_id).call()
 
     # Extract relevant information
     token0 = position[2]
@@ -47,7 +45,7 @@ def get_asset_balances(token_id):
     liquidity = position[7]
 
     # Fetch current tick and sqrt price
-    slot0 = arb_pool_contract.functions.slot0().call()
+    slot0 = get_contract('arb_pool').functions.slot0().call()
     sqrt_price_x96 = slot0[0]
     current_tick = slot0[1]
 
@@ -1,15 +1,13 @@
 import math
 from collections import defaultdict
-import requests
-from app.core.config import (STETH_TOKEN_ADDRESS, MOR_ARBITRUM_ADDRESS,
-                             base_positions_nft_contract, base_pool_contract, MOR_MULTISIG_BASE)
+from app.core.config import get_contract, MOR_MULTISIG_BASE
 
 def fetch_all_nfts(address):
     """Fetches all NFTs owned by the address."""
-    balance = base_positions_nft_contract.functions.balanceOf(address).call()
+    balance = get_contract('base_positions_nft').functions.balanceOf(address).call()
     nfts = []
     for i in range(balance):
-        token_id = base_positions_nft_contract.functions.tokenOfOwnerByIndex(address, i).call()
+        token_id = get_contract('base_positions_nft').functions.tokenOfOwnerByIndex(address, i).call()
         nfts.append(token_id)
     return nfts
 
@@ -35,7 +33,7 @@ def calculate_amounts(liquidity, sqrt_price_x96, tick_current, tick_lower, tick_
 
 def get_asset_balances(token_id):
     """Fetches the asset balances for a specific NFT position."""
-    position = base_positions_nft_contract.functions.positions(token_id).call()
+    position = get_contract('base_positions_nft').functions.positions(token_id).call()
 
     # Extract relevant information
     token0 = position[2]
@@ -46,7 +44,7 @@ def get_asset_balances(token_id):
     liquidity = position[7]
 
     # Fetch current tick and sqrt price
-    slot0 = base_pool_contract.functions.slot0().call()
+    slot0 = get_contract('base_pool').functions.slot0().call()
     sqrt_price_x96 = slot0[0]
     current_tick = slot0[1]
 
@@ -74,6 +72,7 @@ def protocol_liquidity(address):
         # print(f"No NFTs found for address {address}")
         return
 
+    mor_price = 1
     steth_price = 1
 
     if mor_price is None or steth_price is None:
@@ -1,43 +1,67 @@
-import json
+import asyncio
 import logging
-import os
+import time
 from contextlib import asynccontextmanager
-from datetime import datetime, date
+from datetime import date, timedelta
+from typing import Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-
-from helpers.capital_helpers.capital_main import get_capital_metrics
-from helpers.code_helpers.get_github_commits_metrics import get_commits_data
-from helpers.staking_helpers.staking_main import (get_wallet_stake_info,
-                                                  give_more_reward_response,
-                                                  get_analyze_mor_master_dict)
+from fastapi.responses import JSONResponse
+
+from app.core.cache import MetricsCache, ShardedCacheStore, ensure_serializable
+from app.core.config import (CIRC_SUPPLY_SHEET_NAME, EMISSIONS_SHEET_NAME, OVERPLUS_BRIDGED_SHEET_NAME,
+                             REWARD_SUM_SHEET_NAME, USER_MULTIPLIER_SHEET_NAME, USER_STAKED_SHEET_NAME,
+                             USER_WITHDRAWN_SHEET_NAME)
+from app.core.executors import executor_stats, shutdown_executors
+from app.core.prices import price_oracle
+from app.core.refresh import MetricRefresher, RefreshStage, format_refresh_report
+from app.core.responses import cached_response
+from app.core.telemetry import RequestMetricsMiddleware, render_metrics
+from helpers.capital_helpers.capital_main import get_capital_metrics_async
+from helpers.code_helpers.get_github_commits_metrics import get_commits_data_async
+from helpers.staking_helpers.staking_main import (get_wallet_stake_info_async,
+                                                  give_more_reward_response_async,
+                                                  get_analyze_mor_master_dict, get_reward_inputs, apy_curve,
+                                                  staking_periods_from_query, deposit_from_query)
 from helpers.staking_helpers.get_mor_amount_staked_over_time import get_mor_staked_over_time
+from helpers.staking_helpers.get_emission_schedule_for_today import get_emission_schedule_table
+from helpers.staking_helpers.emission_index import emission_index_from_table
 from helpers.supply_helpers.supply_main import (get_combined_supply_data,
                                                 get_historical_prices_and_trading_volume, get_market_cap,
                                                 get_mor_holders,
                                                 get_historical_locked_and_burnt_mor)
-from helpers.uniswap_helpers.get_total_combined_uniswap_position import get_combined_uniswap_position
+from helpers.uniswap_helpers.get_total_combined_uniswap_position import get_combined_uniswap_position_async
 from helpers.code_helpers.code_main import get_total_weights_and_contributors
 from helpers.supply_helpers.get_chain_wise_supplies import get_chain_wise_circ_supply
-from sheets_config.slack_notify import slack_notification
+from sheets_config.google_utils import sheet_snapshot_scope
+from sheets_config.slack_notify import slack_notification_async
 
 scheduler = AsyncIOScheduler()
 LAST_CACHE_UPDATE_TIME = None
+STARTUP_REFRESH_TASK = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global LAST_CACHE_UPDATE_TIME
-    # Startup: Initialize the cache update task
-    scheduler.add_job(update_cache_task, CronTrigger(hour='*/12'))  # Run every 12 hours
+    global LAST_CACHE_UPDATE_TIME, STARTUP_REFRESH_TASK
+    # Startup: Serve the last persisted snapshot right away
+    metrics_cache.load()
+    persisted_update_times = [metrics_cache.updated_at(key) for key in metrics_cache.data]
+    if persisted_update_times:
+        # Same local-time format as the refresh sets it with
+        LAST_CACHE_UPDATE_TIME = max(persisted_update_times).astimezone().replace(tzinfo=None).isoformat()
+
+    # Schedule one refresh job per cached metric and run the first full refresh in the background
+    metrics_refresher.schedule(scheduler)
     scheduler.start()
-    await update_cache_task()  # Run the task immediately on startup
-    LAST_CACHE_UPDATE_TIME = datetime.now().isoformat()
+    STARTUP_REFRESH_TASK = asyncio.create_task(update_cache_task())
     yield
-    # Shutdown: Shut down the scheduler
+    # Shutdown: Stop the startup refresh if it is still running and shut down the scheduler
+    if not STARTUP_REFRESH_TASK.done():
+        STARTUP_REFRESH_TASK.cancel()
     scheduler.shutdown()
+    shutdown_executors()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -53,6 +77,7 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
 )
+app.add_middleware(RequestMetricsMiddleware)
 
 logging.getLogger("httpx").disabled = True
 logging.getLogger("dune-client").disabled = True
@@ -62,97 +87,94 @@ logging.getLogger("dune_client").disabled = True
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-CACHE_FILE = 'cache.json'
-
-
-# Function to read cache from a file
-def read_cache() -> dict:
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as file:
-                data = file.read()
-                if data.strip():  # Check if the file is not empty
-                    return json.loads(data)
-                else:
-                    return {}  # Return an empty dictionary if the file is empty
-        except json.JSONDecodeError as e:
-            # Log the error
-            logger.info(f"Error reading cache file: {e}")
-            # Return an empty dictionary if JSON is invalid
-            return {}
-    return {}
-
-
-def json_serial(obj):
-    """JSON serializer for objects not serializable by default json code"""
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    raise TypeError(f"Type not serializable")
-
-
-def ensure_serializable(obj):
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    elif isinstance(obj, dict):
-        return {k: ensure_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [ensure_serializable(i) for i in obj]
-    elif isinstance(obj, (int, float, str, bool, type(None))):
-        return obj
-    else:
-        return str(obj)  # Convert any other type to string
-
-
-def write_cache(cache_data: dict):
-    try:
-        with open(CACHE_FILE, 'w') as file:
-            json.dump(cache_data, file, default=json_serial)
-    except TypeError as e:
-        # This will catch issues with non-serializable objects
-        logging.error(f"TypeError in write_cache: {e}")
-        # You could add code here to identify which key is causing the problem
-        for key, value in cache_data.items():
-            try:
-                json.dumps({key: value}, default=json_serial)
-            except TypeError:
-                logging.error(f"Non-serializable value for key: {key}")
-    except Exception as e:
-        logging.error(f"Error writing to cache file: {e}")
+CACHE_FILE = 'cache.json'  # Legacy single-file cache, migrated into CACHE_DIR on first start
+CACHE_DIR = 'cache'
+
+
+# /total_and_circ_supply wraps its cached value in a "data" field
+RESPONSE_ENVELOPES = {'total_and_circ_supply': 'data'}
+
+metrics_cache = MetricsCache(ShardedCacheStore(CACHE_DIR, legacy_cache_file=CACHE_FILE), envelopes=RESPONSE_ENVELOPES)
+
+
+def stringify_keys(result: dict) -> dict:
+    return {str(key): value for key, value in result.items()}
+
+
+def reject_market_cap_error(result: dict) -> dict:
+    if "error" in result:
+        raise ValueError(f"Market cap unavailable: {result['error']}")
+    return result
+
+
+def reject_empty_liquidity(result: dict) -> dict:
+    if not result:
+        raise ValueError("Protocol liquidity not found")
+    return result
+
+
+# Each key is refreshed by its own scheduler job. Cheap, fast-moving data (prices, supplies) is refreshed often,
+# while the expensive on-chain scans and Sheets-heavy analytics keep a long interval.
+REFRESH_STAGES = [
+    RefreshStage('staking_metrics', get_analyze_mor_master_dict, blocking=True,
+                 sheets=[USER_MULTIPLIER_SHEET_NAME, REWARD_SUM_SHEET_NAME, EMISSIONS_SHEET_NAME],
+                 interval=timedelta(hours=6), timeout=timedelta(minutes=20)),
+    RefreshStage('total_and_circ_supply', get_combined_supply_data, blocking=True,
+                 sheets=[CIRC_SUPPLY_SHEET_NAME, EMISSIONS_SHEET_NAME],
+                 interval=timedelta(hours=12), timeout=timedelta(minutes=20)),
+    RefreshStage('prices_and_volume', get_historical_prices_and_trading_volume,
+                 interval=timedelta(hours=1), timeout=timedelta(minutes=2)),
+    RefreshStage('locked_and_burnt_mor', get_historical_locked_and_burnt_mor, blocking=True,
+                 interval=timedelta(hours=6), timeout=timedelta(minutes=30)),
+    RefreshStage('market_cap', get_market_cap, depends_on=['locked_and_burnt_mor'], blocking=True,
+                 postprocess=reject_market_cap_error,
+                 interval=timedelta(minutes=15), timeout=timedelta(minutes=10)),
+    # The pool state, emission and prices of the reward estimates, read once per refresh and shared with /apy
+    RefreshStage('reward_inputs', get_reward_inputs, sheets=[EMISSIONS_SHEET_NAME],
+                 interval=timedelta(hours=1), timeout=timedelta(minutes=5)),
+    RefreshStage('give_mor_reward', give_more_reward_response_async, depends_on=['reward_inputs'],
+                 postprocess=stringify_keys, interval=timedelta(hours=1), timeout=timedelta(minutes=5)),
+    RefreshStage('stake_info', get_wallet_stake_info_async, postprocess=stringify_keys,
+                 sheets=[USER_MULTIPLIER_SHEET_NAME],
+                 interval=timedelta(hours=12), timeout=timedelta(minutes=20)),
+    RefreshStage('mor_holders_by_range', get_mor_holders, blocking=True,
+                 interval=timedelta(hours=6), timeout=timedelta(minutes=10)),
+    RefreshStage('protocol_liquidity', get_combined_uniswap_position_async, postprocess=reject_empty_liquidity,
+                 interval=timedelta(minutes=30), timeout=timedelta(minutes=5)),
+    RefreshStage('capital_metrics', get_capital_metrics_async,
+                 sheets=[USER_STAKED_SHEET_NAME, USER_WITHDRAWN_SHEET_NAME, OVERPLUS_BRIDGED_SHEET_NAME,
+                         EMISSIONS_SHEET_NAME],
+                 interval=timedelta(hours=12), timeout=timedelta(minutes=30)),
+    RefreshStage('github_commits', get_commits_data_async,
+                 interval=timedelta(hours=6), timeout=timedelta(minutes=10)),
+    RefreshStage('historical_mor_rewards_locked', get_mor_staked_over_time, postprocess=ensure_serializable,
+                 sheets=[USER_MULTIPLIER_SHEET_NAME],
+                 interval=timedelta(hours=24), timeout=timedelta(hours=2)),
+    RefreshStage('code_metrics', get_total_weights_and_contributors, sheets=[USER_STAKED_SHEET_NAME],
+                 interval=timedelta(hours=12), timeout=timedelta(minutes=30)),
+    RefreshStage('chain_wise_supplies', get_chain_wise_circ_supply,
+                 interval=timedelta(minutes=10), timeout=timedelta(minutes=2)),
+    RefreshStage('emission_schedule', get_emission_schedule_table, sheets=[EMISSIONS_SHEET_NAME],
+                 interval=timedelta(hours=12), timeout=timedelta(minutes=5)),
+]
+
+# The worksheets of the stages being refreshed are downloaded in one batch request and shared by the stages
+metrics_refresher = MetricRefresher(metrics_cache, REFRESH_STAGES, refresh_scope=sheet_snapshot_scope)
 
 
 async def update_cache_task() -> None:
     global LAST_CACHE_UPDATE_TIME
     try:
-        cache_data = read_cache()
-
-        cache_data['staking_metrics'] = await get_analyze_mor_master_dict()
-        cache_data['total_and_circ_supply'] = await get_combined_supply_data()
-        cache_data['prices_and_volume'] = await get_historical_prices_and_trading_volume()
-        cache_data['market_cap'] = await get_market_cap()
-        cache_data['give_mor_reward'] = give_more_reward_response()
-        cache_data['stake_info'] = get_wallet_stake_info()
-        cache_data['mor_holders_by_range'] = await get_mor_holders()
-        cache_data['locked_and_burnt_mor'] = await get_historical_locked_and_burnt_mor()
-        cache_data['protocol_liquidity'] = get_combined_uniswap_position()
-        cache_data['capital_metrics'] = get_capital_metrics()
-        cache_data['github_commits'] = get_commits_data()
-        cache_data['historical_mor_rewards_locked'] = ensure_serializable(await get_mor_staked_over_time())
-        cache_data['code_metrics'] = await get_total_weights_and_contributors()
-        cache_data['chain_wise_supplies'] = get_chain_wise_circ_supply()
-
-        slack_notification("Finished updating cache")
-
-        # Write the updated cache data to the cache file
-        try:
-            write_cache(cache_data)
-            # After all cache updates are done, update the last cache update time
-            LAST_CACHE_UPDATE_TIME = datetime.now().isoformat()
-            slack_notification(f"Finished writing cache at {LAST_CACHE_UPDATE_TIME}")
-        except Exception as cache_write_error:
-            slack_notification(f"Error writing to cache: {cache_write_error}")
-            logger.info(f"Error writing to cache: {cache_write_error}")
+        start_time = time.perf_counter()
+        results, reports, refresh_time = await metrics_refresher.refresh_all()
+
+        await slack_notification_async(format_refresh_report(reports, time.perf_counter() - start_time))
+
+        # After all cache updates are done, update the last cache update time
+        LAST_CACHE_UPDATE_TIME = refresh_time.isoformat()
+        await slack_notification_async(f"Finished writing cache at {LAST_CACHE_UPDATE_TIME}")
     except Exception as e:
-        slack_notification(f"Error in cache update task: {str(e)}")
+        await slack_notification_async(f"Error in cache update task: {str(e)}")
         logger.info(f"Error in cache update task: {str(e)}")
 
 
@@ -161,208 +183,134 @@ async def root():
     return {"message": "Hello World"}
 
 
-@app.get("/analyze-mor-stakers")
-async def get_mor_staker_analysis():
-    cache_data = read_cache()
+@app.get("/readiness")
+async def readiness():
+    # Reports whether each metric is warm, stale or missing. 503 until every metric has a cached value.
+    report = metrics_refresher.readiness()
+    report["last_cache_update_time"] = LAST_CACHE_UPDATE_TIME
+    report["startup_refresh_running"] = STARTUP_REFRESH_TASK is not None and not STARTUP_REFRESH_TASK.done()
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
 
-    if 'staking_metrics' in cache_data:
-        return cache_data['staking_metrics']
 
-    # If cache not available, load the data and cache it
-    try:
-        result = await get_analyze_mor_master_dict()
-
-        cache_data['staking_metrics'] = result
-        write_cache(cache_data)
+@app.get("/executor_stats")
+async def get_executor_stats():
+    # Saturation of the I/O thread pool and the CPU process pool used by the refresh stages
+    return executor_stats()
 
-        return result
 
-    except Exception as e:
-        logger.error(f"Error fetching stakers: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"An error occurred fetching stakers")
+@app.get("/prices")
+async def get_prices():
+    # Last spot price of each asset with its source and age, stale when it outlived the cache TTL
+    return price_oracle.status()
 
 
-@app.get("/give_mor_reward")
-async def give_more_reward():
-    cache_data = read_cache()
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus scrape endpoint: route latencies, refresh stages, upstream calls, cache lookups and executor pools
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
 
-    if 'give_mor_reward' in cache_data:
-        return cache_data['give_mor_reward']
 
+@app.get("/analyze-mor-stakers")
+async def get_mor_staker_analysis(request: Request):
+    # Served stale-while-revalidate from the cache. A missing key is fetched once, however many requests
+    # are waiting for it, and an HTTP 500 is returned if that fetch fails.
     try:
-        # Call the function to generate the response
-        res = give_more_reward_response()
+        await metrics_refresher.get('staking_metrics')
+    except Exception as e:
+        logger.error(f"Error fetching stakers: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred fetching stakers")
 
-        # Cache the result
-        # Ensure that keys in the response are strings before saving to cache
-        if isinstance(res, dict):
-            res = {str(key): value for key, value in res.items()}
+    return cached_response(request, metrics_cache, 'staking_metrics')
 
-        cache_data['give_mor_reward'] = res
-        write_cache(cache_data)
 
-        return res
+@app.get("/give_mor_reward")
+async def give_more_reward(request: Request):
+    try:
+        await metrics_refresher.get('give_mor_reward')
     except Exception as e:
+        logger.error(f"Error fetching mor rewards: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'give_mor_reward')
 
-@app.get("/get_stake_info")
-async def get_stake_info():
-    cache_data = read_cache()
-
-    if 'stake_info' in cache_data:
-        return cache_data['stake_info']
 
+@app.get("/get_stake_info")
+async def get_stake_info(request: Request):
     try:
-        # Call the function to get the stake information
-        result = get_wallet_stake_info()
-
-        # Ensure all keys and values in the result are serializable
-        serializable_result = {str(key): value for key, value in result.items()}
-
-        # Cache the result
-        cache_data['stake_info'] = serializable_result
-        write_cache(cache_data)
-
-        return serializable_result
+        await metrics_refresher.get('stake_info')
     except Exception as e:
+        logger.error(f"Error fetching stake info: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'stake_info')
 
-@app.get("/total_and_circ_supply")
-async def total_and_circ_supply():
-    cache_data = read_cache()
-
-    if 'total_and_circ_supply' in cache_data:
-        logger.info("Returning cached total_and_circ_supply data")
-
-        # Return the combined supply data from the cache file with the 'data' key
-        return {"data": cache_data['total_and_circ_supply']}
 
-    # If cache not available, load the data and cache it
+@app.get("/total_and_circ_supply")
+async def total_and_circ_supply(request: Request):
     try:
-        logger.info("Cache miss for total_and_circ_supply, fetching new data")
-
-        # Add the combined supply data to the cache file without the 'data' key
-        cache_data['total_and_circ_supply'] = await get_combined_supply_data()
-        write_cache(cache_data)
-
-        # Return the combined supply data from the freshly written cache with the 'data' key
-        return {"data": cache_data['total_and_circ_supply']}
-
+        await metrics_refresher.get('total_and_circ_supply')
     except Exception as e:
         logger.info(f"Error fetching total_and_circ_supply data")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'total_and_circ_supply')
 
-@app.get("/prices_and_trading_volume")
-async def historical_prices_and_volume():
-    cache_data = read_cache()
-
-    if 'prices_and_volume' in cache_data:
-        return cache_data['prices_and_volume']
 
-    # If cache not available, load the data and cache it
+@app.get("/prices_and_trading_volume")
+async def historical_prices_and_volume(request: Request):
     try:
-        cache_data['prices_and_volume'] = await get_historical_prices_and_trading_volume()
-        write_cache(cache_data)
-
-        return cache_data['prices_and_volume']
-
+        await metrics_refresher.get('prices_and_volume')
     except Exception as e:
+        logger.error(f"Error fetching prices and trading volume: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'prices_and_volume')
 
-@app.get("/get_market_cap")
-async def market_cap():
-    cache_data = read_cache()
-
-    if 'market_cap' in cache_data:
-        return cache_data['market_cap']
 
-    # If cache not available, load the data and cache it
+@app.get("/get_market_cap")
+async def market_cap(request: Request):
     try:
-        result = await get_market_cap()
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=f"An error occurred")
-
-        cache_data['market_cap'] = result
-        write_cache(cache_data)
-
-        return result
-
+        await metrics_refresher.get('market_cap')
     except Exception as e:
         logger.error(f"Error fetching market cap: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'market_cap')
 
-@app.get("/mor_holders_by_range")
-async def mor_holders_by_range():
-    cache_data = read_cache()
-
-    if 'mor_holders_by_range' in cache_data:
-        logger.info("Returning cached data")
-        return cache_data['mor_holders_by_range']
-
-    logger.info("Cache miss, fetching new data")
 
+@app.get("/mor_holders_by_range")
+async def mor_holders_by_range(request: Request):
     try:
-        result = await get_mor_holders()
-        cache_data['mor_holders_by_range'] = result
-        write_cache(cache_data)
-
-        logger.info("New data fetched and cached")
-        return result
-
+        await metrics_refresher.get('mor_holders_by_range')
     except Exception as e:
         logger.exception(f"An error occurred in mor_holders_by_range: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'mor_holders_by_range')
 
-@app.get("/locked_and_burnt_mor")
-async def locked_and_burnt_mor():
-    cache_data = read_cache()
-
-    if 'locked_and_burnt_mor' in cache_data:
-        return cache_data['locked_and_burnt_mor']
 
+@app.get("/locked_and_burnt_mor")
+async def locked_and_burnt_mor(request: Request):
     try:
-        # Cache the result
-        result = await get_historical_locked_and_burnt_mor()
-
-        cache_data['locked_and_burnt_mor'] = result
-        write_cache(cache_data)
-
-        # Return the combined data
-        return result
-
+        await metrics_refresher.get('locked_and_burnt_mor')
     except Exception as e:
+        logger.error(f"Error fetching locked and burnt mor: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'locked_and_burnt_mor')
 
-@app.get("/protocol_liquidity")
-async def get_protocol_liquidity():
-    cache_data = read_cache()
-
-    if 'protocol_liquidity' in cache_data:
-        return cache_data['protocol_liquidity']
 
+@app.get("/protocol_liquidity")
+async def get_protocol_liquidity(request: Request):
     try:
-        # Call the protocol_liquidity function with the default address
-        result = get_combined_uniswap_position()
-
-        if not result:
-            raise HTTPException(status_code=404, detail="Not Found")
-
-        # Cache the result
-        cache_data['protocol_liquidity'] = result
-        write_cache(cache_data)
-
-        return result  # Return the calculated liquidity in USD, MOR, and stETH values
-
+        await metrics_refresher.get('protocol_liquidity')
     except Exception as e:
+        logger.error(f"Error fetching protocol liquidity: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred")
 
+    return cached_response(request, metrics_cache, 'protocol_liquidity')
+
 
 # Function to get the last updated time
 @app.get("/last_cache_update_time")
@@ -371,99 +319,100 @@ async def get_last_cache_update_time():
 
 
 @app.get("/capital_metrics")
-async def capital_metrics():
-    cache_data = read_cache()
-
-    if 'capital_metrics' in cache_data:
-        return cache_data['capital_metrics']
-
+async def capital_metrics(request: Request):
     try:
-        result = get_capital_metrics()
-
-        # Cache the result
-        cache_data['capital_metrics'] = result
-        write_cache(cache_data)
-
-        return result
+        await metrics_refresher.get('capital_metrics')
     except Exception as e:
         logger.error(f"Error fetching capital metrics: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while fetching capital metrics")
 
+    return cached_response(request, metrics_cache, 'capital_metrics')
 
-@app.get("/github_commits")
-async def get_github_commits():
-    cache_data = read_cache()
-
-    if 'github_commits' in cache_data:
-        return cache_data['github_commits']
 
+@app.get("/github_commits")
+async def get_github_commits(request: Request):
     try:
-        result = get_commits_data()
-
-        cache_data['github_commits'] = result
-        write_cache(cache_data)
-
-        return result
+        await metrics_refresher.get('github_commits')
     except Exception as e:
         logger.error(f"Error fetching github commits: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while fetching github commits")
 
+    return cached_response(request, metrics_cache, 'github_commits')
 
-@app.get("/historical_mor_rewards_locked")
-async def get_historical_mor_staked():
-    cache_data = read_cache()
-
-    if 'historical_mor_rewards_locked' in cache_data:
-        return cache_data['historical_mor_rewards_locked']
 
+@app.get("/historical_mor_rewards_locked")
+async def get_historical_mor_staked(request: Request):
     try:
-        result = await get_mor_staked_over_time()
-        serializable_result = ensure_serializable(result)
-
-        cache_data['historical_mor_rewards_locked'] = serializable_result
-        write_cache(cache_data)
-
-        return serializable_result
+        await metrics_refresher.get('historical_mor_rewards_locked')
     except Exception as e:
         logger.error(f"Error fetching mor rewards locked: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred")
 
+    return cached_response(request, metrics_cache, 'historical_mor_rewards_locked')
 
-@app.get("/code_metrics")
-async def get_code_metrics():
-    cache_data = read_cache()
-
-    if 'code_metrics' in cache_data:
-        return cache_data['code_metrics']
 
+@app.get("/code_metrics")
+async def get_code_metrics(request: Request):
     try:
-        result = await get_total_weights_and_contributors()
+        await metrics_refresher.get('code_metrics')
+    except Exception as e:
+        logger.error(f"Error fetching code metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred")
 
-        cache_data['code_metrics'] = result
-        write_cache(cache_data)
+    return cached_response(request, metrics_cache, 'code_metrics')
 
-        return result
 
+@app.get("/chain_wise_supplies")
+async def get_circ_supply_by_chains(request: Request):
+    try:
+        await metrics_refresher.get('chain_wise_supplies')
     except Exception as e:
-        logger.error(f"Error fetching code metrics: {str(e)}")
+        logger.error(f"Error fetching code in chain-wise supplies: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred")
 
+    return cached_response(request, metrics_cache, 'chain_wise_supplies')
 
-@app.get("/chain_wise_supplies")
-async def get_circ_supply_by_chains():
-    cache_data = read_cache()
 
-    if 'chain_wise_supplies' in cache_data:
-        return cache_data['chain_wise_supplies']
+@app.get("/emissions")
+async def get_emissions(day: Optional[date] = Query(None, alias="date"), start: Optional[date] = None,
+                        end: Optional[date] = None):
+    # Emissions of one day (?date=YYYY-MM-DD) or of every day of a range (?start=...&end=..., inclusive), looked up
+    # in the index of the cached emission schedule
+    if day is not None:
+        start = end = day
+    if start is None:
+        raise HTTPException(status_code=400, detail="Pass a date, or a start date and an optional end date")
+
+    try:
+        table = await metrics_refresher.get('emission_schedule')
+    except Exception as e:
+        logger.error(f"Error fetching emission schedule: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred")
 
     try:
-        result = get_chain_wise_circ_supply()
+        days = emission_index_from_table(table).query(start, end or start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"start": days[0]["date"], "end": days[-1]["date"], "days": days}
 
-        cache_data['chain_wise_supplies'] = result
-        write_cache(cache_data)
 
-        return result
+@app.get("/apy")
+async def get_apy(periods: Optional[str] = None, max_days: Optional[int] = None, step: int = 1,
+                  deposit: Optional[float] = None):
+    # APY and daily MOR rewards of stETH staked for each period (days): ?periods=0,365,730, every step days up to
+    # max_days (?max_days=2190&step=7), or the /give_mor_reward periods. Per 1 stETH, or for ?deposit=<stETH>.
+    # Computed from the cached reward inputs, no upstream calls
+    try:
+        staking_periods = staking_periods_from_query(periods, max_days, step)
+        deposit = deposit_from_query(deposit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        reward_inputs = await metrics_refresher.get('reward_inputs')
     except Exception as e:
-        logger.error(f"Error fetching code in chain-wise supplies: {str(e)}")
+        logger.error(f"Error fetching reward inputs: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred")
+
+    return apy_curve(reward_inputs, staking_periods, deposit)
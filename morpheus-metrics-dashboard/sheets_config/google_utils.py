@@ -1,12 +1,30 @@
 import csv
+import json
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
+
 import gspread
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from gspread.utils import fill_gaps, rowcol_to_a1
 from dotenv import load_dotenv
 from oauth2client.service_account import ServiceAccountCredentials
 
+from app.core.cache import atomic_write_bytes
+from app.core.config import APPEND_ONLY_SHEET_NAMES
+from app.core.rate_limits import throttle
+from app.core.telemetry import track_upstream
+from sheets_config.sheet_schemas import apply_sheet_schema, arrow_types_mapper
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 scope = ["https://spreadsheets.google.com/feeds", 'https://www.googleapis.com/auth/spreadsheets',
          "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/drive"]
 
@@ -16,47 +34,415 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 SHEET_UTILS_JSON_PATH = os.path.join(project_root, 'sheets_config', 'credentials.json')
 
-credentials = ServiceAccountCredentials.from_json_keyfile_name(SHEET_UTILS_JSON_PATH, scope)
+# Local copies of the append-only sheets, in the app directory unless overridden
+SHEET_CHECKPOINT_DIR = os.getenv("SHEET_CHECKPOINT_DIR", os.path.join(project_root, 'sheet_checkpoints'))
+SHEET_FULL_RESYNC_HOURS = float(os.getenv("SHEET_FULL_RESYNC_HOURS", "24"))
+
+_spreadsheet = None
+_spreadsheet_lock = threading.Lock()
 
-gc = gspread.authorize(credentials)
-sh = gc.open_by_key(SPREADSHEET_ID)
+
+def get_spreadsheet():
+    """The spreadsheet every sheet is read from, authorized on first use"""
+    global _spreadsheet
+    with _spreadsheet_lock:
+        if _spreadsheet is None:
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(SHEET_UTILS_JSON_PATH, scope)
+            _spreadsheet = gspread.authorize(credentials).open_by_key(SPREADSHEET_ID)
+        return _spreadsheet
+
+
+def set_spreadsheet(spreadsheet):
+    """Replace the spreadsheet backend, e.g. with a local stand-in exposing the same worksheet() API"""
+    global _spreadsheet
+    with _spreadsheet_lock:
+        _spreadsheet = spreadsheet
 
 
 def get_worksheet(sheet_name):
-    return sh.worksheet(sheet_name)
+    return get_spreadsheet().worksheet(sheet_name)
 
 
 def download_sheet(sheet_name):
-    worksheet = get_worksheet(sheet_name)
     print(f"Downloading current uploaded sheet for {sheet_name}...")
     filename = f'downloaded_{sheet_name}.csv'
+    throttle('sheets')
+    with track_upstream('sheets'):
+        data = get_worksheet(sheet_name).get_all_values()
     with open(filename, 'w', newline='', encoding='utf-8') as file:
         writer = csv.writer(file)
-        writer.writerows(worksheet.get_all_values())
+        writer.writerows(data)
     print(f"Downloaded data as CSV: {filename}")
     return filename
 
 
+def sheet_range(sheet_name) -> str:
+    """A1 notation for the whole of a worksheet"""
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def values_to_dataframe(sheet_name, values) -> pd.DataFrame:
+    """A typed frame of the rows of a sheet, header first, see sheet_schemas"""
+    return apply_sheet_schema(sheet_name, pd.DataFrame(values[1:], columns=values[0]))
+
+
+def trim_to_header(rows) -> list:
+    """The rows of a sheet (header first) cut to the width of the header, without cells in unnamed columns"""
+    header = list(rows[0])
+    while header and not header[-1]:
+        header.pop()
+    return [header] + [list(row[:len(header)]) for row in rows[1:]]
+
+
+def make_read_only(frame: pd.DataFrame):
+    """Make writes into the values of frame raise, for frames shared between readers"""
+    for block in frame._mgr.blocks:
+        values = block.values
+        # Nullable integer columns keep their values and missing-value mask in two numpy arrays
+        for array in (values, getattr(values, '_data', None), getattr(values, '_mask', None)):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+
+
+def reader_copy(frame: pd.DataFrame) -> pd.DataFrame:
+    """A frame of its own for a reader of a shared frame, to add or replace columns on without affecting others"""
+    copy = frame.copy(deep=False)
+    for column, dtype in frame.dtypes.items():
+        if isinstance(dtype, pd.ArrowDtype):
+            # Arrow data is immutable, but setting items swaps the array inside the shared column, so wrap it anew
+            copy[column] = frame[column].array.copy()
+    return copy
+
+
+class SheetCheckpoints:
+    """
+    Local typed mirrors of append-only worksheets (event logs that only grow), so a read downloads just the rows
+    added since the last one and only has to convert those.
+
+    A tail read fetches the header row and the rows from the last one already seen: if the header or that row
+    changed, or the row is gone, the sheet was edited and is downloaded in full again. A full resync also happens once a checkpoint is older than
+    `full_resync_interval`, to catch edits further up. Checkpoints are kept in memory and as Parquet files in
+    `checkpoint_dir`, so a restart doesn't download the full history again.
+    """
+
+    METADATA_KEY = b'sheet_checkpoint'
+
+    def __init__(self, sheet_names, checkpoint_dir: str, full_resync_interval: float):
+        self.sheet_names = set(sheet_names)
+        self.checkpoint_dir = checkpoint_dir
+        self.full_resync_interval = full_resync_interval
+        # sheet name -> {'full_synced_at': unix time, 'header': [...], 'last_row': [...], 'frame': typed rows}
+        self._checkpoints = {}
+        self._lock = threading.Lock()
+
+    def _path(self, sheet_name) -> str:
+        return os.path.join(self.checkpoint_dir, f"{sheet_name}.parquet")
+
+    def _load(self, sheet_name):
+        table = pq.read_table(self._path(sheet_name))
+        checkpoint = json.loads(table.schema.metadata[self.METADATA_KEY])
+        checkpoint['frame'] = table.to_pandas(types_mapper=arrow_types_mapper)
+        make_read_only(checkpoint['frame'])
+        return checkpoint
+
+    def get(self, sheet_name):
+        """The checkpoint of sheet_name if it can be extended with a tail read, else None"""
+        if sheet_name not in self.sheet_names:
+            return None
+        with self._lock:
+            checkpoint = self._checkpoints.get(sheet_name)
+            if checkpoint is None and os.path.exists(self._path(sheet_name)):
+                try:
+                    checkpoint = self._checkpoints[sheet_name] = self._load(sheet_name)
+                except (OSError, KeyError, ValueError, pa.ArrowException) as e:
+                    logger.warning(f"Ignoring unreadable checkpoint of {sheet_name}: {str(e)}")
+        if not checkpoint or checkpoint['frame'].empty:
+            return None
+        if time.time() - checkpoint['full_synced_at'] > self.full_resync_interval:
+            return None
+        return checkpoint
+
+    def ranges(self, sheet_name) -> list:
+        """The ranges to download for sheet_name: the header row and the tail from the last row seen, or the sheet"""
+        checkpoint = self.get(sheet_name)
+        if checkpoint is None:
+            return [sheet_range(sheet_name)]
+        last_column = rowcol_to_a1(1, len(checkpoint['header'])).rstrip('0123456789')
+        # The header is row 1, so the last row seen is the row number of the frame's length plus one
+        return [f"{sheet_range(sheet_name)}!1:1",
+                f"{sheet_range(sheet_name)}!A{len(checkpoint['frame']) + 1}:{last_column}"]
+
+    def update(self, sheet_name, value_ranges, full: bool):
+        """
+        Merge the values of the ranges() downloaded into the checkpoint and return the typed frame of the whole
+        sheet, or None if the tail doesn't continue the checkpoint and the sheet must be downloaded in full.
+        """
+        if full:
+            rows = fill_gaps(value_ranges[0])
+            if sheet_name not in self.sheet_names:
+                return values_to_dataframe(sheet_name, rows)
+            # Tail reads only cover the header's columns, so the checkpoint (and last_row) is kept at that width
+            rows = trim_to_header(rows) if rows else rows
+            frame = values_to_dataframe(sheet_name, rows)
+            if len(rows) > 1:
+                self._save(sheet_name, {'full_synced_at': time.time(), 'header': rows[0], 'last_row': rows[-1],
+                                        'frame': frame})
+            return frame
+
+        checkpoint = self.get(sheet_name)
+        if checkpoint is None:
+            # Expired since the ranges were chosen
+            return None
+        header = checkpoint['header']
+        header_values, values = value_ranges
+        if not header_values or trim_to_header(header_values)[0] != header:
+            logger.info(f"Header of {sheet_name} changed since the last read, downloading it in full")
+            return None
+        tail = [row[:len(header)] for row in fill_gaps(values, cols=len(header))] if values else []
+        if not tail or tail[0] != checkpoint['last_row']:
+            logger.info(f"Rows of {sheet_name} changed since the last read, downloading it in full")
+            return None
+        if len(tail) > 1:
+            new_rows = values_to_dataframe(sheet_name, [header] + tail[1:])
+            checkpoint = {'full_synced_at': checkpoint['full_synced_at'], 'header': header, 'last_row': tail[-1],
+                          'frame': pd.concat([checkpoint['frame'], new_rows], ignore_index=True)}
+            self._save(sheet_name, checkpoint)
+        return checkpoint['frame']
+
+    def _save(self, sheet_name, checkpoint):
+        make_read_only(checkpoint['frame'])
+        with self._lock:
+            self._checkpoints[sheet_name] = checkpoint
+        try:
+            table = pa.Table.from_pandas(checkpoint['frame'], preserve_index=False)
+            metadata = {key: value for key, value in checkpoint.items() if key != 'frame'}
+            table = table.replace_schema_metadata({**table.schema.metadata,
+                                                   self.METADATA_KEY: json.dumps(metadata).encode()})
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink)
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            atomic_write_bytes(self._path(sheet_name), sink.getvalue().to_pybytes())
+        except (OSError, ValueError, pa.ArrowException) as e:
+            logger.warning(f"Could not write the checkpoint of {sheet_name}: {str(e)}")
+
+    def invalidate(self, sheet_name):
+        with self._lock:
+            self._checkpoints.pop(sheet_name, None)
+            if os.path.exists(self._path(sheet_name)):
+                os.remove(self._path(sheet_name))
+
+
+sheet_checkpoints = SheetCheckpoints(APPEND_ONLY_SHEET_NAMES, SHEET_CHECKPOINT_DIR, SHEET_FULL_RESYNC_HOURS * 3600)
+
+
+def batch_get_values(ranges) -> list:
+    """The values of several ranges in a single values:batchGet request, in the order requested"""
+    throttle('sheets')
+    with track_upstream('sheets'):
+        response = get_spreadsheet().values_batch_get(list(ranges))
+    return [value_range.get('values', []) for value_range in response['valueRanges']]
+
+
+def download_sheet_dataframes(sheet_names) -> dict:
+    """
+    Download several worksheets as typed frames in a single values:batchGet request. Append-only sheets with a
+    checkpoint only download their new rows, those whose tail doesn't match are downloaded in full with a second
+    request.
+    """
+    sheet_names = list(sheet_names)
+    ranges = {sheet_name: sheet_checkpoints.ranges(sheet_name) for sheet_name in sheet_names}
+    values = iter(batch_get_values([range_name for sheet_name in sheet_names for range_name in ranges[sheet_name]]))
+    frames = {}
+    for sheet_name in sheet_names:
+        # Value ranges come without the empty trailing cells get_all_values pads
+        value_ranges = [next(values) for _ in ranges[sheet_name]]
+        full = ranges[sheet_name] == [sheet_range(sheet_name)]
+        frames[sheet_name] = sheet_checkpoints.update(sheet_name, value_ranges, full=full)
+
+    resync = [sheet_name for sheet_name, frame in frames.items() if frame is None]
+    if resync:
+        for sheet_name, values in zip(resync, batch_get_values(sheet_range(sheet_name) for sheet_name in resync)):
+            frames[sheet_name] = sheet_checkpoints.update(sheet_name, [values], full=True)
+
+    # Checkpoint frames are shared, callers get their own frame to add columns to
+    return {sheet_name: reader_copy(frame) for sheet_name, frame in frames.items()}
+
+
+def download_sheet_dataframe(sheet_name):
+    return download_sheet_dataframes([sheet_name])[sheet_name]
+
+
+class SheetSnapshotRegistry:
+    """
+    Worksheets downloaded at most once while a snapshot scope is open, e.g. for one cache refresh cycle, instead of
+    once per helper reading them. Concurrent readers of a sheet wait for the same download.
+
+    Sheets named when opening a scope are queued, and the first read of any of them downloads the whole queue in
+    one batch request. Other sheets are downloaded one by one when first read.
+
+    The snapshot frames are read-only: readers get a shallow copy they can add or replace columns on, while writing
+    into the shared values raises (or, for Arrow-backed columns, only changes the reader's copy). Snapshots older
+    than `max_age` are downloaded again, so overlapping refreshes keeping a scope open don't serve a sheet forever.
+
+    Values derived from a sheet (e.g. an index built over it) can be memoized with the snapshot through derive().
+    """
+
+    def __init__(self, download, download_batch, max_age: float = 30 * 60):
+        self.download = download
+        self.download_batch = download_batch
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._batch_lock = threading.Lock()
+        self._scopes = 0
+        self._snapshots = {}  # sheet name -> (downloaded at, frame)
+        self._derived = {}  # (sheet name, build function) -> (snapshot, value)
+        self._sheet_locks = {}
+        self._queued = set()
+        self._batching = set()
+
+    @contextmanager
+    def scope(self, sheet_names=()):
+        with self._lock:
+            self._scopes += 1
+            self._queued.update(sheet_name for sheet_name in sheet_names if not self._is_fresh(sheet_name))
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._scopes -= 1
+                if self._scopes == 0:
+                    self._snapshots.clear()
+                    self._derived.clear()
+                    self._sheet_locks.clear()
+                    self._queued.clear()
+
+    @property
+    def active(self) -> bool:
+        return self._scopes > 0
+
+    def _is_fresh(self, sheet_name) -> bool:
+        snapshot = self._snapshots.get(sheet_name)
+        return snapshot is not None and time.monotonic() - snapshot[0] <= self.max_age
+
+    def _store(self, sheet_name, frame):
+        make_read_only(frame)
+        snapshot = (time.monotonic(), frame)
+        with self._lock:
+            if self._scopes > 0:
+                self._snapshots[sheet_name] = snapshot
+        return snapshot
+
+    def _download_queued(self):
+        with self._batch_lock:
+            with self._lock:
+                # Sheets the batch this one waited for (or a reader on its own) already downloaded stay as they are
+                sheet_names = sorted(sheet_name for sheet_name in self._queued if not self._is_fresh(sheet_name))
+                self._queued.clear()
+                self._batching.update(sheet_names)
+            if not sheet_names:
+                return
+            try:
+                for sheet_name, frame in self.download_batch(sheet_names).items():
+                    self._store(sheet_name, frame)
+            except Exception as e:
+                # Each sheet is downloaded on its own when read instead
+                logger.warning(f"Batch download of sheets {', '.join(sheet_names)} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._batching.difference_update(sheet_names)
+
+    def read(self, sheet_name) -> pd.DataFrame:
+        """The frame of sheet_name, from the snapshot if there is a fresh one or else downloaded"""
+        if not self.active:
+            return self.download(sheet_name)
+        return reader_copy(self._snapshot(sheet_name)[1])
+
+    def derive(self, sheet_name, build):
+        """build(frame) for the current snapshot of sheet_name, computed once per snapshot"""
+        if not self.active:
+            return build(self.download(sheet_name))
+
+        snapshot = self._snapshot(sheet_name)
+        with self._lock:
+            sheet_lock = self._sheet_locks.setdefault(sheet_name, threading.Lock())
+        with sheet_lock:
+            with self._lock:
+                derived = self._derived.get((sheet_name, build))
+            if derived is not None and derived[0] is snapshot:
+                return derived[1]
+            value = build(reader_copy(snapshot[1]))
+            with self._lock:
+                if self._scopes > 0:
+                    self._derived[(sheet_name, build)] = (snapshot, value)
+        return value
+
+    def _snapshot(self, sheet_name):
+        """The (downloaded at, frame) snapshot of sheet_name, downloading it if it's missing or expired"""
+        with self._lock:
+            in_batch = sheet_name in self._queued or sheet_name in self._batching
+        if in_batch:
+            # Download the queued sheets, or wait for the batch already downloading this one
+            self._download_queued()
+
+        with self._lock:
+            sheet_lock = self._sheet_locks.setdefault(sheet_name, threading.Lock())
+        with sheet_lock:
+            with self._lock:
+                fresh = self._is_fresh(sheet_name)
+                snapshot = self._snapshots.get(sheet_name)
+            if not fresh:
+                snapshot = self._store(sheet_name, self.download(sheet_name))
+        return snapshot
+
+    def invalidate(self, sheet_name):
+        with self._lock:
+            self._snapshots.pop(sheet_name, None)
+            for key in [key for key in self._derived if key[0] == sheet_name]:
+                del self._derived[key]
+
+
+sheet_snapshots = SheetSnapshotRegistry(download_sheet_dataframe, download_sheet_dataframes)
+
+
+def sheet_snapshot_scope(sheet_names=()):
+    """Download every worksheet read inside the block at most once, the named ones together in one request"""
+    return sheet_snapshots.scope(sheet_names)
+
+
 def read_sheet_to_dataframe(sheet_name):
-    worksheet = get_worksheet(sheet_name)
-    data = worksheet.get_all_values()
-    return pd.DataFrame(data[1:], columns=data[0])
+    return sheet_snapshots.read(sheet_name)
+
+
+def read_sheet_derived(sheet_name, build):
+    """build(frame of sheet_name), shared by every reader of the same snapshot like the frame itself"""
+    return sheet_snapshots.derive(sheet_name, build)
 
 
 def append_to_sheet(sheet_name, dataframe):
-    worksheet = get_worksheet(sheet_name)
     values = dataframe.values.tolist()
-    worksheet.append_rows(values)
+    throttle('sheets')
+    with track_upstream('sheets'):
+        get_worksheet(sheet_name).append_rows(values)
+    sheet_snapshots.invalidate(sheet_name)
+    sheet_checkpoints.invalidate(sheet_name)
     print(f"Appended {len(values)} rows to {sheet_name}")
 
 
 def clear_and_upload_new_records(sheet_name, dataframe):
-    worksheet = get_worksheet(sheet_name)
-    worksheet.clear()
+    sheet_snapshots.invalidate(sheet_name)
+    sheet_checkpoints.invalidate(sheet_name)
+    throttle('sheets')
+    with track_upstream('sheets'):
+        worksheet = get_worksheet(sheet_name)
+        worksheet.clear()
     print(f"Clearing existing data from {sheet_name}...")
 
     values = [dataframe.columns.tolist()] + dataframe.values.tolist()
-    worksheet.update(values)
+    throttle('sheets')
+    with track_upstream('sheets'):
+        worksheet.update(values)
+    sheet_snapshots.invalidate(sheet_name)
+    sheet_checkpoints.invalidate(sheet_name)
     print(f"Uploaded {len(values)} rows to {sheet_name}")
 
 
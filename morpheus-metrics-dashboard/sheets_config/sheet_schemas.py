@@ -0,0 +1,111 @@
+"""
+Column types of the worksheets the app reads.
+
+Sheets come in as text. apply_sheet_schema converts the listed columns once when a sheet is downloaded, so readers
+start from typed columns instead of re-parsing strings row by row. Unparseable cells become missing values
+(NaN, NaT or <NA>). Columns that aren't listed stay text.
+"""
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import (CIRC_SUPPLY_SHEET_NAME, EMISSIONS_SHEET_NAME, OVERPLUS_BRIDGED_SHEET_NAME,
+                             REWARD_SUM_SHEET_NAME, USER_MULTIPLIER_SHEET_NAME, USER_STAKED_SHEET_NAME,
+                             USER_WITHDRAWN_SHEET_NAME)
+from app.core.wei import WEI_DTYPE, WEI_TYPE
+
+
+def blank_to_missing(values: pd.Series) -> pd.Series:
+    return values.where(values.astype(str).str.strip() != '', None)
+
+
+def to_int(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(blank_to_missing(values), errors='coerce').astype('Int64')
+
+
+def to_float(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(blank_to_missing(values), errors='coerce').astype('float64')
+
+
+def parse_wei(value):
+    try:
+        return Decimal(str(value).strip()).to_integral_value()
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def to_wei(values: pd.Series) -> pd.Series:
+    array = pa.array(blank_to_missing(values), type=pa.string(), from_pandas=True)
+    try:
+        wei = array.cast(WEI_TYPE)
+    except pa.ArrowInvalid:
+        # Scientific notation or stray text somewhere in the column
+        wei = pa.array([None if value is None else parse_wei(value) for value in array.to_pylist()],
+                       type=WEI_TYPE)
+    return pd.Series(wei, index=values.index, dtype=WEI_DTYPE, name=values.name)
+
+
+def to_datetime(date_format: str = None):
+    def convert(values: pd.Series) -> pd.Series:
+        return pd.to_datetime(blank_to_missing(values), format=date_format, errors='coerce')
+
+    return convert
+
+
+TRANSFER_SCHEMA = {
+    'Timestamp': to_datetime(),
+    'BlockNumber': to_int,
+    'PoolId': to_int,
+    'Amount': to_wei,
+}
+
+EMISSION_CATEGORIES = ['Capital Emission', 'Code Emission', 'Compute Emission', 'Community Emission',
+                       'Protection Emission']
+
+SHEET_SCHEMAS = {
+    USER_MULTIPLIER_SHEET_NAME: {
+        'Timestamp': to_datetime(),
+        'BlockNumber': to_int,
+        'poolId': to_int,
+        'multiplier': to_wei,
+        'claimLockStart': to_int,
+        'claimLockEnd': to_int,
+    },
+    USER_STAKED_SHEET_NAME: TRANSFER_SCHEMA,
+    USER_WITHDRAWN_SHEET_NAME: TRANSFER_SCHEMA,
+    OVERPLUS_BRIDGED_SHEET_NAME: {
+        'Timestamp': to_datetime(),
+        'BlockNumber': to_int,
+        'amount': to_wei,
+        'uniqueId': to_int,
+    },
+    # Total Emission and Total Supply stay text, the API serves them as they are in the sheet
+    EMISSIONS_SHEET_NAME: {
+        'Date': to_datetime('%Y-%m-%d'),
+        **{category: to_float for category in EMISSION_CATEGORIES},
+    },
+    REWARD_SUM_SHEET_NAME: {
+        'Value': to_float,
+    },
+    CIRC_SUPPLY_SHEET_NAME: {
+        'date': to_datetime('%d/%m/%Y'),
+        'circulating_supply_at_that_date': to_float,
+        'total_claimed_that_day': to_float,
+    },
+}
+
+
+def apply_sheet_schema(sheet_name: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """Convert the columns of a freshly downloaded all-text sheet to the types of its schema, in place"""
+    schema = SHEET_SCHEMAS.get(sheet_name, {})
+    for column in frame.columns:
+        converter = schema.get(str(column).strip())
+        if converter is not None:
+            frame[column] = converter(frame[column])
+    return frame
+
+
+def arrow_types_mapper(arrow_type):
+    """Keep decimal (wei) columns Arrow-backed when reading Parquet, the default would make them Decimal objects"""
+    return pd.ArrowDtype(arrow_type) if pa.types.is_decimal(arrow_type) else None
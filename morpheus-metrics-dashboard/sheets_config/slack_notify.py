@@ -1,17 +1,18 @@
 import logging
 import sys
-import time
 import json
 import requests
 from app.core.config import NOTIFICATION_CHANNEL
 from app.core.config import SLACK_URL
+from app.core.executors import run_blocking_io
+from app.core.rate_limits import throttle, throttle_async
+from app.core.telemetry import track_upstream
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-def slack_notification(message):
-    time.sleep(1)
+def post_slack_message(message):
     url = SLACK_URL
     slack_data = {
         "username": "morpheus-explorer",
@@ -31,8 +32,21 @@ def slack_notification(message):
     }
     byte_length = str(sys.getsizeof(slack_data))
     headers = {'Content-Type': "application/json", 'Content-Length': byte_length}
-    response = requests.post(url, data=json.dumps(slack_data), headers=headers)
+    with track_upstream('slack'):
+        response = requests.post(url, data=json.dumps(slack_data), headers=headers)
     if response.status_code != 200:
         logger.info(f"Failed to send Slack notification: {response.status_code}, {response.text}")
     else:
-        logger.info("Slack notification sent successfully")
\ No newline at end of file
+        logger.info("Slack notification sent successfully")
+
+
+def slack_notification(message):
+    """Send a message to the notification channel. Blocks while throttled, for synchronous code"""
+    throttle('slack')
+    post_slack_message(message)
+
+
+async def slack_notification_async(message):
+    """Like slack_notification, for coroutines: waits with asyncio.sleep and posts from the IO pool"""
+    await throttle_async('slack')
+    await run_blocking_io(post_slack_message, message)
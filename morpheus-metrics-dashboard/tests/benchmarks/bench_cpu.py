@@ -0,0 +1,286 @@
+"""
+CPU benchmarks of the staking analytics on a large synthetic UserMultiplier sheet.
+
+Each benchmark times the app's implementation against a reference copy of the row-by-row loop it replaced, on the
+same typed frame the Sheets ingest produces, and checks that both return the same result (including the order of
+dict keys, which is the order of the JSON served). The staking dataset the analytics share is also timed on its own.
+No network or app services are involved.
+
+Usage, from the project root:
+
+    python tests/benchmarks/bench_cpu.py                       # 1M rows
+    python tests/benchmarks/bench_cpu.py --rows 100000 --repeat 5
+    python tests/benchmarks/bench_cpu.py --skip-reference      # time the app's implementation only
+
+Exits with status 1 when an implementation returns something different from its reference.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from app.core.wei import WEI_DTYPE, WEI_TYPE  # noqa: E402
+
+DAY = 86400
+YEAR = 365 * DAY
+LAUNCH = int(datetime(2024, 2, 8).timestamp())
+
+
+def synthetic_user_multiplier(rows: int, seed: int = 20240208, users: int = None) -> pd.DataFrame:
+    """
+    A typed UserMultiplier frame: 15% of the stakes never locked, 25% expired, 1% locked beyond the 25 year
+    horizon and the rest valid, 80% in pool 0, sorted by time like the sheet
+    """
+    rng = np.random.default_rng(seed)
+    now = int(time.time())
+    users = users or max(1, rows // 5)
+
+    staked_at = np.sort(rng.integers(LAUNCH, now - DAY, rows))
+    kind = rng.random(rows)
+    claim_lock_start = np.where(kind < 0.15, 0, staked_at)
+    claim_lock_end = np.where(
+        kind < 0.15, 0,
+        np.where(kind < 0.40, staked_at + (now - DAY - staked_at) * rng.random(rows),
+                 np.where(kind < 0.41, now + 30 * YEAR, now + rng.integers(DAY, 6 * YEAR, rows)))).astype('int64')
+    multiplier = rng.integers(10 ** 7, 107 * 10 ** 6, rows).astype(object) * 10 ** 18  # 1e25 == 1x
+
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(staked_at, unit='s'),
+        'BlockNumber': pd.array(rng.integers(19_000_000, 21_000_000, rows), dtype='Int64'),
+        'user': np.char.add('0x', np.char.zfill(rng.integers(0, users, rows).astype(str), 40)).astype(object),
+        'poolId': pd.array(np.where(rng.random(rows) < 0.8, 0, 1), dtype='Int64'),
+        'multiplier': pd.Series(pa.array(multiplier, type=WEI_TYPE), dtype=WEI_DTYPE),
+        'claimLockStart': pd.array(claim_lock_start, dtype='Int64'),
+        'claimLockEnd': pd.array(claim_lock_end, dtype='Int64'),
+    })
+
+
+def is_valid_stake(row):
+    """The per-row validity check the reference loops used, against the time of each call"""
+    current_time = int(datetime.now().timestamp())
+    claim_lock_start = int(row['claimLockStart'])
+    claim_lock_end = int(row['claimLockEnd'])
+    twenty_five_years_from_now = current_time + (25 * 365 * 24 * 60 * 60)
+
+    return claim_lock_start != 0 and claim_lock_end != 0 and current_time < claim_lock_end <= twenty_five_years_from_now
+
+
+def reference_summarize_stakers(df: pd.DataFrame) -> dict:
+    """The iterrows loop analyze_mor_stakers ran before summarize_stakers"""
+    stakers_by_pool = {0: set(), 1: set()}
+    stakers_by_pool_and_date = defaultdict(lambda: defaultdict(set))
+    total_stake_time = {0: timedelta(), 1: timedelta()}
+    stake_count = {0: 0, 1: 0}
+
+    for _, row in df.iterrows():
+        if not is_valid_stake(row):
+            continue
+
+        timestamp = row['Timestamp'].date()
+        pool_id = int(row['poolId'])
+        user = row['user']
+        stakers_by_pool[pool_id].add(user)
+        stakers_by_pool_and_date[timestamp][pool_id].add(user)
+        stake_time = timedelta(seconds=int(row['claimLockEnd']) - int(row['claimLockStart']))
+        total_stake_time[pool_id] += stake_time
+        stake_count[pool_id] += 1
+
+    avg_stake_time = {pool_id: (total_time / stake_count[pool_id] if stake_count[pool_id] > 0 else timedelta())
+                      for pool_id, total_time in total_stake_time.items()}
+    total_combined_stakes = sum(stake_count.values())
+    combined_avg_stake_time = sum(total_stake_time.values(), timedelta()) / total_combined_stakes \
+        if total_combined_stakes > 0 else timedelta()
+
+    return {
+        'total_unique_stakers': {
+            'pool_0': len(stakers_by_pool[0]),
+            'pool_1': len(stakers_by_pool[1]),
+            'combined': len(stakers_by_pool[0] | stakers_by_pool[1])
+        },
+        'daily_unique_stakers': {day: {'pool_0': len(pools[0]), 'pool_1': len(pools[1]),
+                                       'combined': len(pools[0] | pools[1])}
+                                 for day, pools in stakers_by_pool_and_date.items()},
+        'average_stake_time': avg_stake_time,
+        'combined_average_stake_time': combined_avg_stake_time,
+        'total_stakes': stake_count,
+    }
+
+
+def reference_average_multipliers(df: pd.DataFrame) -> dict:
+    """The per-row Decimal conversion and sums calculate_average_multipliers ran before average_multipliers"""
+    valid_df = df[df.apply(is_valid_stake, axis=1)].copy()
+    valid_df['multiplier'] = valid_df['multiplier'].apply(lambda x: Decimal(x) / Decimal('1e18'))
+
+    def average(frame):
+        return frame['multiplier'].sum() / len(frame) if len(frame) > 0 else Decimal('0')
+
+    return {
+        'overall_average': average(valid_df),
+        'capital_average': average(valid_df[valid_df['poolId'] == 0]),
+        'code_average': average(valid_df[valid_df['poolId'] == 1])
+    }
+
+
+def reference_wallet_stake_distribution(df: pd.DataFrame) -> dict:
+    """
+    The iterrows loop build_wallet_stake_distribution ran before it went columnar, comparing multipliers to the bin
+    edges as exact integers instead of through int(float(multiplier)) / 1e25, which put 7x stakes in the 6x bin
+    """
+    wallet_info = {'combined': {}, 'capital': {}, 'code': {}}
+
+    for _, row in df.iterrows():
+        if not is_valid_stake(row):
+            continue
+
+        wallet = row['user']
+        pool_id = int(row['poolId'])
+        stake_time = timedelta(seconds=int(row['claimLockEnd']) - int(row['claimLockStart']))
+        power_multiplier = int(row['multiplier'])
+        for key in ['combined', 'capital' if pool_id == 0 else 'code']:
+            if wallet not in wallet_info[key] or stake_time > wallet_info[key][wallet]['stake_time']:
+                wallet_info[key][wallet] = {'stake_time': stake_time, 'power_multiplier': power_multiplier}
+
+    def bin_data_custom_ranges(data, bins, right=True):
+        bin_indices = np.digitize(data, bins, right=right)
+        frequencies = np.bincount(bin_indices, minlength=len(bins))[1:]
+        ranges = [[float(bins[i]), float(bins[i + 1]) if i < len(bins) - 2 else None] for i in range(len(bins) - 1)]
+        return ranges, frequencies.tolist()
+
+    def process_pool_data(pool_data):
+        stake_times = np.array([v["stake_time"].total_seconds() for v in pool_data.values()])
+        power_multiplier_bins = [sum(v["power_multiplier"] >= edge * 10 ** 25 for edge in range(1, 11))
+                                 for v in pool_data.values()]
+        stake_time_ranges, stake_time_frequencies = bin_data_custom_ranges(
+            stake_times / (365.25 * 24 * 60 * 60), [0, 1, 2, 3, 4, 5, 6, 1000])
+        power_multiplier_ranges, power_multiplier_frequencies = bin_data_custom_ranges(
+            power_multiplier_bins, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11], right=False)
+        return {
+            "stake_time": {"ranges": stake_time_ranges, "frequencies": stake_time_frequencies},
+            "power_multiplier": {"ranges": power_multiplier_ranges, "frequencies": power_multiplier_frequencies}
+        }
+
+    return {key: process_pool_data(wallet_info[key]) for key in ['combined', 'capital', 'code']}
+
+
+def as_served(function):
+    """
+    function with its Decimal results as floats, like the staking metrics serve them (the reference rounds Decimals
+    to 28 digits, the app's means are exact)
+    """
+    def served(df):
+        return {key: float(value) for key, value in function(df).items()}
+
+    return served
+
+
+def benchmarks():
+    """
+    (name, implementation, reference) of every benchmark, each called with the synthetic frame. The app's
+    implementations are timed together with building the staking dataset they read
+    """
+    from helpers.staking_helpers.staking_dataset import build_staking_dataset
+    from helpers.staking_helpers.staking_main import average_multipliers, summarize_stakers
+    from helpers.staking_helpers.wallet_stake_distribution import build_wallet_stake_distribution
+
+    def on_dataset(function):
+        return lambda df: function(build_staking_dataset(df))
+
+    def on_stakes(function):
+        return lambda df: function(build_staking_dataset(df).stakes)
+
+    return [
+        ('build_staking_dataset', build_staking_dataset, None),
+        ('summarize_stakers', on_dataset(summarize_stakers), reference_summarize_stakers),
+        ('build_wallet_stake_distribution', on_stakes(build_wallet_stake_distribution),
+         reference_wallet_stake_distribution),
+        ('average_multipliers', as_served(on_dataset(average_multipliers)),
+         as_served(reference_average_multipliers)),
+    ]
+
+
+def ordered(value):
+    """value with every dict turned into a list of items, so comparing also compares key order"""
+    if isinstance(value, dict):
+        return [(key, ordered(item)) for key, item in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [ordered(item) for item in value]
+    return value
+
+
+def timed(function, df, repeat: int):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(df)
+        times.append(time.perf_counter() - start_time)
+    return result, statistics.median(times)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Rows of the synthetic sheet (default 1M)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs of each implementation (default 3)")
+    parser.add_argument('--seed', type=int, default=20240208, help="Seed of the synthetic sheet")
+    parser.add_argument('--only', action='append', help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument('--skip-reference', action='store_true', help="Don't run or compare the reference loops")
+    parser.add_argument('--json', help="Also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    start_time = time.perf_counter()
+    df = synthetic_user_multiplier(args.rows, args.seed)
+    print(f"Generated {len(df):,} rows in {time.perf_counter() - start_time:.1f}s")
+
+    results = {}
+    mismatches = []
+    for name, implementation, reference in benchmarks():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        result, seconds = timed(implementation, df, args.repeat)
+        results[name] = {'seconds': round(seconds, 4)}
+        if reference is not None and not args.skip_reference:
+            # The reference loop is slow, run it once
+            expected, reference_seconds = timed(reference, df, 1)
+            results[name].update(reference_seconds=round(reference_seconds, 4),
+                                 speedup=round(reference_seconds / seconds, 1),
+                                 identical=ordered(result) == ordered(expected))
+            if not results[name]['identical']:
+                mismatches.append(name)
+
+    print(f"{'benchmark':<34}{'median s':>10}{'reference s':>13}{'speedup':>9}  identical")
+    for name, result in results.items():
+        if 'reference_seconds' in result:
+            print(f"{name:<34}{result['seconds']:>10.3f}{result['reference_seconds']:>13.3f}"
+                  f"{result['speedup']:>8.1f}x  {result['identical']}")
+        else:
+            print(f"{name:<34}{result['seconds']:>10.3f}{'-':>13}{'-':>9}  -")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'rows': args.rows, 'seed': args.seed, 'results': results}, file, indent=2)
+
+    if mismatches:
+        print(f"\nDifferent results from the reference: {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
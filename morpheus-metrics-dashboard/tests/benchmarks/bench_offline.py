@@ -0,0 +1,323 @@
+"""
+Offline benchmarks for the metric helpers and the full cache refresh.
+
+Every upstream (JSON-RPC per chain, Sheets, CoinGecko, DexScreener, Dune, GitHub, Etherscan-family and Slack) is
+replaced by the local stand-ins in fake_upstreams.py, serving the deterministic data from upstream_fixtures.py
+with a fixed latency per target. Runs are repeatable and need no credentials or network access.
+
+Each benchmark reports its median wall time over --repeat runs and the number of upstream requests it made per
+target, compared against the stored baseline.json.
+
+Usage, from the project root:
+
+    python tests/benchmarks/bench_offline.py                     # run everything and compare to the baseline
+    python tests/benchmarks/bench_offline.py --only capital      # benchmarks whose name contains "capital"
+    python tests/benchmarks/bench_offline.py --update-baseline   # record the results as the new baseline
+
+Exits with status 1 when a benchmark regressed: it failed, made more upstream requests than in the baseline, or
+its median got slower than the baseline by more than --tolerance (and by at least --min-delta seconds).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# Artificial latency of each upstream in seconds, roughly a tenth of what production sees
+DEFAULT_LATENCY = {
+    'sheets': 0.2,
+    'rpc': 0.005,
+    'coingecko': 0.05,
+    'dexscreener': 0.05,
+    'dune': 0.1,
+    'github': 0.05,
+    'etherscan': 0.05,
+    'arbiscan': 0.05,
+    'basescan': 0.05,
+    'slack': 0.01,
+}
+
+
+def benchmark_targets():
+    """
+    (name, fetch, blocking) for every benchmark. fetch is run the way the refresh graph runs it, see RefreshStage.
+    Imports the app, so call it only once the environment points at the stand-ins.
+    """
+    import main
+    from helpers.capital_helpers.capital_main import (get_all_claim_metrics, get_bridged_overplus_amounts_by_date,
+                                                      get_capital_metrics, get_total_supply_and_staker_info)
+    from helpers.code_helpers.code_main import get_total_weights_and_contributors
+    from helpers.code_helpers.get_github_commits_metrics import get_commits_data
+    from helpers.staking_helpers.get_emission_schedule_for_today import (get_emission_schedule_table,
+                                                                        get_historical_emissions)
+    from helpers.staking_helpers.get_mor_amount_staked_over_time import get_mor_staked_over_time
+    from helpers.staking_helpers.staking_main import (analyze_mor_stakers, calculate_average_multipliers,
+                                                      calculate_pool_rewards_summary, get_analyze_mor_master_dict,
+                                                      get_wallet_stake_info, get_wallet_stake_info_async,
+                                                      give_more_reward_response)
+    from helpers.supply_helpers.get_chain_wise_supplies import get_chain_wise_circ_supply
+    from helpers.supply_helpers.get_historical_total_supply import get_total_supply_from_emissions_df
+    from helpers.supply_helpers.supply_main import (get_combined_supply_data, get_historical_locked_and_burnt_mor,
+                                                    get_historical_prices_and_trading_volume, get_market_cap,
+                                                    get_mor_holders)
+    from helpers.uniswap_helpers.get_total_combined_uniswap_position import get_combined_uniswap_position
+
+    return [
+        ('analyze_mor_stakers', analyze_mor_stakers, False),
+        ('calculate_average_multipliers', calculate_average_multipliers, False),
+        ('calculate_pool_rewards_summary', calculate_pool_rewards_summary, False),
+        ('get_analyze_mor_master_dict', get_analyze_mor_master_dict, True),
+        ('get_wallet_stake_info', get_wallet_stake_info, False),
+        ('get_wallet_stake_info_async', get_wallet_stake_info_async, False),
+        ('give_more_reward_response', give_more_reward_response, False),
+        ('get_mor_staked_over_time', get_mor_staked_over_time, False),
+        ('get_total_supply_and_staker_info', get_total_supply_and_staker_info, False),
+        ('get_bridged_overplus_amounts_by_date', get_bridged_overplus_amounts_by_date, False),
+        ('get_all_claim_metrics', get_all_claim_metrics, False),
+        ('get_capital_metrics', get_capital_metrics, False),
+        ('get_total_supply_from_emissions_df', get_total_supply_from_emissions_df, False),
+        ('get_historical_emissions', get_historical_emissions, False),
+        ('get_emission_schedule_table', get_emission_schedule_table, False),
+        ('get_combined_supply_data', get_combined_supply_data, True),
+        ('get_historical_prices_and_trading_volume', get_historical_prices_and_trading_volume, False),
+        ('get_historical_locked_and_burnt_mor', get_historical_locked_and_burnt_mor, True),
+        ('get_market_cap', get_market_cap, True),
+        ('get_mor_holders', get_mor_holders, True),
+        ('get_combined_uniswap_position', get_combined_uniswap_position, False),
+        ('get_commits_data', get_commits_data, False),
+        ('get_total_weights_and_contributors', get_total_weights_and_contributors, False),
+        ('get_chain_wise_circ_supply', get_chain_wise_circ_supply, False),
+        ('update_cache_task', main.update_cache_task, False),
+    ]
+
+
+async def measure(name, fetch, blocking, counter, repeat: int, warmup: int) -> dict:
+    from app.core.prices import price_oracle
+    from app.core.refresh import RefreshStage
+    from sheets_config.google_utils import sheet_snapshot_scope
+
+    stage = RefreshStage(name, fetch, blocking=blocking, timeout=None)
+    timings = []
+    upstream_calls = {}
+    error = None
+
+    for run in range(warmup + repeat):
+        counter.reset()
+        # Refreshes of a key are further apart than the price TTL, so each run fetches the prices it needs
+        price_oracle.invalidate()
+        start_time = time.perf_counter()
+        try:
+            # Same scope as a refresh of the key by MetricRefresher
+            with sheet_snapshot_scope():
+                await stage.run()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start_time
+        if run >= warmup:
+            timings.append(seconds)
+            upstream_calls = counter.snapshot()
+
+    return {
+        'status': 'failed' if error else 'ok',
+        'error': error,
+        'median_seconds': round(statistics.median(timings), 4),
+        'min_seconds': round(min(timings), 4),
+        'upstream_calls': upstream_calls,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float):
+    """Return (report rows, names of regressed benchmarks)"""
+    rows, regressions = [], []
+    baseline_benchmarks = baseline.get('benchmarks', {}) if baseline else {}
+
+    for name, result in results.items():
+        reference = baseline_benchmarks.get(name)
+        calls = sum(result['upstream_calls'].values())
+        row = [name, f"{result['median_seconds']:.3f}", '-', '-', str(calls), 'new']
+
+        if result['status'] != 'ok':
+            row[-1] = f"FAILED ({result['error']})"
+            regressions.append(name)
+        elif reference is not None:
+            reference_seconds = reference['median_seconds']
+            change = (result['median_seconds'] - reference_seconds) / reference_seconds if reference_seconds else 0.0
+            row[2] = f"{reference_seconds:.3f}"
+            row[3] = f"{change:+.1%}"
+
+            more_calls = {target: (reference['upstream_calls'].get(target, 0), count)
+                          for target, count in result['upstream_calls'].items()
+                          if count > reference['upstream_calls'].get(target, 0)}
+            if more_calls:
+                row[-1] = 'MORE CALLS ' + ', '.join(f"{target} {before}->{after}"
+                                                    for target, (before, after) in more_calls.items())
+                regressions.append(name)
+            elif change > tolerance and result['median_seconds'] - reference_seconds >= min_delta:
+                row[-1] = 'SLOWER'
+                regressions.append(name)
+            elif change < -tolerance and reference_seconds - result['median_seconds'] >= min_delta:
+                row[-1] = 'faster'
+            else:
+                row[-1] = 'ok'
+        rows.append(row)
+
+    return rows, regressions
+
+
+def format_table(rows) -> str:
+    header = ['benchmark', 'median s', 'baseline s', 'change', 'upstream calls', 'verdict']
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header) - 1)]
+    lines = []
+    for row in [header] + rows:
+        lines.append('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)) + '  ' + row[-1])
+    return '\n'.join(lines)
+
+
+async def run_benchmarks(args, counter) -> dict:
+    results = {}
+    for name, fetch, blocking in benchmark_targets():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output) if not args.verbose else contextlib.nullcontext():
+            results[name] = await measure(name, fetch, blocking, counter, args.repeat, args.warmup)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--only', action='append', help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument('--repeat', type=int, default=3, help="Measured runs per benchmark (default 3)")
+    parser.add_argument('--warmup', type=int, default=1, help="Unmeasured runs before measuring (default 1)")
+    parser.add_argument('--scale', type=float, default=1, help="Multiplier for the size of the upstream data")
+    parser.add_argument('--latency-scale', type=float, default=1,
+                        help="Multiplier for the artificial upstream latencies, 0 disables them")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative slowdown reported as a regression (default 0.25)")
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="Smallest absolute slowdown in seconds reported as a regression (default 0.05)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline file to compare against or update")
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's logs and output")
+    return parser.parse_args(argv)
+
+
+@contextlib.contextmanager
+def offline_environment(scale: float = 1, latency_scale: float = 1, verbose: bool = False):
+    """
+    Start the upstream stand-ins and point the app at them, yielding (counter, latency). Runs in a temporary working
+    directory so the cache shards and sheet checkpoints stay out of the project. Import the app only inside the block: it reads its
+    upstream URLs at import time.
+    """
+    from fake_upstreams import CallCounter, FakeSpreadsheet, UpstreamLatency, UpstreamServer
+
+    latency = UpstreamLatency({target: seconds * latency_scale for target, seconds in DEFAULT_LATENCY.items()})
+    counter = CallCounter()
+    server = UpstreamServer(counter, latency).start()
+    os.environ.update(server.environment())
+
+    work_dir = tempfile.TemporaryDirectory(prefix='morpheus-bench-')
+    os.chdir(work_dir.name)
+    # Sheet checkpoints default to the app directory, keep the fixture rows out of it and every run cold
+    os.environ['SHEET_CHECKPOINT_DIR'] = os.path.join(work_dir.name, 'sheet_checkpoints')
+
+    if not verbose:
+        logging.disable(logging.CRITICAL)
+        warnings.simplefilter('ignore')
+
+    try:
+        from upstream_fixtures import DEFAULT_SEED, build_upstream_dataset
+        from app.core.executors import shutdown_executors
+        from sheets_config.google_utils import set_spreadsheet
+
+        dataset = build_upstream_dataset(server.base_url, scale=scale, seed=DEFAULT_SEED)
+        server.install(dataset.chains, dataset.services)
+        set_spreadsheet(FakeSpreadsheet(dataset.sheets, counter, latency))
+        try:
+            yield counter, latency
+        finally:
+            shutdown_executors()
+    finally:
+        server.stop()
+        os.chdir(PROJECT_ROOT)
+        work_dir.cleanup()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    args.baseline = os.path.abspath(args.baseline)
+    args.json = os.path.abspath(args.json) if args.json else None
+
+    with offline_environment(args.scale, args.latency_scale, args.verbose) as (counter, latency):
+        from upstream_fixtures import DEFAULT_SEED
+
+        parameters = {
+            'scale': args.scale,
+            'seed': DEFAULT_SEED,
+            'latency': latency.latencies,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+        }
+        results = asyncio.run(run_benchmarks(args, counter))
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        baseline_parameters = {key: baseline.get('parameters', {}).get(key) for key in ('scale', 'seed', 'latency')}
+        if not args.update_baseline and baseline_parameters != {key: parameters[key] for key in baseline_parameters}:
+            print(f"The baseline in {args.baseline} was recorded with different parameters "
+                  f"{baseline_parameters}, rerun with the same --scale and --latency-scale or --update-baseline")
+            return 2
+
+    rows, regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    print(format_table(rows))
+
+    report = {
+        'parameters': parameters,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'benchmarks': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.update_baseline:
+        if args.only and baseline:
+            # Only replace the benchmarks that were run
+            report['benchmarks'] = {**baseline.get('benchmarks', {}), **results}
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
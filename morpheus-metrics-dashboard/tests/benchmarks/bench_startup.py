@@ -0,0 +1,168 @@
+"""
+Startup benchmark: how long importing the app takes, and what its lazily built resources cost on first use.
+
+Each run is a fresh interpreter with outbound connections disabled and no Google credentials, so it also checks that
+the app can be imported offline. The interpreter imports app.core.config, sheets_config.google_utils and main in
+turn (each time is the cost on top of the previous imports). It then builds every Web3 provider, ABI and contract
+from app.core.config. With -X importtime the self time of the app's own modules is split from that of its
+libraries.
+
+Usage, from the project root:
+
+    python tests/benchmarks/bench_startup.py                 # median of 5 cold starts
+    python tests/benchmarks/bench_startup.py --repeat 10 --json startup.json
+
+Exits with status 1 when an import fails or tries to open a network connection, or when the app's own modules
+take longer than --max-app-seconds to import.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+
+MODULES = ['app.core.config', 'sheets_config.google_utils', 'main']
+
+# Top-level packages of the app itself, the rest of the import time belongs to its libraries
+APP_PACKAGES = ('app', 'helpers', 'sheets_config', 'main')
+
+# Unroutable endpoints, any attempt to reach them fails the run
+OFFLINE_ENVIRONMENT = {
+    'RPC_URL': 'http://127.0.0.1:9',
+    'ARB_RPC_URL': 'http://127.0.0.1:9',
+    'BASE_RPC_URL': 'http://127.0.0.1:9',
+    'SPREADSHEET_ID': '',
+}
+
+
+class NetworkAccessError(RuntimeError):
+    pass
+
+
+def refuse_connections():
+    def connect(self, address):
+        raise NetworkAccessError(f"Network access during startup: {address}")
+
+    socket.socket.connect = connect
+    socket.socket.connect_ex = connect
+
+
+def child() -> dict:
+    """Measure one cold start in this interpreter, which must not have imported the app yet"""
+    refuse_connections()
+    sys.path.insert(0, PROJECT_ROOT)
+    import importlib
+
+    result = {'imports': {}}
+    for module in MODULES:
+        start_time = time.perf_counter()
+        importlib.import_module(module)
+        result['imports'][module] = time.perf_counter() - start_time
+
+    from app.core import config
+
+    start_time = time.perf_counter()
+    for chain in config.RPC_URLS:
+        config.get_web3(chain)
+        config.get_async_web3(chain)
+    for name in config.CONTRACTS:
+        config.get_contract(name)
+        config.get_async_contract(name)
+    result['first_use'] = time.perf_counter() - start_time
+    return result
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Self time in seconds of the app's own modules and of everything else, from -X importtime output"""
+    totals = {'app': 0.0, 'libraries': 0.0}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        package = module.strip().split('.')[0]
+        totals['app' if package in APP_PACKAGES else 'libraries'] += int(self_us) / 1e6
+    return totals
+
+
+def cold_start(workdir: str) -> dict:
+    env = {**os.environ, **OFFLINE_ENVIRONMENT, 'PYTHONDONTWRITEBYTECODE': '1'}
+    process = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child'],
+                             cwd=workdir, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('\n'.join(errors[-20:]))
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['self_time'] = parse_importtime(process.stderr)
+    return result
+
+
+def summarize(runs: list) -> dict:
+    def median(values):
+        return round(statistics.median(values), 4)
+
+    return {
+        'imports': {module: median([run['imports'][module] for run in runs]) for module in MODULES},
+        'total_import': median([sum(run['imports'].values()) for run in runs]),
+        'app_modules': median([run['self_time']['app'] for run in runs]),
+        'libraries': median([run['self_time']['libraries'] for run in runs]),
+        'first_use': median([run['first_use'] for run in runs]),
+        'runs': len(runs),
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"{'step':<42}{'median s':>10}"]
+    for module, seconds in summary['imports'].items():
+        lines.append(f"{'import ' + module:<42}{seconds:>10.3f}")
+    lines.append(f"{'total import':<42}{summary['total_import']:>10.3f}")
+    lines.append(f"{'  of which the app modules':<42}{summary['app_modules']:>10.3f}")
+    lines.append(f"{'  of which libraries':<42}{summary['libraries']:>10.3f}")
+    lines.append(f"{'first use of providers and contracts':<42}{summary['first_use']:>10.3f}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5, help="Cold starts to measure (default 5)")
+    parser.add_argument('--max-app-seconds', type=float, default=0.25,
+                        help="Fail when the app's own modules take longer than this to import (default 0.25)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(child()))
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as workdir:
+        try:
+            runs = [cold_start(workdir) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"Startup failed:\n{e}")
+            return 1
+
+    summary = summarize(runs)
+    print(format_summary(summary))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+    if summary['app_modules'] > args.max_app_seconds:
+        print(f"\nThe app's own modules took {summary['app_modules']:.3f}s to import, "
+              f"more than {args.max_app_seconds}s")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,550 @@
+"""
+Local stand-ins for every upstream service the metrics refresh talks to, used by the offline benchmarks.
+
+UpstreamServer is a threaded HTTP server answering, under one path prefix per service:
+
+    /rpc/<chain>   Ethereum JSON-RPC: eth_call, eth_getLogs and log filters, eth_getBlockByNumber, ...
+    /coingecko  /dexscreener  /dune  /github  /etherscan  /arbiscan  /basescan  /slack
+
+FakeSpreadsheet replaces the gspread spreadsheet behind sheets_config.google_utils.
+
+Every request is counted per target and delayed by a fixed per-target latency, so repeated runs do the same
+work and take comparable time.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from eth_abi import decode, encode
+from eth_utils import to_checksum_address
+from eth_utils.abi import (event_abi_to_log_topic, function_abi_to_4byte_selector, get_abi_input_types,
+                           get_abi_output_types)
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range
+
+
+class CallCounter:
+    """Thread-safe count of upstream requests per target"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, target: str):
+        with self._lock:
+            self._counts[target] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+
+class UpstreamLatency:
+    """
+    Fixed artificial latency per target in seconds. A target like rpc_arbitrum falls back to the latency of its
+    prefix (rpc) and then to `default`.
+    """
+
+    def __init__(self, latencies: dict = None, default: float = 0.0):
+        self.latencies = latencies or {}
+        self.default = default
+
+    def delay(self, target: str):
+        seconds = self.latencies.get(target, self.latencies.get(target.split('_')[0], self.default))
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+########################################################## SHEETS ######################################################
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title: str, rows: list):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = rows
+
+    def _request(self):
+        self.spreadsheet.counter.record('sheets')
+        self.spreadsheet.latency.delay('sheets')
+
+    def get_all_values(self):
+        self._request()
+        return [list(row) for row in self.rows]
+
+    def append_rows(self, values):
+        self._request()
+        self.rows.extend([str(value) for value in row] for row in values)
+
+    def clear(self):
+        self._request()
+        self.rows = []
+
+    def update(self, values):
+        self._request()
+        self.rows = [[str(value) for value in row] for row in values]
+
+
+class FakeSpreadsheet:
+    """Serves sheets (name -> rows of strings, header first) through the part of the gspread API the app uses"""
+
+    def __init__(self, sheets: dict, counter: CallCounter, latency: UpstreamLatency):
+        self.counter = counter
+        self.latency = latency
+        self._worksheets = {name: FakeWorksheet(self, name, rows) for name, rows in sheets.items()}
+
+    def worksheet(self, title: str):
+        # Opening a worksheet is a metadata request of its own with gspread
+        self.counter.record('sheets')
+        self.latency.delay('sheets')
+        if title not in self._worksheets:
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def values_batch_get(self, ranges, params=None):
+        """values:batchGet for whole sheets or 'Sheet'!A5:H ranges, trimming empty trailing cells like the Sheets API"""
+        self.counter.record('sheets')
+        self.latency.delay('sheets')
+        value_ranges = []
+        for sheet_range in ranges:
+            title, _, cells = sheet_range.partition('!')
+            title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+            if title not in self._worksheets:
+                raise WorksheetNotFound(title)
+            grid = a1_range_to_grid_range(cells) if cells else {}
+            values = [list(row[grid.get('startColumnIndex', 0):grid.get('endColumnIndex')])
+                      for row in self._worksheets[title].rows[grid.get('startRowIndex', 0):grid.get('endRowIndex')]]
+            for row in values:
+                while row and row[-1] == '':
+                    row.pop()
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({'range': sheet_range, 'majorDimension': 'ROWS', 'values': values})
+        return {'valueRanges': value_ranges}
+
+
+######################################################### JSON-RPC #####################################################
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def default_value(abi_type: str):
+    if abi_type.endswith(']'):
+        return []
+    if abi_type == 'address':
+        return '0x' + '00' * 20
+    if abi_type == 'bool':
+        return False
+    if abi_type == 'string':
+        return ''
+    if abi_type.startswith('bytes'):
+        return b'' if abi_type == 'bytes' else b'\x00' * int(abi_type[5:])
+    return 0
+
+
+class FakeContract:
+    """
+    Decodes eth_call data against the contract ABI and encodes the value returned by the handler registered for
+    the called function. Functions without a handler return zero values.
+    """
+
+    def __init__(self, address: str, abi: list, handlers: dict = None):
+        self.address = address.lower()
+        self.functions = {function_abi_to_4byte_selector(item): item for item in abi if item.get('type') == 'function'}
+        self.events = {item['name']: item for item in abi if item.get('type') == 'event'}
+        self.handlers = handlers or {}
+
+    def call(self, data: bytes) -> bytes:
+        function_abi = self.functions.get(data[:4])
+        if function_abi is None:
+            raise RpcError(3, "execution reverted")
+
+        args = decode(get_abi_input_types(function_abi), data[4:])
+        output_types = get_abi_output_types(function_abi)
+        handler = self.handlers.get(function_abi['name'])
+        if handler is None:
+            values = tuple(default_value(output_type) for output_type in output_types)
+        else:
+            values = handler(*args)
+            if not isinstance(values, (tuple, list)):
+                values = (values,)
+        return encode(output_types, values)
+
+
+def hex_int(value: int) -> str:
+    return hex(value)
+
+
+def hex_bytes(value: bytes) -> str:
+    return '0x' + value.hex()
+
+
+def keccak_like(*parts) -> bytes:
+    return hashlib.blake2b(repr(parts).encode(), digest_size=32).digest()
+
+
+class FakeChain:
+    """An in-memory chain: contracts answering eth_call, event logs and blocks with deterministic timestamps"""
+
+    def __init__(self, name: str, chain_id: int, head_block: int, head_timestamp: int, block_time: float):
+        self.name = name
+        self.chain_id = chain_id
+        self.head_block = head_block
+        self.head_timestamp = head_timestamp
+        self.block_time = block_time
+        self.contracts = {}
+        self.logs = []
+        self._filters = {}
+        self._lock = threading.Lock()
+
+    def add_contract(self, contract: FakeContract):
+        self.contracts[contract.address] = contract
+        return contract
+
+    def block_timestamp(self, block_number: int) -> int:
+        return int(self.head_timestamp - (self.head_block - block_number) * self.block_time)
+
+    def emit(self, contract: FakeContract, event_name: str, args: dict, block_number: int):
+        """Append an event log, encoding indexed arguments as topics and the rest as data"""
+        event_abi = contract.events[event_name]
+        topics = [event_abi_to_log_topic(event_abi)]
+        data_types, data_values = [], []
+        for event_input in event_abi['inputs']:
+            value = args[event_input['name']]
+            if event_input.get('indexed'):
+                topics.append(encode([event_input['type']], [value]))
+            else:
+                data_types.append(event_input['type'])
+                data_values.append(value)
+
+        log_index = len(self.logs)
+        self.logs.append({
+            'address': to_checksum_address(contract.address),
+            'topics': [hex_bytes(topic) for topic in topics],
+            'data': hex_bytes(encode(data_types, data_values)),
+            'blockNumber': hex_int(block_number),
+            'blockHash': hex_bytes(keccak_like(self.name, 'block', block_number)),
+            'transactionHash': hex_bytes(keccak_like(self.name, 'tx', log_index)),
+            'transactionIndex': hex_int(0),
+            'logIndex': hex_int(log_index),
+            'removed': False,
+        })
+
+    def block(self, block_number: int) -> dict:
+        return {
+            'number': hex_int(block_number),
+            'hash': hex_bytes(keccak_like(self.name, 'block', block_number)),
+            'parentHash': hex_bytes(keccak_like(self.name, 'block', block_number - 1)),
+            'nonce': '0x0000000000000000',
+            'sha3Uncles': hex_bytes(b'\x00' * 32),
+            'logsBloom': hex_bytes(b'\x00' * 256),
+            'transactionsRoot': hex_bytes(b'\x00' * 32),
+            'stateRoot': hex_bytes(b'\x00' * 32),
+            'receiptsRoot': hex_bytes(b'\x00' * 32),
+            'miner': '0x' + '00' * 20,
+            'difficulty': hex_int(0),
+            'totalDifficulty': hex_int(0),
+            'extraData': '0x',
+            'size': hex_int(1000),
+            'gasLimit': hex_int(30_000_000),
+            'gasUsed': hex_int(15_000_000),
+            'timestamp': hex_int(self.block_timestamp(block_number)),
+            'transactions': [],
+            'uncles': [],
+            'baseFeePerGas': hex_int(10 ** 9),
+        }
+
+    def resolve_block(self, tag) -> int:
+        if tag is None or tag in ('latest', 'safe', 'finalized', 'pending'):
+            return self.head_block
+        if tag == 'earliest':
+            return 0
+        return int(tag, 16) if isinstance(tag, str) else int(tag)
+
+    def matching_logs(self, criteria: dict) -> list:
+        from_block = self.resolve_block(criteria.get('fromBlock', 'latest'))
+        to_block = self.resolve_block(criteria.get('toBlock', 'latest'))
+        addresses = criteria.get('address')
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        topic_filters = criteria.get('topics') or []
+
+        def topics_match(log_topics):
+            for position, expected in enumerate(topic_filters):
+                if expected is None:
+                    continue
+                if position >= len(log_topics):
+                    return False
+                options = expected if isinstance(expected, list) else [expected]
+                if log_topics[position].lower() not in {option.lower() for option in options}:
+                    return False
+            return True
+
+        return [log for log in self.logs
+                if from_block <= int(log['blockNumber'], 16) <= to_block
+                and (addresses is None or log['address'].lower() in addresses)
+                and topics_match(log['topics'])]
+
+    def handle(self, method: str, params: list):
+        if method == 'web3_clientVersion':
+            return 'FakeChain/1.0'
+        if method == 'eth_chainId':
+            return hex_int(self.chain_id)
+        if method == 'net_version':
+            return str(self.chain_id)
+        if method == 'eth_blockNumber':
+            return hex_int(self.head_block)
+        if method == 'eth_call':
+            transaction = params[0]
+            contract = self.contracts.get((transaction.get('to') or '').lower())
+            if contract is None:
+                return '0x'
+            data = transaction.get('data') or transaction.get('input') or '0x'
+            return hex_bytes(contract.call(bytes.fromhex(data[2:])))
+        if method == 'eth_getLogs':
+            return self.matching_logs(params[0])
+        if method == 'eth_newFilter':
+            with self._lock:
+                filter_id = hex_int(len(self._filters) + 1)
+                self._filters[filter_id] = {'criteria': params[0], 'delivered': False}
+            return filter_id
+        if method in ('eth_getFilterLogs', 'eth_getFilterChanges'):
+            log_filter = self._filters.get(params[0])
+            if log_filter is None:
+                raise RpcError(-32000, "filter not found")
+            if method == 'eth_getFilterChanges' and log_filter['delivered']:
+                return []
+            log_filter['delivered'] = True
+            return self.matching_logs(log_filter['criteria'])
+        if method == 'eth_uninstallFilter':
+            return self._filters.pop(params[0], None) is not None
+        if method == 'eth_getBlockByNumber':
+            block_number = self.resolve_block(params[0])
+            if block_number > self.head_block:
+                return None
+            return self.block(block_number)
+        raise RpcError(-32601, f"the method {method} does not exist/is not available")
+
+    def handle_payload(self, payload):
+        if isinstance(payload, list):
+            return [self.handle_payload(request) for request in payload]
+        try:
+            result = self.handle(payload['method'], payload.get('params') or [])
+            return {'jsonrpc': '2.0', 'id': payload.get('id'), 'result': result}
+        except RpcError as e:
+            return {'jsonrpc': '2.0', 'id': payload.get('id'), 'error': {'code': e.code, 'message': e.message}}
+
+
+######################################################### HTTP #########################################################
+class UpstreamServer(ThreadingHTTPServer):
+    """
+    Serves every fake upstream on 127.0.0.1. Start it before the app is imported and point the app at it with
+    environment(); the data it serves is installed afterwards with install().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, counter: CallCounter, latency: UpstreamLatency, port: int = 0):
+        super().__init__(('127.0.0.1', port), UpstreamRequestHandler)
+        self.counter = counter
+        self.latency = latency
+        self.chains = {}
+        self.services = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def environment(self) -> dict:
+        """The environment variables that point the app's upstream clients at this server"""
+        return {
+            'RPC_URL': f"{self.base_url}/rpc/ethereum",
+            'ARB_RPC_URL': f"{self.base_url}/rpc/arbitrum",
+            'BASE_RPC_URL': f"{self.base_url}/rpc/base",
+            'COINGECKO_API_URL': f"{self.base_url}/coingecko",
+            'DEXSCREENER_API_URL': f"{self.base_url}/dexscreener",
+            'DUNE_API_URL': f"{self.base_url}/dune",
+            'GITHUB_API_URL': f"{self.base_url}/github",
+            'ETHERSCAN_API_URL': f"{self.base_url}/etherscan/api",
+            'ARBISCAN_API_URL': f"{self.base_url}/arbiscan/api",
+            'BASESCAN_API_URL': f"{self.base_url}/basescan/api",
+            'SLACK_URL': f"{self.base_url}/slack",
+            'DUNE_API_KEY': 'offline',
+            'DUNE_QUERY_ID': '1',
+            'GITHUB_API_KEY': 'offline',
+            'ETHERSCAN_API_KEY': 'offline',
+            'ARBISCAN_API_KEY': 'offline',
+            'BASESCAN_API_KEY': 'offline',
+            'SPREADSHEET_ID': 'offline',
+        }
+
+    def install(self, chains: dict, services):
+        """chains maps a chain name to its FakeChain, services answers the REST APIs (see HttpServices)"""
+        self.chains = chains
+        self.services = services
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class UpstreamRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, don't let Nagle's algorithm hold the body back
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        service = parts[0] if parts else ''
+
+        if service == 'rpc' and len(parts) == 2 and parts[1] in self.server.chains:
+            target = f"rpc_{parts[1]}"
+            self.server.counter.record(target)
+            self.server.latency.delay(target)
+            self._send(200, self.server.chains[parts[1]].handle_payload(json.loads(body)))
+            return
+
+        handler = getattr(self.server.services, service, None) if service else None
+        if handler is None:
+            self._send(404, {'error': f"unknown upstream {url.path}"})
+            return
+        self.server.counter.record(service)
+        self.server.latency.delay(service)
+        status, payload, headers = handler(parts[1:], query, body)
+        self._send(status, payload, headers)
+
+    def _send(self, status: int, payload, headers: dict = None):
+        content = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class HttpServices:
+    """
+    The REST upstreams. Each method handles one path prefix and returns (status, payload, headers) for the
+    remaining path segments, query parameters and request body.
+    """
+
+    def __init__(self, base_url: str, market_chart: dict, simple_prices: dict, dex_prices: dict, dune_rows: list,
+                 github_commits: dict, token_supplies: dict):
+        self.base_url = base_url
+        self.market_chart = market_chart
+        self.simple_prices = simple_prices
+        self.dex_prices = {address.lower(): price for address, price in dex_prices.items()}
+        self.dune_rows = dune_rows
+        self.github_commits = github_commits
+        self.token_supplies = token_supplies
+
+    def coingecko(self, path, query, body):
+        if path[:1] == ['simple']:
+            ids = query.get('ids', '').split(',')
+            return 200, {crypto_id: {'usd': self.simple_prices[crypto_id]}
+                         for crypto_id in ids if crypto_id in self.simple_prices}, None
+        if path[-1:] == ['market_chart']:
+            return 200, self.market_chart, None
+        return 404, {'error': 'not found'}, None
+
+    def dexscreener(self, path, query, body):
+        price = self.dex_prices.get(path[-1].lower()) if path else None
+        if price is None:
+            return 200, {'schemaVersion': '1.0.0', 'pairs': None}, None
+        return 200, {'schemaVersion': '1.0.0', 'pairs': [{'priceUsd': str(price)}]}, None
+
+    def dune(self, path, query, body):
+        # /api/v1/query/<id>/results returns the latest execution, /api/v1/execution/<id>/results pages through it
+        limit = int(query.get('limit', len(self.dune_rows)))
+        offset = int(query.get('offset', 0))
+        rows = self.dune_rows[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(self.dune_rows) else None
+        now = time.time()
+        payload = {
+            'execution_id': 'offline-execution',
+            'query_id': int(path[3]) if path[2:3] == ['query'] else 1,
+            'state': 'QUERY_STATE_COMPLETED',
+            'is_execution_finished': True,
+            'submitted_at': iso_timestamp(now - 3700),
+            'execution_started_at': iso_timestamp(now - 3650),
+            'execution_ended_at': iso_timestamp(now - 3600),
+            'expires_at': iso_timestamp(now + 86400 * 90),
+            'result': {
+                'rows': rows,
+                'metadata': {
+                    'column_names': ['address', 'amount', 'chain'],
+                    'result_set_bytes': len(json.dumps(rows)),
+                    'total_row_count': len(self.dune_rows),
+                    'datapoint_count': len(rows) * 3,
+                    'pending_time_millis': 10,
+                    'execution_time_millis': 1000,
+                },
+            },
+        }
+        if next_offset is not None and path[2:3] == ['execution']:
+            payload['next_offset'] = next_offset
+            payload['next_uri'] = (f"{self.base_url}/dune/api/v1/execution/offline-execution/results"
+                                   f"?limit={limit}&offset={next_offset}")
+        return 200, payload, None
+
+    def github(self, path, query, body):
+        # /repos/<owner>/<repo>/commits
+        commits = self.github_commits.get(path[2] if len(path) > 2 else '', [])
+        per_page = int(query.get('per_page', 30))
+        page = int(query.get('page', 1))
+        page_commits = commits[(page - 1) * per_page:page * per_page]
+        links = []
+        if page * per_page < len(commits):
+            links.append(f'<{self.base_url}/github/{"/".join(path)}?page={page + 1}>; rel="next"')
+        links.append(f'<{self.base_url}/github/{"/".join(path)}?page=1>; rel="first"')
+        return 200, page_commits, {'Link': ', '.join(links)}
+
+    def _token_supply(self, chain, query):
+        return 200, {'status': '1', 'message': 'OK', 'result': str(self.token_supplies[chain])}, None
+
+    def etherscan(self, path, query, body):
+        return self._token_supply('ethereum', query)
+
+    def arbiscan(self, path, query, body):
+        return self._token_supply('arbitrum', query)
+
+    def basescan(self, path, query, body):
+        return self._token_supply('base', query)
+
+    def slack(self, path, query, body):
+        return 200, b'ok', None
+
+
+def iso_timestamp(unix_time: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(unix_time))
@@ -0,0 +1,347 @@
+"""
+HTTP load test for the API, served by a locally started app backed by the offline upstream stand-ins.
+
+The app runs in a child process (uvicorn on a free local port) with the fixtures of bench_offline.py, so the load
+generator doesn't compete with it for the interpreter. Once the startup refresh has filled the cache, closed-loop
+workers request every route listed in tests/full_mor_explorer_v1_test.py for --duration seconds each.
+
+Scenarios:
+
+    steady              traffic against a warm cache, nothing refreshing
+    refresh-under-load  the same traffic while update_cache_task runs, measured from the start of the refresh to
+                        its end, to show how much a full refresh degrades serving
+
+Reports p50/p95/p99 latency, throughput and error rate per route and overall.
+
+Usage, from the project root:
+
+    python tests/benchmarks/load_test.py                                   # both scenarios, 8 workers
+    python tests/benchmarks/load_test.py --concurrency 32 --duration 30
+    python tests/benchmarks/load_test.py --scenario steady --route /get_market_cap
+
+Exits with status 1 when the error rate of a scenario is above --max-error-rate.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from full_mor_explorer_v1_test import endpoints  # noqa: E402
+
+SCENARIOS = ['steady', 'refresh-under-load']
+
+
+########################################################## SERVER ######################################################
+def serve(args):
+    """Child process: serve the app against the stand-ins and run update_cache_task on 'refresh' from stdin"""
+    from bench_offline import offline_environment
+
+    # The control channel is the real stdout, the app's own prints go nowhere
+    control = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+
+    def send(message: str):
+        control.write(message + '\n')
+        control.flush()
+
+    with offline_environment(args.scale, args.latency_scale, args.verbose):
+        import uvicorn
+        import main
+
+        async def run():
+            config = uvicorn.Config(main.app, host='127.0.0.1', port=args.port, log_level='error',
+                                    access_log=False, lifespan='on')
+            server = uvicorn.Server(config)
+            serving = asyncio.create_task(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.05)
+            # Serve from a warm cache, the startup refresh fills it
+            await main.STARTUP_REFRESH_TASK
+            send('ready')
+
+            loop = asyncio.get_running_loop()
+            commands = asyncio.Queue()
+
+            def read_commands():
+                for line in sys.stdin:
+                    loop.call_soon_threadsafe(commands.put_nowait, line.strip())
+                loop.call_soon_threadsafe(commands.put_nowait, 'stop')
+
+            threading.Thread(target=read_commands, daemon=True).start()
+            while (command := await commands.get()) != 'stop':
+                if command == 'refresh':
+                    start_time = time.perf_counter()
+                    await main.update_cache_task()
+                    send(f'refreshed {time.perf_counter() - start_time:.3f}')
+
+            server.should_exit = True
+            await serving
+
+        asyncio.run(run())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """The app served by a `load_test.py --serve` child process"""
+
+    def __init__(self, args):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(self.port),
+                   '--scale', str(args.scale), '--latency-scale', str(args.latency_scale)]
+        if args.verbose:
+            command.append('--verbose')
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    async def read_message(self) -> str:
+        line = await asyncio.to_thread(self.process.stdout.readline)
+        if not line:
+            raise RuntimeError(f"The app process exited with status {self.process.wait()}")
+        return line.strip()
+
+    async def wait_ready(self):
+        while await self.read_message() != 'ready':
+            pass
+
+    async def refresh(self) -> float:
+        """Run update_cache_task in the app and return how long it took"""
+        self.process.stdin.write('refresh\n')
+        self.process.stdin.flush()
+        while not (message := await self.read_message()).startswith('refreshed '):
+            pass
+        return float(message.split()[1])
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+########################################################### LOAD #######################################################
+class LoadResults:
+    """Every request made: (route, start time, latency in seconds, error or None)"""
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, route: str, started: float, seconds: float, error):
+        self.samples.append((route, started, seconds, error))
+
+    def between(self, start: float, end: float):
+        """Samples of the requests started within [start, end)"""
+        return [sample for sample in self.samples if start <= sample[1] < end]
+
+
+async def worker(client, routes, offset: int, results: LoadResults, stop: asyncio.Event):
+    index = offset
+    while not stop.is_set():
+        route = routes[index % len(routes)]
+        index += 1
+        started = time.perf_counter()
+        error = None
+        try:
+            response = await client.get(route)
+            await response.aread()
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        results.record(route, started, time.perf_counter() - started, error)
+
+
+@contextlib.asynccontextmanager
+async def generate_load(base_url: str, routes, concurrency: int, timeout: float):
+    """Keep `concurrency` workers requesting the routes round-robin while the block runs, yielding the results"""
+    results = LoadResults()
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        workers = [asyncio.create_task(worker(client, routes, offset, results, stop))
+                   for offset in range(concurrency)]
+        try:
+            yield results
+        finally:
+            stop.set()
+            await asyncio.gather(*workers)
+
+
+######################################################### REPORT #######################################################
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    rank = max(int(-(-fraction * len(sorted_values) // 1)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, seconds: float) -> dict:
+    latencies = sorted(sample[2] for sample in samples)
+    errors = sum(1 for sample in samples if sample[3])
+    summary = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds else 0.0,
+    }
+    for name, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        summary[name] = round(percentile(latencies, fraction) * 1000, 2) if latencies else None
+    return summary
+
+
+def scenario_report(samples, seconds: float, routes) -> dict:
+    by_route = {route: [] for route in routes}
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+    error_kinds = {}
+    for sample in samples:
+        if sample[3]:
+            error_kinds[sample[3]] = error_kinds.get(sample[3], 0) + 1
+    return {
+        'seconds': round(seconds, 3),
+        'overall': summarize(samples, seconds),
+        'routes': {route: summarize(route_samples, seconds) for route, route_samples in by_route.items()},
+        'error_kinds': error_kinds,
+    }
+
+
+def format_scenario(name: str, report: dict, reference: dict = None) -> str:
+    header = ['route', 'requests', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'errors']
+    rows = []
+    for route, summary in list(report['routes'].items()) + [('overall', report['overall'])]:
+        row = [route, str(summary['requests']), f"{summary['throughput_rps']:.1f}"]
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            value = summary[key]
+            cell = '-' if value is None else f"{value:.1f}"
+            reference_value = reference['routes' if route != 'overall' else 'overall'] if reference else None
+            if route != 'overall' and reference_value is not None:
+                reference_value = reference_value.get(route)
+            if value is not None and reference_value and reference_value.get(key):
+                cell += f" ({value / reference_value[key]:.1f}x)"
+            row.append(cell)
+        row.append(f"{summary['errors']} ({summary['error_rate']:.1%})")
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    lines = [f"{name}: {report['seconds']:.1f} s"]
+    lines += ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in [header] + rows]
+    if report['error_kinds']:
+        lines.append('errors: ' + ', '.join(f"{kind} x{count}" for kind, count in report['error_kinds'].items()))
+    return '\n'.join(lines)
+
+
+######################################################## SCENARIOS #####################################################
+async def run_steady(app: AppProcess, args, routes) -> dict:
+    async with generate_load(app.base_url, routes, args.concurrency, args.timeout) as results:
+        start_time = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        end_time = time.perf_counter()
+    return scenario_report(results.between(start_time, end_time), end_time - start_time, routes)
+
+
+async def run_refresh_under_load(app: AppProcess, args, routes) -> dict:
+    """Traffic from the start to the end of a full refresh, which runs for at least --duration"""
+    async with generate_load(app.base_url, routes, args.concurrency, args.timeout) as results:
+        # Let the workers settle before refreshing
+        await asyncio.sleep(min(1.0, args.duration))
+        start_time = time.perf_counter()
+        refresh_seconds = await app.refresh()
+        end_time = time.perf_counter()
+    report = scenario_report(results.between(start_time, end_time), end_time - start_time, routes)
+    report['refresh_seconds'] = refresh_seconds
+    return report
+
+
+async def run_scenarios(args, routes) -> dict:
+    app = AppProcess(args)
+    try:
+        print("Starting the app and waiting for the startup refresh...", file=sys.stderr)
+        await app.wait_ready()
+        # Open the connections and touch every route once before measuring
+        async with generate_load(app.base_url, routes, args.concurrency, args.timeout):
+            await asyncio.sleep(min(1.0, args.duration))
+
+        reports = {}
+        for scenario in args.scenario:
+            print(f"Running {scenario}...", file=sys.stderr)
+            if scenario == 'steady':
+                reports[scenario] = await run_steady(app, args, routes)
+            else:
+                reports[scenario] = await run_refresh_under_load(app, args, routes)
+        return reports
+    finally:
+        app.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument('--route', action='append', help="Only request this route (repeatable, default: all)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients (default 8)")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of traffic per scenario (default 10)")
+    parser.add_argument('--timeout', type=float, default=30, help="Request timeout in seconds (default 30)")
+    parser.add_argument('--scale', type=float, default=1, help="Multiplier for the size of the upstream data")
+    parser.add_argument('--latency-scale', type=float, default=1,
+                        help="Multiplier for the artificial upstream latencies, 0 disables them")
+    parser.add_argument('--max-error-rate', type=float, default=0.0,
+                        help="Highest error rate of a scenario that isn't a failure (default 0)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's logs")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.scenario = args.scenario or SCENARIOS
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.serve:
+        serve(args)
+        return 0
+
+    routes = args.route or endpoints
+    reports = asyncio.run(run_scenarios(args, routes))
+
+    reference = reports.get('steady')
+    for name, report in reports.items():
+        print(format_scenario(name, report, reference if name != 'steady' else None))
+        if 'refresh_seconds' in report:
+            print(f"update_cache_task took {report['refresh_seconds']:.1f} s")
+        print()
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                'parameters': {key: getattr(args, key) for key in
+                               ('concurrency', 'duration', 'timeout', 'scale', 'latency_scale')},
+                'routes': routes,
+                'scenarios': reports,
+            }, file, indent=2)
+
+    failed = [name for name, report in reports.items() if report['overall']['error_rate'] > args.max_error_rate]
+    if failed:
+        print(f"Error rate above {args.max_error_rate:.1%} in: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
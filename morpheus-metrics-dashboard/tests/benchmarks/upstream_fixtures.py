@@ -0,0 +1,301 @@
+"""
+Deterministic synthetic upstream data for the offline benchmarks.
+
+Everything is generated from a seeded RNG, relative to the current day, so stake validity, emission schedules
+and the size of every workload stay the same whenever the benchmarks run. `scale` multiplies the number of
+rows, events and holders.
+
+Imports the app config, so import it only after the environment points the app at the stand-in services.
+"""
+import hashlib
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import (BURN_FROM_ADDRESS, BURN_TO_ADDRESS, CIRC_SUPPLY_SHEET_NAME, DISTRIBUTION_PROXY_ADDRESS,
+                             EMISSIONS_SHEET_NAME, MAINNET_BLOCK_1ST_JAN_2024, MOR_ARBITRUM_ADDRESS, MOR_BASE_ADDRESS,
+                             MOR_MULTISIG_ARB, MOR_MULTISIG_BASE, OVERPLUS_BRIDGED_SHEET_NAME, REWARD_SUM_SHEET_NAME,
+                             SAFE_ADDRESS, STETH_TOKEN_ADDRESS, SUPPLY_PROXY_ADDRESS, UNISWAP_POOL_ADDRESS_ARB,
+                             UNISWAP_POOL_ADDRESS_BASE, UNISWAP_V3_POSITIONS_NFT_ADDRESS_ARB,
+                             UNISWAP_V3_POSITIONS_NFT_ADDRESS_BASE, USER_MULTIPLIER_SHEET_NAME, USER_STAKED_SHEET_NAME,
+                             USER_WITHDRAWN_SHEET_NAME, get_abi)
+from fake_upstreams import FakeChain, FakeContract, HttpServices
+
+DEFAULT_SEED = 20240208
+LAUNCH_DATE = datetime(2024, 2, 8, tzinfo=timezone.utc)
+WEI = 10 ** 18
+DAY = 86400
+YEAR = 365 * DAY
+
+WETH_ARBITRUM_ADDRESS = '0x82aF49447D8a07e3bd95BD0d56f35241523fBab1'
+WETH_BASE_ADDRESS = '0x4200000000000000000000000000000000000006'
+GITHUB_REPOS = ['Docs', 'SmartContracts', 'moragents', 'MRC', 'MOR20', 'Morpheus-Lumerin-Node', 'DashBoard']
+
+# Row and event counts at scale 1
+SIZES = {
+    'users': 300,
+    'user_multiplier_rows': 600,
+    'user_staked_rows': 800,
+    'user_withdrawn_rows': 250,
+    'overplus_bridged_rows': 60,
+    'claim_events': 400,
+    'burn_events': 60,
+    'lock_events': 60,
+    'dune_holders': 2000,
+    'commits_per_repo': 150,
+    'positions_per_chain': 3,
+}
+
+
+class UpstreamDataset:
+    def __init__(self, sheets: dict, chains: dict, services: HttpServices):
+        self.sheets = sheets
+        self.chains = chains
+        self.services = services
+
+
+def stable_int(seed: int, *parts) -> int:
+    """A deterministic 64-bit integer derived from the seed and parts"""
+    digest = hashlib.blake2b(repr((seed,) + parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def random_address(rng: random.Random) -> str:
+    return '0x' + f"{rng.getrandbits(160):040x}"
+
+
+def random_hash(rng: random.Random) -> str:
+    return '0x' + f"{rng.getrandbits(256):064x}"
+
+
+def sheet_timestamp(unix_time: int) -> str:
+    return datetime.fromtimestamp(unix_time, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def build_upstream_dataset(base_url: str, scale: float = 1, seed: int = DEFAULT_SEED) -> UpstreamDataset:
+    rng = random.Random(seed)
+    sizes = {name: max(1, int(count * scale)) for name, count in SIZES.items()}
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    now = int(today.timestamp()) + 12 * 3600  # Midday, so "now" based validity checks don't depend on the hour
+    launch = int(LAUNCH_DATE.timestamp())
+
+    users = [random_address(rng) for _ in range(sizes['users'])]
+
+    sheets = {
+        USER_MULTIPLIER_SHEET_NAME: build_user_multiplier_sheet(rng, users, sizes['user_multiplier_rows'], launch, now),
+        USER_STAKED_SHEET_NAME: build_transfer_sheet(rng, users, sizes['user_staked_rows'], launch, now, 50),
+        USER_WITHDRAWN_SHEET_NAME: build_transfer_sheet(rng, users, sizes['user_withdrawn_rows'], launch, now, 20),
+        OVERPLUS_BRIDGED_SHEET_NAME: build_overplus_bridged_sheet(rng, sizes['overplus_bridged_rows'], launch, now),
+        EMISSIONS_SHEET_NAME: build_emissions_sheet(today),
+        REWARD_SUM_SHEET_NAME: [['Category', 'Value'],
+                                ['Daily Pool 0', '-3456.123'], ['Daily Pool 1', '-3456.123'],
+                                ['Total Pool 0', '-812345.67'], ['Total Pool 1', '-512345.67']],
+        CIRC_SUPPLY_SHEET_NAME: build_circ_supply_sheet(today),
+    }
+
+    chains = {
+        'ethereum': build_ethereum(rng, seed, users, sizes, now),
+        'arbitrum': build_arbitrum(rng, seed, sizes, now),
+        'base': build_base(seed, sizes, now),
+    }
+
+    services = HttpServices(
+        base_url,
+        market_chart=build_market_chart(rng, now),
+        simple_prices={'morpheusai': 12.5, 'staked-ether': 2500.0},
+        dex_prices={MOR_ARBITRUM_ADDRESS: 12.34, STETH_TOKEN_ADDRESS: 2500.1},
+        dune_rows=build_dune_holders(rng, sizes['dune_holders']),
+        github_commits={repo: build_commits(rng, sizes['commits_per_repo'], now) for repo in GITHUB_REPOS},
+        token_supplies={'ethereum': 1_250_000 * WEI, 'arbitrum': 600_000 * WEI, 'base': 150_000 * WEI},
+    )
+
+    return UpstreamDataset(sheets, chains, services)
+
+
+########################################################## SHEETS ######################################################
+def build_user_multiplier_sheet(rng, users, rows, launch, now):
+    sheet = [['Timestamp', 'TransactionHash', 'BlockNumber', 'user', 'poolId', 'multiplier', 'claimLockStart',
+              'claimLockEnd']]
+    for _ in range(rows):
+        staked_at = rng.randint(launch, now - DAY)
+        kind = rng.random()
+        if kind < 0.15:
+            claim_lock_start, claim_lock_end = 0, 0  # Never locked
+        elif kind < 0.4:
+            claim_lock_start, claim_lock_end = staked_at, rng.randint(staked_at, now - DAY)  # Lock expired
+        else:
+            claim_lock_start, claim_lock_end = staked_at, now + rng.randint(DAY, 6 * YEAR)
+        multiplier = int(rng.uniform(1, 10.7) * 10 ** 7) * 10 ** 18  # 1e25 == 1x
+        sheet.append([sheet_timestamp(staked_at), random_hash(rng), str(rng.randint(19_000_000, 21_000_000)),
+                      rng.choice(users), '0' if rng.random() < 0.8 else '1', str(multiplier),
+                      str(claim_lock_start), str(claim_lock_end)])
+    sheet[1:] = sorted(sheet[1:], key=lambda row: row[0])
+    return sheet
+
+
+def build_transfer_sheet(rng, users, rows, launch, now, max_amount):
+    sheet = [['Timestamp', 'TransactionHash', 'BlockNumber', 'PoolId', 'User', 'Amount']]
+    for _ in range(rows):
+        sheet.append([sheet_timestamp(rng.randint(launch, now - DAY)), random_hash(rng),
+                      str(rng.randint(19_000_000, 21_000_000)), '0' if rng.random() < 0.8 else '1',
+                      rng.choice(users), str(int(rng.uniform(0.01, max_amount) * 10 ** 6) * 10 ** 12)])
+    sheet[1:] = sorted(sheet[1:], key=lambda row: row[0])
+    return sheet
+
+
+def build_overplus_bridged_sheet(rng, rows, launch, now):
+    sheet = [['Timestamp', 'TransactionHash', 'BlockNumber', 'amount', 'uniqueId']]
+    for unique_id in range(rows):
+        sheet.append([sheet_timestamp(rng.randint(launch, now - DAY)), random_hash(rng),
+                      str(rng.randint(19_000_000, 21_000_000)), str(int(rng.uniform(10, 500) * 10 ** 6) * 10 ** 12),
+                      str(unique_id + 1)])
+    sheet[1:] = sorted(sheet[1:], key=lambda row: row[0])
+    return sheet
+
+
+def build_emissions_sheet(today):
+    """Cumulative emissions per category from launch until a year from now, like the real schedule"""
+    categories = ['Capital Emission', 'Code Emission', 'Compute Emission', 'Community Emission', 'Protection Emission']
+    shares = [0.24, 0.24, 0.24, 0.24, 0.04]
+    sheet = [['Date'] + categories + ['Total Emission', 'Total Supply']]
+    totals = [0.0] * len(categories)
+    day = LAUNCH_DATE
+    while day <= today + timedelta(days=365):
+        daily_emission = 14400 - 2.468994701 * (day - LAUNCH_DATE).days
+        totals = [total + daily_emission * share for total, share in zip(totals, shares)]
+        total_emission = sum(totals)
+        sheet.append([day.strftime('%Y-%m-%d')] + [f"{total:.4f}" for total in totals] +
+                     [f"{total_emission:.4f}", f"{total_emission + 14400:.4f}"])
+        day += timedelta(days=1)
+    return sheet
+
+
+def build_circ_supply_sheet(today):
+    sheet = [['date', 'circulating_supply_at_that_date', 'total_claimed_that_day']]
+    circulating_supply = 0.0
+    day = LAUNCH_DATE
+    while day <= today:
+        claimed = 1500 + (day - LAUNCH_DATE).days % 7 * 250
+        circulating_supply += claimed
+        sheet.append([day.strftime('%d/%m/%Y'), f"{circulating_supply:.4f}", f"{claimed:.4f}"])
+        day += timedelta(days=1)
+    return sheet
+
+
+######################################################### CHAINS #######################################################
+def build_ethereum(rng, seed, users, sizes, now):
+    chain = FakeChain('ethereum', 1, head_block=21_000_000, head_timestamp=now, block_time=12)
+
+    def users_data(user, pool_id):
+        value = stable_int(seed, 'usersData', user.lower(), pool_id)
+        deposited = 0 if value % 10 < 3 else (value % 1000 + 1) * 10 ** 16
+        return (now - value % YEAR, deposited, 10 ** 25, value % 10 ** 20, now - YEAR, now + value % (4 * YEAR),
+                deposited * 2)
+
+    def current_user_reward(pool_id, user):
+        return (stable_int(seed, 'reward', pool_id, user.lower()) % 5000) * 10 ** 16
+
+    distribution = chain.add_contract(FakeContract(DISTRIBUTION_PROXY_ADDRESS, get_abi('distribution'), {
+        'usersData': users_data,
+        'getCurrentUserReward': current_user_reward,
+        'poolsData': lambda pool_id: (now - DAY, 10 ** 25, 250_000 * WEI),
+    }))
+    chain.add_contract(FakeContract(SUPPLY_PROXY_ADDRESS, get_abi('supply'), {
+        'getTotalRewards': lambda: 2_500_000 * WEI,
+    }))
+
+    for _ in range(sizes['claim_events']):
+        chain.emit(distribution, 'UserClaimed', {
+            'poolId': 0 if rng.random() < 0.7 else 1,
+            'user': rng.choice(users),
+            'receiver': rng.choice(users),
+            'amount': int(rng.uniform(1, 2000) * 10 ** 6) * 10 ** 12,
+        }, rng.randint(MAINNET_BLOCK_1ST_JAN_2024, chain.head_block))
+    chain.logs.sort(key=lambda log: int(log['blockNumber'], 16))
+    return chain
+
+
+def sqrt_price_x96(tick: int) -> int:
+    return int(math.sqrt(1.0001 ** tick) * (1 << 96))
+
+
+def add_uniswap_positions(chain, seed, positions_abi, pool_abi, positions_address, pool_address, owner, token0,
+                          token1, count, tick):
+    first_token_id = 100_000 + stable_int(seed, chain.name, 'nft') % 100_000
+
+    def position(token_id):
+        offset = 600 * (1 + token_id % 5)
+        liquidity = (stable_int(seed, chain.name, 'liquidity', token_id) % 10 ** 6 + 1) * 10 ** 18
+        return (0, '0x' + '00' * 20, token0, token1, 3000, tick - offset, tick + offset, liquidity, 0, 0, 0, 0)
+
+    chain.add_contract(FakeContract(positions_address, positions_abi, {
+        'balanceOf': lambda address: count if address.lower() == owner.lower() else 0,
+        'tokenOfOwnerByIndex': lambda address, index: first_token_id + index,
+        'positions': position,
+    }))
+    chain.add_contract(FakeContract(pool_address, pool_abi, {
+        'slot0': lambda: (sqrt_price_x96(tick), tick, 0, 1, 1, 0, True),
+    }))
+
+
+def build_arbitrum(rng, seed, sizes, now):
+    chain = FakeChain('arbitrum', 42161, head_block=260_000_000, head_timestamp=now, block_time=0.25)
+    token = chain.add_contract(FakeContract(MOR_ARBITRUM_ADDRESS, get_abi('erc20')))
+
+    for event_count, to_address in ((sizes['burn_events'], BURN_TO_ADDRESS), (sizes['lock_events'], SAFE_ADDRESS)):
+        for _ in range(event_count):
+            chain.emit(token, 'Transfer', {
+                'from': BURN_FROM_ADDRESS,
+                'to': to_address,
+                'value': int(rng.uniform(10, 5000) * 10 ** 6) * 10 ** 12,
+            }, rng.randint(chain.head_block - 120_000_000, chain.head_block))
+    chain.logs.sort(key=lambda log: int(log['blockNumber'], 16))
+
+    # Token 0 is MOR and token 1 is WETH on Arbitrum
+    add_uniswap_positions(chain, seed, get_abi('arb_positions_nft'), get_abi('arb_pool'),
+                          UNISWAP_V3_POSITIONS_NFT_ADDRESS_ARB, UNISWAP_POOL_ADDRESS_ARB, MOR_MULTISIG_ARB,
+                          MOR_ARBITRUM_ADDRESS, WETH_ARBITRUM_ADDRESS, sizes['positions_per_chain'], tick=-52_000)
+    return chain
+
+
+def build_base(seed, sizes, now):
+    chain = FakeChain('base', 8453, head_block=22_000_000, head_timestamp=now, block_time=2)
+    # Token 0 is WETH and token 1 is MOR on Base
+    add_uniswap_positions(chain, seed, get_abi('base_positions_nft'), get_abi('base_pool'),
+                          UNISWAP_V3_POSITIONS_NFT_ADDRESS_BASE, UNISWAP_POOL_ADDRESS_BASE, MOR_MULTISIG_BASE,
+                          WETH_BASE_ADDRESS, MOR_BASE_ADDRESS, sizes['positions_per_chain'], tick=52_000)
+    return chain
+
+
+######################################################### HTTP #########################################################
+def build_market_chart(rng, now):
+    """300 days of daily CoinGecko prices, market caps and volumes in milliseconds since the epoch"""
+    start = now - 300 * DAY
+    prices, market_caps, volumes = [], [], []
+    price = 20.0
+    for day in range(301):
+        timestamp = (start + day * DAY) * 1000
+        price = max(1.0, price * rng.uniform(0.95, 1.05))
+        prices.append([timestamp, price])
+        market_caps.append([timestamp, price * 1_000_000])
+        volumes.append([timestamp, rng.uniform(50_000, 500_000)])
+    return {'prices': prices, 'market_caps': market_caps, 'total_volumes': volumes}
+
+
+def build_dune_holders(rng, holders):
+    rows = [{'address': '0x0000000000000000000000000000000000000000', 'amount': 1_000_000.0, 'chain': 'Ethereum'}]
+    for _ in range(holders):
+        rows.append({
+            'address': random_address(rng),
+            'amount': round(10 ** rng.uniform(-4, 5.5), 6),
+            'chain': rng.choice(['Arbitrum', 'Base', 'Ethereum']),
+        })
+    return rows
+
+
+def build_commits(rng, commits, now):
+    timestamps = sorted((rng.randint(now - 700 * DAY, now - DAY) for _ in range(commits)), reverse=True)
+    return [{'sha': random_hash(rng)[2:42],
+             'commit': {'author': {'date': datetime.fromtimestamp(timestamp, timezone.utc)
+                                   .strftime('%Y-%m-%dT%H:%M:%SZ')}}}
+            for timestamp in timestamps]
@@ -0,0 +1,51 @@
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from helpers.staking_helpers.staking_main import (MAX_APY_PERIODS, MAX_STAKING_PERIOD_DAYS, apy_curve,
+                                                  deposit_from_query, staking_periods_from_query)
+from main import app
+
+REWARD_INPUTS = {
+    'mor_daily_emission': 3456.0,
+    'mor_price': 20.0,
+    'steth_price': 3000.0,
+    'total_virtual_steth': 150000.0,
+}
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("query", [
+    "periods=99999999999999999999",  # Beyond int64
+    f"periods={MAX_STAKING_PERIOD_DAYS + 1}",
+    "periods=-1",
+    "periods=" + ",".join(["1"] * (MAX_APY_PERIODS + 1)),
+    "max_days=99999999999999999999999",
+    f"max_days={MAX_STAKING_PERIOD_DAYS + 1}",
+    "max_days=-1",
+    "max_days=100&step=0",
+    "deposit=inf",
+    "deposit=-inf",
+    "deposit=nan",
+    "deposit=0",
+    "deposit=1e308",
+])
+def test_out_of_range_queries_are_rejected(query):
+    # Validation happens before the reward inputs are read, so no upstream is needed
+    response = client.get(f"/apy?{query}")
+    assert response.status_code == 400, response.text
+
+
+def test_longest_range_stays_within_the_period_limit():
+    periods = staking_periods_from_query(max_days=MAX_STAKING_PERIOD_DAYS, step=1)
+    assert len(periods) == MAX_STAKING_PERIOD_DAYS + 1 <= MAX_APY_PERIODS
+    assert periods[-1] == MAX_STAKING_PERIOD_DAYS
+
+
+@pytest.mark.parametrize("deposit", [None, 1e-9, 1.0, 10 ** 9])
+def test_apy_curve_is_finite_for_accepted_deposits(deposit):
+    curve = apy_curve(REWARD_INPUTS, staking_periods_from_query("0,365,2190," + str(MAX_STAKING_PERIOD_DAYS)),
+                      deposit_from_query(deposit))
+    assert all(math.isfinite(value) for value in curve["apy"] + curve["daily_mor_rewards"])
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.cache import MetricsCache, ShardedCacheStore
+from app.core.refresh import MetricRefresher, RefreshFailed, RefreshStage
+
+BACKOFF = timedelta(seconds=60)
+
+
+class FailingFetch:
+    def __init__(self):
+        self.calls = 0
+
+    async def fetch(self):
+        self.calls += 1
+        raise RuntimeError("upstream unavailable")
+
+
+def make_refresher(tmp_path, fetch):
+    cache = MetricsCache(ShardedCacheStore(str(tmp_path)))
+    stage = RefreshStage('metric', fetch.fetch, interval=timedelta(minutes=10))
+    return cache, MetricRefresher(cache, [stage], backoff=BACKOFF, max_backoff=timedelta(minutes=10))
+
+
+async def hit(refresher, times):
+    for _ in range(times):
+        await refresher.get('metric')
+        # Let the background refresh started by a stale hit finish, so the next hit can't just join it
+        task = refresher._inflight.get('metric')
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def rewind(refresher, delta):
+    """Pretend the last refresh of the key finished delta earlier"""
+    state = refresher.states['metric']
+    state.last_finished -= delta
+
+
+def test_stale_failing_stage_refreshes_once_per_backoff_window(tmp_path):
+    fetch = FailingFetch()
+    cache, refresher = make_refresher(tmp_path, fetch)
+    cache.set('metric', {"value": 1}, updated_at=datetime.now() - timedelta(days=1))
+
+    async def scenario():
+        await hit(refresher, 5)
+        assert fetch.calls == 1
+        assert refresher.states['metric'].consecutive_failures == 1
+
+        rewind(refresher, BACKOFF + timedelta(seconds=1))
+        await hit(refresher, 5)
+        assert fetch.calls == 2
+
+        # The window doubles after the second failure
+        rewind(refresher, BACKOFF + timedelta(seconds=1))
+        await hit(refresher, 5)
+        assert fetch.calls == 2
+
+        rewind(refresher, BACKOFF)
+        await hit(refresher, 5)
+        assert fetch.calls == 3
+
+    asyncio.run(scenario())
+    # The stale value is still served
+    assert cache.get('metric') == {"value": 1}
+
+
+def test_missing_failing_stage_fails_fast_during_backoff(tmp_path):
+    fetch = FailingFetch()
+    _, refresher = make_refresher(tmp_path, fetch)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await refresher.get('metric')
+        for _ in range(5):
+            with pytest.raises(RefreshFailed):
+                await refresher.get('metric')
+        assert fetch.calls == 1
+
+        rewind(refresher, BACKOFF + timedelta(seconds=1))
+        with pytest.raises(RuntimeError):
+            await refresher.get('metric')
+        assert fetch.calls == 2
+
+    asyncio.run(scenario())
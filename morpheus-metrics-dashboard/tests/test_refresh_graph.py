@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.core.cache import MetricsCache, ShardedCacheStore
+from app.core.refresh import MetricRefresher, RefreshStage
+
+
+class CountingFetch:
+    def __init__(self, release: asyncio.Event = None):
+        self.calls = 0
+        self.release = release
+
+    async def fetch(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        return {"call": self.calls}
+
+
+def test_full_refresh_caches_each_stage_as_it_finishes(tmp_path):
+    cache = MetricsCache(ShardedCacheStore(str(tmp_path)))
+
+    async def scenario():
+        release = asyncio.Event()
+        fast, slow = CountingFetch(), CountingFetch(release)
+        refresher = MetricRefresher(cache, [RefreshStage('fast', fast.fetch, interval=timedelta(minutes=10)),
+                                            RefreshStage('slow', slow.fetch, interval=timedelta(minutes=10))])
+        cache.set('fast', {"call": 0}, updated_at=datetime.now() - timedelta(days=1))
+
+        graph = asyncio.create_task(refresher.refresh_all())
+        while 'fast' in refresher._inflight or fast.calls == 0:
+            await asyncio.sleep(0)
+
+        # The fast stage is cached while the slow one still runs, so a request doesn't fetch it again
+        assert await refresher.get('fast') == {"call": 1}
+        assert fast.calls == 1
+
+        # A refresh of the key during the graph isn't overwritten when the graph ends
+        await refresher.refresh_key('fast')
+        release.set()
+        results, reports, _ = await graph
+
+        assert fast.calls == 2
+        assert cache.get('fast') == {"call": 2}
+        assert cache.get('slow') == {"call": 1}
+        assert {key: report.status for key, report in reports.items()} == {'fast': 'ok', 'slow': 'ok'}
+        assert refresher.states['fast'].consecutive_failures == 0
+
+    asyncio.run(scenario())
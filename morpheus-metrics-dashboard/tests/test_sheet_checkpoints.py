@@ -0,0 +1,118 @@
+import pandas as pd
+import pytest
+from gspread.utils import a1_range_to_grid_range, fill_gaps
+
+from app.core.config import USER_STAKED_SHEET_NAME
+from sheets_config import google_utils
+from sheets_config.google_utils import (SheetCheckpoints, download_sheet_dataframe, set_spreadsheet, trim_to_header,
+                                        values_to_dataframe)
+
+SHEET = USER_STAKED_SHEET_NAME
+HEADER = ["Timestamp", "TransactionHash", "BlockNumber", "PoolId", "User", "Amount"]
+
+
+def transfer(i):
+    return [f"2024-01-{i % 28 + 1:02d} 00:00:00", f"0x{i:064x}", str(1000 + i), str(i % 2), f"0x{i:040x}",
+            str(10 ** 18 * i + 10 ** 20)]
+
+
+class FakeValuesClient:
+    """values:batchGet over in-memory rows, trimming empty trailing cells like the Sheets API"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = []
+
+    def values_batch_get(self, ranges, params=None):
+        self.requests.append(list(ranges))
+        value_ranges = []
+        for sheet_range in ranges:
+            _, _, cells = sheet_range.partition('!')
+            grid = a1_range_to_grid_range(cells) if cells else {}
+            values = [list(row[grid.get('startColumnIndex', 0):grid.get('endColumnIndex')])
+                      for row in self.rows[grid.get('startRowIndex', 0):grid.get('endRowIndex')]]
+            for row in values:
+                while row and row[-1] == '':
+                    row.pop()
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({'range': sheet_range, 'values': values})
+        return {'valueRanges': value_ranges}
+
+
+@pytest.fixture
+def sheet(tmp_path, monkeypatch):
+    client = FakeValuesClient([HEADER] + [transfer(i) for i in range(20)])
+    monkeypatch.setattr(google_utils, 'sheet_checkpoints', SheetCheckpoints([SHEET], str(tmp_path), 3600))
+    set_spreadsheet(client)
+    yield client
+    set_spreadsheet(None)
+
+
+def full_download(rows) -> pd.DataFrame:
+    """The frame of a full read of rows, without a checkpoint"""
+    return values_to_dataframe(SHEET, trim_to_header(fill_gaps([list(row) for row in rows])))
+
+
+def assert_read_matches_full_download(client):
+    pd.testing.assert_frame_equal(download_sheet_dataframe(SHEET), full_download(client.rows))
+
+
+def last_request_is_full(client) -> bool:
+    return client.requests[-1] == [google_utils.sheet_range(SHEET)]
+
+
+def test_appended_rows_are_read_as_a_tail(sheet):
+    assert_read_matches_full_download(sheet)
+    assert last_request_is_full(sheet)
+
+    sheet.rows += [transfer(i) for i in range(20, 25)]
+    assert_read_matches_full_download(sheet)
+    # Header row and the rows from the last one seen, in a single request
+    assert len(sheet.requests) == 2
+    assert sheet.requests[-1] == [f"'{SHEET}'!1:1", f"'{SHEET}'!A21:F"]
+
+    # Nothing new
+    assert_read_matches_full_download(sheet)
+    assert len(sheet.requests) == 3
+
+
+def test_cells_beyond_the_header_keep_the_tail_read(sheet):
+    sheet.rows[3] = sheet.rows[3] + ['', 'note']
+    assert_read_matches_full_download(sheet)
+
+    sheet.rows += [transfer(i) + ['', 'note'] for i in range(20, 22)]
+    assert_read_matches_full_download(sheet)
+    assert not last_request_is_full(sheet)
+
+
+def test_checkpoint_survives_a_restart(sheet, tmp_path, monkeypatch):
+    assert_read_matches_full_download(sheet)
+
+    monkeypatch.setattr(google_utils, 'sheet_checkpoints', SheetCheckpoints([SHEET], str(tmp_path), 3600))
+    sheet.rows += [transfer(20)]
+    assert_read_matches_full_download(sheet)
+    assert not last_request_is_full(sheet)
+
+
+@pytest.mark.parametrize("change", ['rename_column', 'add_column', 'edit_last_row', 'delete_rows'])
+def test_changed_sheet_is_downloaded_in_full(sheet, change):
+    assert_read_matches_full_download(sheet)
+
+    if change == 'rename_column':
+        sheet.rows[0] = HEADER[:-1] + ['Amount (wei)']
+    elif change == 'add_column':
+        sheet.rows[0] = HEADER + ['Note']
+    elif change == 'edit_last_row':
+        sheet.rows[-1] = transfer(99)
+    else:
+        del sheet.rows[-3:]
+    sheet.rows += [transfer(i) for i in range(20, 23)]
+
+    assert_read_matches_full_download(sheet)
+    assert last_request_is_full(sheet)
+
+    # The new checkpoint is extended by tail reads again
+    sheet.rows += [transfer(30)]
+    assert_read_matches_full_download(sheet)
+    assert not last_request_is_full(sheet)
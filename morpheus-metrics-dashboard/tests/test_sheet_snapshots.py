@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pandas as pd
+
+from sheets_config.google_utils import SheetSnapshotRegistry
+
+
+def test_queued_batch_skips_sheets_downloaded_by_the_batch_it_waited_for():
+    batches = []
+    first_batch_started, release_first_batch = threading.Event(), threading.Event()
+
+    def download_batch(sheet_names):
+        batches.append(list(sheet_names))
+        if len(batches) == 1:
+            first_batch_started.set()
+            release_first_batch.wait()
+        return {sheet_name: pd.DataFrame({'value': [1]}) for sheet_name in sheet_names}
+
+    registry = SheetSnapshotRegistry(lambda sheet_name: pd.DataFrame({'value': [1]}), download_batch)
+    with registry.scope(['A']):
+        reader_a = threading.Thread(target=registry.read, args=('A',))
+        reader_a.start()
+        first_batch_started.wait()
+
+        # A is still downloading, so it isn't fresh yet and gets queued again with B
+        with registry.scope(['A', 'B']):
+            reader_b = threading.Thread(target=registry.read, args=('B',))
+            reader_b.start()
+            time.sleep(0.1)
+            release_first_batch.set()
+            reader_a.join()
+            reader_b.join()
+
+    assert batches == [['A'], ['B']]
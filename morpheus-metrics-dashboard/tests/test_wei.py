@@ -0,0 +1,73 @@
+import random
+from decimal import Decimal, localcontext
+
+import numpy as np
+import pandas as pd
+
+from app.core.wei import (ETHER, WEI_DTYPE, combine_limbs, wei_digitize, wei_group_sums, wei_limbs, wei_mean,
+                          wei_sum)
+
+LIMB = 2 ** 32
+MAX_WEI = 10 ** 38 - 1  # Largest decimal128(38, 0)
+
+EDGE_CASES = [0, 1, -1, LIMB - 1, LIMB, -LIMB, 2 ** 63 - 1, 2 ** 63, -2 ** 63, 2 ** 64 - 1, 2 ** 64, -2 ** 64,
+              2 ** 96 + 1, MAX_WEI, -MAX_WEI, 10 ** 25, 7 * 10 ** 25]
+
+
+def wei_series(values):
+    return pd.Series(values, dtype=WEI_DTYPE)
+
+
+def test_limbs_recombine_to_each_value():
+    limbs = wei_limbs(wei_series(EDGE_CASES))
+    assert [combine_limbs(row) for row in limbs] == EDGE_CASES
+
+
+def test_sum_matches_python_ints_above_64_bits_and_negative():
+    rng = random.Random(0)
+    values = [rng.randrange(-MAX_WEI // 100_000, MAX_WEI // 100_000) for _ in range(10_000)] + EDGE_CASES
+    assert wei_sum(wei_series(values)) == sum(values)
+
+
+def test_sum_carries_across_limbs():
+    # Every low limb is all ones, so their total carries into each of the higher limbs
+    values = [LIMB - 1, 2 ** 64 - 1, 2 ** 96 - 1] * 1000
+    assert wei_sum(wei_series(values)) == sum(values)
+    # Borrowing: positives and negatives that cancel out across limbs
+    values = [2 ** 64, -1, -(2 ** 64 - 1)]
+    assert wei_sum(wei_series(values)) == 0
+
+
+def test_sum_skips_missing_and_masked_values():
+    values = [2 ** 70, None, -5, 2 ** 65]
+    mask = np.array([True, True, False, True])
+    assert wei_sum(wei_series(values)) == 2 ** 70 - 5 + 2 ** 65
+    assert wei_sum(wei_series(values), mask) == 2 ** 70 + 2 ** 65
+
+
+def test_sum_of_a_sliced_series():
+    values = [2 ** 66 + i for i in range(10)]
+    series = wei_series(values)
+    assert wei_sum(series.iloc[3:7]) == sum(values[3:7])
+
+
+def test_group_sums_match_python_ints():
+    rng = random.Random(1)
+    values = [rng.randrange(-2 ** 100, 2 ** 100) for _ in range(5000)]
+    keys = np.array([rng.choice(['a', 'b', 'c']) for _ in values])
+    expected = {key: sum(value for value, k in zip(values, keys) if k == key) for key in 'abc'}
+    assert wei_group_sums(wei_series(values), keys).to_dict() == expected
+
+
+def test_mean_is_exact_in_units():
+    values = [2 ** 80, -(2 ** 65), 3 * ETHER]
+    with localcontext() as context:
+        context.prec = 60
+        expected = Decimal(sum(values)) / Decimal(len(values) * ETHER)
+    assert wei_mean(wei_series(values)) == expected
+    assert wei_mean(wei_series(values), np.zeros(3, dtype=bool)) == Decimal('0')
+
+
+def test_digitize_compares_exactly():
+    values = [0, 10 ** 25 - 1, 10 ** 25, 7 * 10 ** 25 - 1, 7 * 10 ** 25, 2 ** 90]
+    assert wei_digitize(wei_series(values), [10 ** 25, 7 * 10 ** 25]).tolist() == [0, 0, 1, 1, 2, 2]